@@ -0,0 +1,201 @@
+import cv2
+import numpy as np
+from frame_stats import FrameStatistics, FrameStatsCache
+from typing import Dict, Optional, Tuple
+
+
+class BatchMotionMatcher:
+    """Scores many sections against all search directions at once.
+
+    Instead of normalizing and matching every candidate patch separately, the
+    matcher works from integral images (summed-area tables) over the whole
+    frame pair: each frame's pixel sums and squared sums, taken from a
+    FrameStatsCache so they are built once per frame, plus one cross product
+    table per direction offset. Any section's normalized cross-correlation
+    against any offset is then a handful of O(1) table lookups, which are
+    evaluated for all sections with NumPy.
+    """
+
+    def __init__(self, config, stats_cache: Optional[FrameStatsCache] = None):
+        self.config = config
+        self.stats_cache = stats_cache if stats_cache is not None else FrameStatsCache()
+        self.prev_frame = None
+        self.curr_frame = None
+        self.prev_stats: Optional[FrameStatistics] = None
+        self.curr_stats: Optional[FrameStatistics] = None
+        self._cross_tables: Dict[int, np.ndarray] = {}
+
+    def prepare(self, prev_frame: np.ndarray, curr_frame: np.ndarray):
+        """Build the per-frame tables for a new frame pair (no-op if unchanged)."""
+        if prev_frame is self.prev_frame and curr_frame is self.curr_frame:
+            return
+
+        self.prev_frame = prev_frame
+        self.curr_frame = curr_frame
+        self.prev_stats = self.stats_cache.get(prev_frame)
+        self.curr_stats = self.stats_cache.get(curr_frame)
+        # Cross tables are built lazily, only for directions that get scored
+        self._cross_tables = {}
+
+    def _direction_offset(self, direction: int) -> Tuple[int, int]:
+        return self.config.direction_offsets[direction]
+
+    def _cross_table(self, direction: int) -> np.ndarray:
+        """Integral image of prev(x, y) * curr(x + sx, y + sy) for one direction."""
+        table = self._cross_tables.get(direction)
+        if table is not None:
+            return table
+
+        sx, sy = self._direction_offset(direction)
+        height, width = self.prev_frame.shape[:2]
+        product = np.zeros((height, width), dtype=np.float32)
+
+        # Region of the previous frame whose shifted position lies inside the current frame
+        y0, y1 = max(0, -sy), min(height, height - sy)
+        x0, x1 = max(0, -sx), min(width, width - sx)
+        if y1 > y0 and x1 > x0:
+            # uint8 products fit exactly in float32, and the float64 integral keeps sums exact
+            np.multiply(self.prev_frame[y0:y1, x0:x1], self.curr_frame[y0 + sy:y1 + sy, x0 + sx:x1 + sx],
+                        out=product[y0:y1, x0:x1], dtype=np.float32)
+
+        table = cv2.integral(product, sdepth=cv2.CV_64F)
+        self._cross_tables[direction] = table
+        return table
+
+    def score_sections(self, xs: np.ndarray, ys: np.ndarray,
+                       ws: np.ndarray, hs: np.ndarray,
+                       evaluate: Optional[np.ndarray] = None) -> np.ndarray:
+        """Correlation score of every section against every direction.
+
+        Returns an (N, len(DIRECTIONS)) array. Candidates that fall outside the
+        frame, or are left out by the optional (N, len(DIRECTIONS)) boolean
+        `evaluate` mask, are scored -inf so they never win. Cross tables are
+        only built for directions that are actually evaluated.
+        """
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        ws = np.asarray(ws, dtype=np.int64)
+        hs = np.asarray(hs, dtype=np.int64)
+
+        height, width = self.curr_frame.shape[:2]
+        n = (ws * hs).astype(np.float64)
+        scores = np.full((len(xs), len(self.config.DIRECTIONS)), -np.inf)
+
+        # Statistics of the previous-frame patches are shared by all directions
+        sum_prev, sqsum_prev = self.prev_stats.section_sums(xs, ys, ws, hs)
+        var_prev = n * sqsum_prev - sum_prev ** 2
+
+        for i in range(len(self.config.DIRECTIONS)):
+            sx, sy = self._direction_offset(i)
+            new_xs = xs + sx
+            new_ys = ys + sy
+
+            # Same bounds rule as VideoMotionAnalyzer.find_best_motion_direction
+            valid = ((new_xs >= 0) & (new_ys >= 0) &
+                     (new_xs + ws <= width) & (new_ys + hs <= height))
+            if evaluate is not None:
+                valid &= evaluate[:, i]
+            if not valid.any():
+                continue
+
+            idx = np.nonzero(valid)[0]
+            cx, cy, cw, ch = new_xs[idx], new_ys[idx], ws[idx], hs[idx]
+
+            sum_curr, sqsum_curr = self.curr_stats.section_sums(cx, cy, cw, ch)
+            var_curr = n[idx] * sqsum_curr - sum_curr ** 2
+            cross = FrameStatistics.box_sums(self._cross_table(i), xs[idx], ys[idx], cw, ch)
+
+            covariance = n[idx] * cross - sum_prev[idx] * sum_curr
+            denom = np.sqrt(np.maximum(var_prev[idx], 0) * np.maximum(var_curr, 0))
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ncc = np.clip(covariance / denom, -1.0, 1.0)
+
+            # Flat patches follow cv2.matchTemplate(TM_CCOEFF_NORMED): a flat
+            # candidate scores 1, a flat previous patch against texture scores 0
+            ncc = np.where(var_prev[idx] <= 0, 0.0, ncc)
+            ncc = np.where(var_curr <= 0, 1.0, ncc)
+
+            scores[idx, i] = ncc
+
+        return scores
+
+    def score_masked_sections(self, prev_frame: np.ndarray, curr_frame: np.ndarray, mask: np.ndarray,
+                              xs: np.ndarray, ys: np.ndarray, ws: np.ndarray, hs: np.ndarray,
+                              evaluate: Optional[np.ndarray] = None) -> np.ndarray:
+        """score_sections over only the pixels valid in both the section and the candidate.
+
+        `mask` is 1 where pixels are analyzed (see roi.py). Candidates without a
+        valid pixel in common are -inf; otherwise the conventions of
+        score_sections apply. The valid pixels change with every section and
+        offset, so instead of tables each section gets one matrix product: its
+        [mask, prev * mask, prev^2 * mask] rows against the [mask, curr * mask,
+        curr^2 * mask] rows of all its candidates give every sum the masked
+        correlation needs, for all directions at once.
+        """
+        height, width = curr_frame.shape[:2]
+        offsets = self.config.direction_offsets
+        scores = np.full((len(xs), len(self.config.DIRECTIONS)), -np.inf)
+
+        for row, (x, y, w, h) in enumerate(zip(np.asarray(xs).tolist(), np.asarray(ys).tolist(),
+                                               np.asarray(ws).tolist(), np.asarray(hs).tolist())):
+            # Same bounds rule as score_sections
+            directions = [i for i, (sx, sy) in enumerate(offsets)
+                          if x + sx >= 0 and y + sy >= 0 and x + sx + w <= width and y + sy + h <= height
+                          and (evaluate is None or evaluate[row, i])]
+            if not directions:
+                continue
+
+            # float64 products and sums of uint8 data are exact
+            prev_mask = mask[y:y + h, x:x + w]
+            prev_rows = np.empty((3, h, w))
+            np.copyto(prev_rows[0], prev_mask)
+            np.multiply(prev_frame[y:y + h, x:x + w], prev_rows[0], out=prev_rows[1])
+            np.multiply(prev_rows[1], prev_frame[y:y + h, x:x + w], out=prev_rows[2])
+
+            # The same three rows over the area all candidates cover, computed once
+            left = x + min(offsets[i][0] for i in directions)
+            top = y + min(offsets[i][1] for i in directions)
+            right = x + w + max(offsets[i][0] for i in directions)
+            bottom = y + h + max(offsets[i][1] for i in directions)
+            area = np.empty((3, bottom - top, right - left))
+            np.copyto(area[0], mask[top:bottom, left:right])
+            np.multiply(curr_frame[top:bottom, left:right], area[0], out=area[1])
+            np.multiply(area[1], curr_frame[top:bottom, left:right], out=area[2])
+
+            curr_rows = np.empty((len(directions), 3, h, w))
+            for j, i in enumerate(directions):
+                cx, cy = x + offsets[i][0] - left, y + offsets[i][1] - top
+                curr_rows[j] = area[:, cy:cy + h, cx:cx + w]
+
+            # sums[a, d, b]: prev row a times curr row b of direction d
+            sums = (prev_rows.reshape(3, -1) @ curr_rows.reshape(3 * len(directions), -1).T).reshape(
+                3, len(directions), 3)
+            n = sums[0, :, 0]
+            sum_prev, sum_curr = sums[1, :, 0], sums[0, :, 1]
+            var_prev = n * sums[2, :, 0] - sum_prev ** 2
+            var_curr = n * sums[0, :, 2] - sum_curr ** 2
+            covariance = n * sums[1, :, 1] - sum_prev * sum_curr
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ncc = np.clip(covariance / np.sqrt(np.maximum(var_prev, 0) * np.maximum(var_curr, 0)),
+                              -1.0, 1.0)
+            ncc = np.where(var_prev <= 0, 0.0, ncc)
+            ncc = np.where(var_curr <= 0, 1.0, ncc)
+            scores[row, directions] = np.where(n > 0, ncc, -np.inf)
+
+        return scores
+
+    @staticmethod
+    def best_directions(scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Pick the first highest-scoring direction per section.
+
+        Sections without any valid candidate get direction 0 and score -1,
+        as in the per-section search.
+        """
+        best_dirs = np.argmax(scores, axis=1)
+        best_scores = scores[np.arange(len(scores)), best_dirs]
+        no_candidate = ~np.isfinite(best_scores)
+        best_dirs[no_candidate] = 0
+        best_scores[no_candidate] = -1.0
+        return best_dirs, best_scores
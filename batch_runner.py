@@ -0,0 +1,304 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from config import Config
+from result_cache import analysis_settings
+from video_io import frame_range
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v')
+
+
+def find_videos(source: str) -> List[str]:
+    """Video files under a directory, or listed in a manifest file.
+
+    A manifest has one path per line (relative paths are relative to the
+    manifest); blank lines and lines starting with # are ignored.
+    """
+    if os.path.isdir(source):
+        videos = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            videos.extend(os.path.join(root, name) for name in sorted(files)
+                          if name.lower().endswith(VIDEO_EXTENSIONS))
+        return videos
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(base, line) for line in lines if line and not line.startswith('#')]
+
+
+def video_key(video_path: str) -> str:
+    """Output directory name of a video: its file name plus a hash of its full path."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    return f"{stem}_{hashlib.sha1(os.path.abspath(video_path).encode()).hexdigest()[:8]}"
+
+
+def settings_hash(config: Config) -> str:
+    description = json.dumps(analysis_settings(config), sort_keys=True, default=str)
+    return hashlib.sha256(description.encode()).hexdigest()[:16]
+
+
+def plan_chunks(video_path: str, config: Config) -> List[Tuple[int, Optional[int]]]:
+    """(first, end) frame ranges of a video's jobs, in the form frame_range() returns.
+
+    The analyzed range (SKIP_FRAMES/START_TIME up to MAX_FRAMES/END_TIME, else
+    the whole video) is cut into chunks of BATCH_CHUNK_FRAMES frames, rounded up
+    to a multiple of FRAME_SKIP. Every chunk after the first starts one selected
+    frame early, on the last frame of the chunk before it, so the frame pair
+    across each boundary is analyzed exactly once. Without an end setting the
+    last chunk runs to the end of the video, whatever the reported frame count.
+
+    Chunks are analyzed independently, so with TEMPORAL_WARM_START each chunk's
+    first pair is searched without a previous field, and the fields after it
+    may differ from a single run of the range. AUTO_LETTERBOX bars are detected
+    per video, not per chunk, and match a single run.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    first, end = frame_range(config, fps)
+    open_end = end is None
+    if total > 0:
+        end = total if end is None else min(end, total)
+    if end is None:
+        return [(first, None)]
+
+    step = config.FRAME_SKIP
+    size = -(-config.BATCH_CHUNK_FRAMES // step) * step
+    chunks = []
+    boundary = first
+    while boundary < end:
+        stop = min((boundary + size) // step * step, end)
+        start = boundary - 1 if chunks else first
+        chunks.append((start, stop))
+        boundary = stop
+    if open_end and chunks:
+        chunks[-1] = (chunks[-1][0], None)
+    return chunks
+
+
+def run_chunk(video_path: str, first: int, end: Optional[int], output_path: str, config: Config) -> Dict:
+    """Analyze frames (first, end] of a video into a motion export at output_path.
+
+    The export is written next to output_path and renamed into place when
+    complete, so an interrupted chunk never leaves a partial result behind.
+    """
+    from motion_analyzer import VideoMotionAnalyzer
+    from motion_export import MotionFieldWriter
+
+    # One process per chunk; the chunk's own range replaces the batch-wide one
+    chunk_config = config.replace(SKIP_FRAMES=first, MAX_FRAMES=None if end is None else end - first,
+                                  START_TIME=None, END_TIME=None, CACHE_DIR=None, NUM_WORKERS=1,
+                                  HEADLESS=True, TELEMETRY_FILE=None)
+    analyzer = VideoMotionAnalyzer(chunk_config)
+
+    temp_path = f"{output_path}.partial"
+    if os.path.exists(temp_path):
+        shutil.rmtree(temp_path)
+
+    started = time.perf_counter()
+    frames = 0
+    with MotionFieldWriter(temp_path, metadata={'video': video_path, 'first_frame': first,
+                                                'end_frame': end}) as writer:
+        for frame_count, field in analyzer.analyze_video(video_path):
+            writer.write(frame_count, field, analyzer.calculate_field_movement(field))
+            frames += 1
+
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+    os.replace(temp_path, output_path)
+    return {'frames': frames, 'seconds': time.perf_counter() - started,
+            'evaluations': analyzer.search_totals['evaluations']}
+
+
+class BatchRunner:
+    """Analyzes many videos on a process pool, split into resumable frame-range chunks.
+
+    Each chunk is written as a motion export (see motion_export.py) to
+    <output_dir>/<video>/<first>-<end>/. Finished and failed chunks are appended
+    to a JSON lines checkpoint file as they complete; a later run with the same
+    analysis settings skips the finished ones and retries the rest. Chunks
+    finished with other settings are redone.
+    """
+
+    def __init__(self, config: Config, output_dir: str, jobs: Optional[int] = None,
+                 checkpoint_path: Optional[str] = None):
+        self.config = config
+        self.output_dir = output_dir
+        self.jobs = jobs or config.BATCH_JOBS or os.cpu_count() or 1
+        self.checkpoint_path = checkpoint_path or os.path.join(output_dir, 'batch_checkpoint.jsonl')
+        self.settings = settings_hash(config)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def load_checkpoint(self) -> Dict[str, Dict]:
+        """Latest checkpoint record per chunk id; a half-written last line is ignored."""
+        records = {}
+        if not os.path.exists(self.checkpoint_path):
+            return records
+        with open(self.checkpoint_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record['id']] = record
+        return records
+
+    def plan(self, videos: List[str]) -> Tuple[List[Dict], List[Dict]]:
+        """(chunks, failures): every chunk job of the videos, and the videos that could not be opened."""
+        chunks, failures = [], []
+        for video_path in videos:
+            try:
+                ranges = plan_chunks(video_path, self.config)
+            except (ValueError, OSError) as e:
+                failures.append({'video': video_path, 'error': str(e)})
+                continue
+            key = video_key(video_path)
+            for first, end in ranges:
+                name = f"{first:08d}-{'end' if end is None else f'{end:08d}'}"
+                chunks.append({'id': f"{key}/{name}", 'video': video_path, 'first': first, 'end': end,
+                               'output': os.path.join(self.output_dir, key, name)})
+        return chunks, failures
+
+    def run(self, videos: List[str]) -> Dict:
+        """Process all chunks of the videos not finished yet; returns the run summary."""
+        started = time.perf_counter()
+        chunks, failures = self.plan(videos)
+        checkpoint = self.load_checkpoint()
+        pending = [chunk for chunk in chunks
+                   if not (checkpoint.get(chunk['id'], {}).get('status') == 'done' and
+                           checkpoint[chunk['id']].get('settings') == self.settings and
+                           os.path.isdir(chunk['output']))]
+        resumed = len(chunks) - len(pending)
+
+        print(f"Batch: {len(videos)} videos, {len(chunks)} chunks "
+              f"({resumed} already done), {self.jobs} jobs")
+
+        frames, analysis_seconds, completed = 0, 0.0, 0
+        with open(self.checkpoint_path, 'a') as log, \
+                ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {executor.submit(run_chunk, chunk['video'], chunk['first'], chunk['end'],
+                                       chunk['output'], self.config): chunk for chunk in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                chunk = futures[future]
+                record = {'id': chunk['id'], 'video': chunk['video'], 'first': chunk['first'],
+                          'end': chunk['end'], 'settings': self.settings}
+                try:
+                    record.update(future.result(), status='done')
+                    frames += record['frames']
+                    analysis_seconds += record['seconds']
+                    completed += 1
+                    print(f"[{done}/{len(pending)}] {chunk['id']}: {record['frames']} frames "
+                          f"in {record['seconds']:.1f}s")
+                except Exception as e:
+                    record.update(status='failed', error=f"{type(e).__name__}: {e}")
+                    failures.append({'video': chunk['video'], 'first': chunk['first'],
+                                     'end': chunk['end'], 'error': record['error']})
+                    print(f"[{done}/{len(pending)}] {chunk['id']}: failed ({record['error']})")
+
+                log.write(json.dumps(record) + "\n")
+                log.flush()
+                os.fsync(log.fileno())
+
+        wall_seconds = time.perf_counter() - started
+        summary = {
+            'videos': len(videos),
+            'chunks': len(chunks),
+            'completed': completed,
+            'resumed': resumed,
+            'failed': len(failures),
+            'frames': frames,
+            'wall_s': wall_seconds,
+            'frames_per_second': frames / wall_seconds if wall_seconds > 0 else 0.0,
+            'frames_per_job_second': frames / analysis_seconds if analysis_seconds > 0 else 0.0,
+            'jobs': self.jobs,
+            'failures': failures,
+        }
+        with open(os.path.join(self.output_dir, 'batch_summary.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze a directory or manifest of videos in parallel')
+    parser.add_argument('source', help='Directory to search for videos, or a manifest file with one path per line')
+    parser.add_argument('-o', '--output-dir', required=True,
+                       help='Directory for the per-chunk motion exports, checkpoint and summary')
+    parser.add_argument('--jobs', type=int, metavar='N',
+                       help='Parallel chunk jobs, default: one per CPU')
+    parser.add_argument('--chunk-frames', type=int, metavar='N',
+                       help='Frames per chunk; longer videos are split, default: 1800')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                       help='Checkpoint file, default: batch_checkpoint.jsonl in the output directory')
+    parser.add_argument('--grid-size', type=int, nargs=2, metavar=('ROWS', 'COLS'),
+                       help='Grid size (rows cols), default: 16 16')
+    parser.add_argument('--max-depth', type=int, metavar='DEPTH',
+                       help='Maximum recursive depth, default: 2')
+    parser.add_argument('--match-mode', choices=['template', 'vectorized', 'pyramid'],
+                       help='Direction scoring engine, default: template')
+    parser.add_argument('--analysis-width', type=int, metavar='PIXELS',
+                       help='Analyze motion on frames downscaled to this width, default: full resolution')
+    parser.add_argument('--global-motion', choices=['off', 'estimate', 'only'],
+                       help='Global motion estimation, default: off')
+    parser.add_argument('--mask', metavar='IMAGE',
+                       help='Only analyze where this mask image is nonzero (scaled to the frame)')
+    parser.add_argument('--letterbox', action='store_true',
+                       help='Detect black letterbox bars per video and leave them out of the analysis')
+
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.chunk_frames:
+        overrides['BATCH_CHUNK_FRAMES'] = args.chunk_frames
+    if args.grid_size:
+        overrides['GRID_ROWS'], overrides['GRID_COLS'] = args.grid_size
+    if args.max_depth is not None:
+        overrides['MAX_RECURSIVE_DEPTH'] = args.max_depth
+    if args.match_mode:
+        overrides['MATCH_MODE'] = args.match_mode
+    if args.analysis_width:
+        overrides['ANALYSIS_WIDTH'] = args.analysis_width
+    if args.global_motion:
+        overrides['GLOBAL_MOTION'] = args.global_motion
+    if args.mask:
+        overrides['MASK_IMAGE'] = args.mask
+    if args.letterbox:
+        overrides['AUTO_LETTERBOX'] = True
+
+    try:
+        config = Config(**overrides)
+        videos = find_videos(args.source)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    runner = BatchRunner(config, args.output_dir, args.jobs, args.checkpoint)
+    summary = runner.run(videos)
+
+    print(f"\nBatch complete: {summary['completed']} chunks analyzed, {summary['resumed']} resumed, "
+          f"{summary['failed']} failed")
+    print(f"Throughput: {summary['frames']} frames in {summary['wall_s']:.1f}s "
+          f"({summary['frames_per_second']:.1f} fps, {summary['frames_per_job_second']:.1f} fps per job)")
+    for failure in summary['failures']:
+        print(f"  Failed: {failure['video']}: {failure['error']}")
+    print(f"Summary written to {os.path.join(args.output_dir, 'batch_summary.json')}")
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import RESOLUTIONS, SCENARIOS, expected_flow, scenario_motion, write_clip
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+STAGES = ('decode', 'grayscale', 'global', 'sections', 'matching', 'recursion', 'drawing', 'encode')
+
+# Frames per clip in the memory pass, which runs under tracemalloc and is not timed
+MEMORY_FRAMES = 8
+# Frames of the memory pass left out of the per-frame allocation, while pools and caches fill up
+MEMORY_WARMUP_FRAMES = 3
+
+
+class MotionBenchmark:
+    """Times the analyzer stage by stage on synthetic clips with known motion."""
+
+    def __init__(self, config: Optional[Config] = None, frames: int = 30, work_dir: Optional[str] = None):
+        self.config = config if config is not None else Config()
+        self.frames = frames
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='motion_benchmark_')
+        self.results = []
+
+    def clip_path(self, scenario: str, resolution: str) -> str:
+        path = os.path.join(self.work_dir, f"{scenario}_{resolution}_{self.frames}.mp4")
+        if not os.path.exists(path):
+            width, height = RESOLUTIONS[resolution]
+            write_clip(path, width, height, self.frames, **scenario_motion(scenario))
+        return path
+
+    def run_clip(self, path: str, max_frames: Optional[int] = None, motion: Optional[Dict] = None,
+                 frame_allocations: Optional[List[int]] = None) -> Dict:
+        """Decode, analyze, draw and encode one clip, timing every stage.
+
+        Under tracemalloc, frame_allocations collects the bytes allocated on top
+        of the memory already in use while processing each frame.
+        """
+        analyzer = VideoMotionAnalyzer(self.config)
+        stage_times = {stage: 0.0 for stage in STAGES}
+        analyzer.stage_times = stage_times
+
+        cap = analyzer.load_video(path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        output_width = width + (200 if self.config.SHOW_COMPASS else 0)
+        out = cv2.VideoWriter(os.path.join(self.work_dir, 'output.mp4'),
+                              cv2.VideoWriter_fourcc(*'mp4v'), fps, (output_width, height))
+        legend = analyzer.create_motion_legend() if self.config.SHOW_COMPASS else None
+
+        angle_errors = []
+        prev_frame = None
+        pairs = 0
+        index = 0
+        start_time = time.perf_counter()
+        try:
+            while max_frames is None or index < max_frames:
+                if frame_allocations is not None:
+                    tracemalloc.reset_peak()
+                    in_use = tracemalloc.get_traced_memory()[0]
+
+                started = time.perf_counter()
+                ret, frame = analyzer.read_frame(cap)
+                stage_times['decode'] += time.perf_counter() - started
+                if not ret:
+                    break
+
+                started = time.perf_counter()
+                gray_frame = analyzer.analysis_frame(frame)
+                stage_times['grayscale'] += time.perf_counter() - started
+
+                if prev_frame is not None:
+                    field = analyzer.to_frame_scale(analyzer.analyze_frame_pair(prev_frame, gray_frame),
+                                                    frame.shape)
+                    pairs += 1
+                    if motion is not None:
+                        angle_errors.extend(self.angle_errors(field, index - 1, width, height, motion))
+
+                    started = time.perf_counter()
+                    combined_frame = analyzer.render_frame(frame, field, legend)
+                    stage_times['drawing'] += time.perf_counter() - started
+
+                    started = time.perf_counter()
+                    out.write(combined_frame)
+                    stage_times['encode'] += time.perf_counter() - started
+
+                prev_frame = gray_frame
+                index += 1
+                if frame_allocations is not None:
+                    frame_allocations.append(tracemalloc.get_traced_memory()[1] - in_use)
+        finally:
+            cap.release()
+            out.release()
+
+        elapsed = time.perf_counter() - start_time
+        return {
+            'frames': index,
+            'pairs': pairs,
+            'seconds': elapsed,
+            'fps': pairs / elapsed if elapsed > 0 else 0.0,
+            'stage_ms': {stage: seconds * 1000 / max(pairs, 1) for stage, seconds in stage_times.items()},
+            'mean_angle_error_deg': float(np.mean(angle_errors)) if angle_errors else None,
+            'search_per_pair': {name: count / max(pairs, 1) for name, count in analyzer.search_totals.items()},
+        }
+
+    @staticmethod
+    def angle_errors(field, index: int, width: int, height: int, motion: Dict) -> List[float]:
+        """Angle error of every moving section against the synthetic ground truth."""
+        centers_x = field.x + field.width / 2
+        centers_y = field.y + field.height / 2
+        flow_x, flow_y = expected_flow(centers_x, centers_y, index, width, height, **motion)
+
+        # Only sections that detected motion where there is at least half a pixel of it
+        valid = (np.hypot(flow_x, flow_y) >= 0.5) & (field.strength > 0.1)
+        expected = np.degrees(np.arctan2(flow_x[valid], -flow_y[valid])) % 360
+        error = np.abs(field.angle[valid] - expected) % 360
+        return np.minimum(error, 360 - error).tolist()
+
+    def measure_memory(self, path: str) -> Dict:
+        """Peak memory and steady-state allocation per frame of a short run.
+
+        Traced separately so it doesn't skew the timings. frame_alloc_kb is the
+        median over the frames after MEMORY_WARMUP_FRAMES; with BUFFER_POOL it
+        leaves out the frame, grayscale and output buffers that get recycled.
+        """
+        frame_allocations = []
+        tracemalloc.start()
+        try:
+            self.run_clip(path, MEMORY_FRAMES, frame_allocations=frame_allocations)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        steady = frame_allocations[MEMORY_WARMUP_FRAMES:] or frame_allocations
+        memory = {'peak_traced_mb': peak / 1024 ** 2,
+                  'frame_alloc_kb': float(np.median(steady)) / 1024 if steady else 0.0,
+                  'max_rss_mb': None}
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            memory['max_rss_mb'] = rss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+        return memory
+
+    def run_case(self, scenario: str, resolution: str) -> Dict:
+        name = f"{scenario}-{resolution}"
+        print(f"\n=== Benchmark: {name} ===")
+        path = self.clip_path(scenario, resolution)
+
+        result = {'name': name, 'scenario': scenario, 'resolution': resolution}
+        result.update(self.run_clip(path, motion=scenario_motion(scenario)))
+        result['memory'] = self.measure_memory(path)
+
+        print(f"FPS: {result['fps']:.2f}")
+        print("Stages (ms/frame): " + ", ".join(f"{stage} {result['stage_ms'][stage]:.2f}" for stage in STAGES))
+        if result['mean_angle_error_deg'] is not None:
+            print(f"Mean angle error: {result['mean_angle_error_deg']:.1f}°")
+        search = result['search_per_pair']
+        if search['evaluations'] or search['saved']:
+            print(f"Candidate evaluations per frame: {search['evaluations']:.0f} performed, "
+                  f"{search['saved']:.0f} saved")
+        print(f"Peak traced memory: {result['memory']['peak_traced_mb']:.1f} MB, "
+              f"{result['memory']['frame_alloc_kb']:.0f} KB allocated per frame")
+
+        self.results.append(result)
+        return result
+
+    def run_suite(self, scenarios: List[str], resolutions: List[str]) -> Dict:
+        for resolution in resolutions:
+            for scenario in scenarios:
+                self.run_case(scenario, resolution)
+
+        return {
+            'version': 1,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': {
+                'python': platform.python_version(),
+                'opencv': cv2.__version__,
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'settings': {
+                'frames': self.frames,
+                'grid': [self.config.GRID_ROWS, self.config.GRID_COLS],
+                'step_size': self.config.SEARCH_STEP_SIZE,
+                'max_depth': self.config.MAX_RECURSIVE_DEPTH,
+                'motion_threshold': self.config.MOTION_THRESHOLD,
+                'match_mode': self.config.MATCH_MODE,
+                'recursion_mode': self.config.RECURSION_MODE,
+                'warm_start': self.config.TEMPORAL_WARM_START,
+                'analysis_width': self.config.ANALYSIS_WIDTH,
+                'buffer_pool': self.config.BUFFER_POOL,
+            },
+            'cases': self.results,
+        }
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a description of every case that got slower than the baseline by more than `tolerance`."""
+    baseline_cases = {case['name']: case for case in baseline.get('cases', [])}
+    regressions = []
+
+    print("\n=== Baseline comparison ===")
+    if results.get('settings') != baseline.get('settings'):
+        print("Warning: benchmark settings differ from the baseline")
+
+    for case in results['cases']:
+        reference = baseline_cases.get(case['name'])
+        if reference is None:
+            print(f"{case['name']}: no baseline")
+            continue
+
+        change = case['fps'] / reference['fps'] - 1 if reference['fps'] > 0 else 0.0
+        print(f"{case['name']}: {case['fps']:.2f} fps vs {reference['fps']:.2f} ({change * 100:+.1f}%)")
+        if change < -tolerance:
+            regressions.append(f"{case['name']}: fps {change * 100:+.1f}%")
+
+        for stage in STAGES:
+            before = reference['stage_ms'].get(stage, 0.0)
+            after = case['stage_ms'].get(stage, 0.0)
+            # Ignore noise in stages that take almost no time
+            if before >= 1.0 and after > before * (1 + tolerance):
+                regressions.append(f"{case['name']}: {stage} {before:.2f} -> {after:.2f} ms/frame")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Motion analyzer benchmark on synthetic videos')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS),
+                       help='Motion scenarios to run, default: all')
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS),
+                       default=['480p', '720p', '1080p'],
+                       help='Clip resolutions, default: 480p 720p 1080p')
+    parser.add_argument('--frames', type=int, default=30, metavar='N',
+                       help='Frames per synthetic clip, default: 30')
+    parser.add_argument('--match-mode', choices=['template', 'vectorized', 'pyramid'],
+                       help='Direction scoring engine, default: template')
+    parser.add_argument('--analysis-width', type=int, metavar='PIXELS',
+                       help='Analyze motion on frames downscaled to this width, default: full resolution')
+    parser.add_argument('--pruned-search', action='store_true',
+                       help='Prune the template direction search by score bounds')
+    parser.add_argument('--global-motion', choices=['off', 'estimate', 'only'],
+                       help='Global motion estimation, default: off')
+    parser.add_argument('--buffer-pool', action='store_true',
+                       help='Decode, convert and draw into recycled buffers')
+    parser.add_argument('-o', '--output', default='benchmark_results.json',
+                       help='Where to write the results, default: benchmark_results.json')
+    parser.add_argument('--baseline', metavar='FILE',
+                       help='Compare against a stored baseline and exit with 1 on regressions')
+    parser.add_argument('--save-baseline', metavar='FILE',
+                       help='Also store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                       help='Allowed slowdown before a regression is reported, default: 0.1 (10%%)')
+
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.match_mode:
+        overrides['MATCH_MODE'] = args.match_mode
+    if args.analysis_width:
+        overrides['ANALYSIS_WIDTH'] = args.analysis_width
+    if args.global_motion:
+        overrides['GLOBAL_MOTION'] = args.global_motion
+    if args.pruned_search:
+        overrides['PRUNED_SEARCH'] = True
+    if args.buffer_pool:
+        overrides['BUFFER_POOL'] = True
+    config = Config(**overrides)
+
+    benchmark = MotionBenchmark(config, args.frames)
+    results = benchmark.run_suite(args.scenarios, args.resolutions)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+from typing import Optional
+
+from frame_stats import FrameStatistics
+
+# Direction of sections whose content did not change, instead of one of DIRECTIONS
+STATIC_DIRECTION = -1
+
+
+class ChangeGate:
+    """Flags sections whose content did not change between two frames.
+
+    One absolute difference and one integral image per frame pair give every
+    section's mean absolute difference in O(1). Sections below
+    CHANGE_THRESHOLD (in gray levels) are static: they get STATIC_DIRECTION
+    and strength 0 without a motion search, and are never subdivided. With a
+    region mask, masked pixels count as unchanged and the mean is taken over
+    the analyzed pixels only.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._frames = None
+        self._integral: Optional[np.ndarray] = None
+
+    def prepare(self, prev_frame: np.ndarray, curr_frame: np.ndarray, mask: Optional[np.ndarray] = None):
+        """Build the difference table for a new frame pair (no-op if unchanged)."""
+        if self._frames is not None and self._frames[0] is prev_frame and self._frames[1] is curr_frame:
+            return
+        difference = cv2.absdiff(prev_frame, curr_frame)
+        if mask is not None:
+            difference *= mask
+        # float64 sums stay exact for any frame size
+        self._integral = cv2.integral(difference, sdepth=cv2.CV_64F)
+        self._frames = (prev_frame, curr_frame)
+
+    def mean_difference(self, xs, ys, ws, hs, coverage: Optional[np.ndarray] = None) -> np.ndarray:
+        """Mean absolute difference of each section, over the fraction `coverage` of it if given."""
+        xs, ys, ws, hs = (np.asarray(values, dtype=np.int64) for values in (xs, ys, ws, hs))
+        pixels = (ws * hs).astype(np.float64)
+        if coverage is not None:
+            pixels = pixels * coverage
+        return FrameStatistics.box_sums(self._integral, xs, ys, ws, hs) / np.maximum(pixels, 1)
+
+    def static(self, xs, ys, ws, hs, coverage: Optional[np.ndarray] = None) -> np.ndarray:
+        return self.mean_difference(xs, ys, ws, hs, coverage) < self.config.CHANGE_THRESHOLD
@@ -1,4 +1,28 @@
+import numpy as np
+from typing import Dict, List
+
+MATCH_MODES = ('template', 'vectorized', 'pyramid')
+RECURSION_MODES = ('threshold', 'adaptive')
+GLOBAL_MOTION_MODES = ('off', 'estimate', 'only')
+
+
+def _freeze(value):
+    # Lists (e.g. DIRECTIONS) become tuples so a config can't be changed through them
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
 class Config:
+    """Analyzer settings.
+
+    The class attributes below are the defaults. An instance is an immutable
+    snapshot of them with optional overrides, e.g. Config(GRID_ROWS=8, GRID_COLS=8),
+    validated on creation and holding the derived lookup tables the hot paths
+    use. Every analyzer owns one, so analyzers with different settings can run
+    side by side; use replace() to derive a modified copy.
+    """
+
     # Grid subdivision settings
     GRID_ROWS = 5
     GRID_COLS = 5
@@ -6,10 +30,31 @@ class Config:
     # Motion detection settings
     SEARCH_STEP_SIZE = 1  # pixels to move in each direction
     MOTION_THRESHOLD = 0.3  # minimum motion strength to trigger recursion
+    MATCH_MODE = 'template'  # 'template' (per-section matchTemplate), 'vectorized' (batched integral images) or 'pyramid'
+
+    # Pyramid search settings (MATCH_MODE = 'pyramid')
+    PYRAMID_LEVELS = 3  # pyramid levels including full resolution
+    PYRAMID_SEARCH_RADIUS = 2  # offsets searched in each direction on the coarsest level
+    PYRAMID_REFINE_RADIUS = 1  # offsets searched around the prediction on finer levels
+
+    # Pruned direction search (template match mode)
+    PRUNED_SEARCH = False  # score likely directions first and skip those whose score bound can't win
+    PRUNE_ACCEPT_SCORE = 0.95  # stop a section's search at this score (None = exact: only skip by bound)
+    PRUNE_BOUND_BLOCKS = 16  # blocks per side for the score upper bound; more is tighter but costs more
 
     # Recursive analysis settings
     MAX_RECURSIVE_DEPTH = 2
     RECURSIVE_SUBDIVISION_FACTOR = 2  # divide each section into 2x2 subsections
+    TEMPORAL_WARM_START = False  # seed each section's search from the previous frame's result
+    WARM_START_ACCEPT_SCORE = 0.9  # accept a predicted direction without a full search at this score
+    RECURSION_MODE = 'threshold'  # 'threshold' (subdivide everything above MOTION_THRESHOLD) or 'adaptive'
+    RECURSION_BUDGET_MS = None  # adaptive mode: per-frame analysis time budget (None = unlimited)
+    RECURSION_BUDGET_EVALUATIONS = None  # adaptive mode: per-frame candidate evaluation budget (None = unlimited)
+
+    # Global (camera) motion settings
+    GLOBAL_MOTION = 'off'  # 'off', 'estimate' (phase correlation alongside the grid) or 'only' (no grid)
+    GLOBAL_MOTION_WIDTH = 320  # width of the downscaled frames the global motion is estimated on
+    SUBTRACT_GLOBAL_MOTION = False  # 'estimate' mode: analyze the grid for motion relative to the camera
 
     # Visualization settings
     SHOW_MOTION_VECTORS = False
@@ -23,7 +68,44 @@ class Config:
     FRAME_SKIP = 1  # process every nth frame (1 = all frames)
     MAX_FRAMES = None  # process only first n frames (None = all frames)
     SKIP_FRAMES = 0  # skip first n frames before processing
+    START_TIME = None  # seconds into the video to start at (None = from the start)
+    END_TIME = None  # seconds into the video to stop at (None = until the end)
     EXCLUDE_BORDER_SECTIONS = True  # skip first/last rows and columns
+    ANALYSIS_WIDTH = None  # analyze frames downscaled to this width, drawing at full size (None = full resolution)
+    HEADLESS = False  # no display window; visualization is only drawn when writing an output file
+
+    # Change detection (see change_gate.py)
+    CHANGE_GATE = False  # skip the search on sections that did not change between the frames
+    CHANGE_THRESHOLD = 2.0  # mean absolute gray level difference below which a section is static
+
+    # Region of interest (see roi.py)
+    ROI_POLYGONS = None  # only analyze inside these polygons: [[(x, y), ...], ...] as fractions of width/height
+    MASK_IMAGE = None  # image whose nonzero pixels are analyzed, scaled to the frame (None = all pixels)
+    AUTO_LETTERBOX = False  # detect black bars on frames spread over a video and leave them out
+    LETTERBOX_THRESHOLD = 24  # brightest gray level of a letterbox row or column
+    ROI_MIN_COVERAGE = 0.25  # sections with a smaller fraction of analyzed pixels are not created
+
+    # Live streaming (process_stream)
+    LATENCY_TARGET_MS = 200  # frames older than this when analysis could start are dropped
+
+    # Telemetry
+    TELEMETRY_FILE = None  # periodically write run metrics here: .prom/.txt for Prometheus text, else JSON (None = off)
+    TELEMETRY_INTERVAL = 10.0  # seconds between telemetry file updates
+
+    # Batch processing (batch_runner.py)
+    BATCH_CHUNK_FRAMES = 1800  # frames per job; longer videos are split into chunks
+    BATCH_JOBS = None  # parallel chunk jobs (None = one per CPU)
+
+    # Result cache
+    CACHE_DIR = None  # directory for cached analysis results (None = no caching)
+    CACHE_MAX_MB = 2048  # cache size limit; least recently used entries are removed beyond it
+
+    # Parallel processing
+    NUM_WORKERS = 1  # worker processes for motion analysis (1 = analyze in the main process)
+    PIPELINE_QUEUE_SIZE = None  # max frame pairs in flight with workers (None = 2 per worker)
+    DECODE_QUEUE_SIZE = 4  # frames decoded ahead on a background thread (0 = decode inline)
+    ENCODE_QUEUE_SIZE = 4  # frames queued for the background encoder thread (0 = encode inline)
+    BUFFER_POOL = False  # decode, convert and draw into recycled buffers instead of new arrays per frame
 
     # 8 directional offsets (dx, dy)
     DIRECTIONS = [
@@ -38,4 +120,135 @@ class Config:
     ]
 
     DIRECTION_NAMES = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
-    DIRECTION_ANGLES = [0, 45, 90, 135, 180, 225, 270, 315]  # degrees
\ No newline at end of file
+    DIRECTION_ANGLES = [0, 45, 90, 135, 180, 225, 270, 315]  # degrees
+
+    def __init__(self, **overrides):
+        names = self.setting_names()
+        unknown = sorted(set(overrides) - set(names))
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(unknown)}")
+
+        for name in names:
+            object.__setattr__(self, name, _freeze(overrides.get(name, getattr(type(self), name))))
+        self.validate()
+
+        # Derived tables: candidate offsets in pixels and direction angles, per direction
+        offsets = tuple((dx * self.SEARCH_STEP_SIZE, dy * self.SEARCH_STEP_SIZE) for dx, dy in self.DIRECTIONS)
+        offset_table = np.array(offsets, dtype=np.int64).reshape(-1, 2)
+        angle_table = np.array(self.DIRECTION_ANGLES, dtype=np.float64)
+        offset_table.flags.writeable = False
+        angle_table.flags.writeable = False
+        object.__setattr__(self, 'direction_offsets', offsets)
+        object.__setattr__(self, 'offset_table', offset_table)
+        object.__setattr__(self, 'angle_table', angle_table)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Config is immutable; use replace({name}=...) instead")
+
+    def __delattr__(self, name):
+        raise AttributeError("Config is immutable")
+
+    def __repr__(self) -> str:
+        changed = {name: value for name, value in self.to_dict().items()
+                   if value != _freeze(getattr(type(self), name))}
+        return f"Config({', '.join(f'{name}={value!r}' for name, value in changed.items())})"
+
+    @classmethod
+    def setting_names(cls) -> List[str]:
+        return [name for name in dir(cls) if name.isupper()]
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.setting_names()}
+
+    def replace(self, **overrides) -> 'Config':
+        """New config with these settings changed and everything else kept."""
+        settings = self.to_dict()
+        settings.update(overrides)
+        return Config(**settings)
+
+    def validate(self):
+        def check(condition: bool, message: str):
+            if not condition:
+                raise ValueError(f"Invalid configuration: {message}")
+
+        def is_int(value) -> bool:
+            return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+
+        def optional_positive(value) -> bool:
+            return value is None or (isinstance(value, (int, float)) and value > 0)
+
+        min_grid = 3 if self.EXCLUDE_BORDER_SECTIONS else 1
+        check(is_int(self.GRID_ROWS) and self.GRID_ROWS >= min_grid,
+              f"GRID_ROWS must be an integer >= {min_grid}")
+        check(is_int(self.GRID_COLS) and self.GRID_COLS >= min_grid,
+              f"GRID_COLS must be an integer >= {min_grid}")
+        check(is_int(self.SEARCH_STEP_SIZE) and self.SEARCH_STEP_SIZE >= 1,
+              "SEARCH_STEP_SIZE must be an integer >= 1")
+        check(isinstance(self.MOTION_THRESHOLD, (int, float)), "MOTION_THRESHOLD must be a number")
+        check(self.MATCH_MODE in MATCH_MODES, f"MATCH_MODE must be one of {', '.join(MATCH_MODES)}")
+        check(is_int(self.PYRAMID_LEVELS) and self.PYRAMID_LEVELS >= 1, "PYRAMID_LEVELS must be >= 1")
+        check(is_int(self.PYRAMID_SEARCH_RADIUS) and self.PYRAMID_SEARCH_RADIUS >= 1,
+              "PYRAMID_SEARCH_RADIUS must be >= 1")
+        check(is_int(self.PYRAMID_REFINE_RADIUS) and self.PYRAMID_REFINE_RADIUS >= 1,
+              "PYRAMID_REFINE_RADIUS must be >= 1")
+        check(self.PRUNE_ACCEPT_SCORE is None or (isinstance(self.PRUNE_ACCEPT_SCORE, (int, float)) and
+                                                  -1 <= self.PRUNE_ACCEPT_SCORE <= 1),
+              "PRUNE_ACCEPT_SCORE must be None or in [-1, 1]")
+        check(is_int(self.PRUNE_BOUND_BLOCKS) and self.PRUNE_BOUND_BLOCKS >= 1, "PRUNE_BOUND_BLOCKS must be >= 1")
+        check(is_int(self.MAX_RECURSIVE_DEPTH) and self.MAX_RECURSIVE_DEPTH >= 0,
+              "MAX_RECURSIVE_DEPTH must be >= 0")
+        check(is_int(self.RECURSIVE_SUBDIVISION_FACTOR) and self.RECURSIVE_SUBDIVISION_FACTOR >= 2,
+              "RECURSIVE_SUBDIVISION_FACTOR must be >= 2")
+        check(isinstance(self.WARM_START_ACCEPT_SCORE, (int, float)) and -1 <= self.WARM_START_ACCEPT_SCORE <= 1,
+              "WARM_START_ACCEPT_SCORE must be in [-1, 1]")
+        check(self.RECURSION_MODE in RECURSION_MODES,
+              f"RECURSION_MODE must be one of {', '.join(RECURSION_MODES)}")
+        check(optional_positive(self.RECURSION_BUDGET_MS), "RECURSION_BUDGET_MS must be None or > 0")
+        check(optional_positive(self.RECURSION_BUDGET_EVALUATIONS),
+              "RECURSION_BUDGET_EVALUATIONS must be None or > 0")
+        check(self.GLOBAL_MOTION in GLOBAL_MOTION_MODES,
+              f"GLOBAL_MOTION must be one of {', '.join(GLOBAL_MOTION_MODES)}")
+        check(is_int(self.GLOBAL_MOTION_WIDTH) and self.GLOBAL_MOTION_WIDTH >= 16,
+              "GLOBAL_MOTION_WIDTH must be >= 16")
+        check(not self.SUBTRACT_GLOBAL_MOTION or self.GLOBAL_MOTION == 'estimate',
+              "SUBTRACT_GLOBAL_MOTION requires GLOBAL_MOTION = 'estimate'")
+        check(is_int(self.FRAME_SKIP) and self.FRAME_SKIP >= 1, "FRAME_SKIP must be >= 1")
+        check(self.MAX_FRAMES is None or (is_int(self.MAX_FRAMES) and self.MAX_FRAMES >= 1),
+              "MAX_FRAMES must be None or >= 1")
+        check(is_int(self.SKIP_FRAMES) and self.SKIP_FRAMES >= 0, "SKIP_FRAMES must be >= 0")
+        check(self.START_TIME is None or (isinstance(self.START_TIME, (int, float)) and self.START_TIME >= 0),
+              "START_TIME must be None or >= 0")
+        check(self.END_TIME is None or (isinstance(self.END_TIME, (int, float)) and
+                                        self.END_TIME > (self.START_TIME or 0)),
+              "END_TIME must be None or after START_TIME")
+        check(self.ANALYSIS_WIDTH is None or (is_int(self.ANALYSIS_WIDTH) and self.ANALYSIS_WIDTH >= 16),
+              "ANALYSIS_WIDTH must be None or >= 16")
+        check(isinstance(self.CHANGE_THRESHOLD, (int, float)) and self.CHANGE_THRESHOLD >= 0,
+              "CHANGE_THRESHOLD must be >= 0")
+        check(self.ROI_POLYGONS is None or (
+            isinstance(self.ROI_POLYGONS, tuple) and all(
+                isinstance(polygon, tuple) and len(polygon) >= 3 and all(
+                    isinstance(point, tuple) and len(point) == 2 and
+                    all(isinstance(v, (int, float)) and 0 <= v <= 1 for v in point) for point in polygon)
+                for polygon in self.ROI_POLYGONS)),
+              "ROI_POLYGONS must be None or a list of polygons of >= 3 (x, y) points in [0, 1]")
+        check(self.MASK_IMAGE is None or isinstance(self.MASK_IMAGE, str), "MASK_IMAGE must be None or a path")
+        check(is_int(self.LETTERBOX_THRESHOLD) and 0 <= self.LETTERBOX_THRESHOLD < 255,
+              "LETTERBOX_THRESHOLD must be in [0, 255)")
+        check(isinstance(self.ROI_MIN_COVERAGE, (int, float)) and 0 < self.ROI_MIN_COVERAGE <= 1,
+              "ROI_MIN_COVERAGE must be in (0, 1]")
+        check(isinstance(self.LATENCY_TARGET_MS, (int, float)) and self.LATENCY_TARGET_MS > 0,
+              "LATENCY_TARGET_MS must be > 0")
+        check(isinstance(self.TELEMETRY_INTERVAL, (int, float)) and self.TELEMETRY_INTERVAL > 0,
+              "TELEMETRY_INTERVAL must be > 0")
+        check(is_int(self.BATCH_CHUNK_FRAMES) and self.BATCH_CHUNK_FRAMES >= 2, "BATCH_CHUNK_FRAMES must be >= 2")
+        check(self.BATCH_JOBS is None or (is_int(self.BATCH_JOBS) and self.BATCH_JOBS >= 1),
+              "BATCH_JOBS must be None or >= 1")
+        check(isinstance(self.CACHE_MAX_MB, (int, float)) and self.CACHE_MAX_MB > 0, "CACHE_MAX_MB must be > 0")
+        check(is_int(self.NUM_WORKERS) and self.NUM_WORKERS >= 1, "NUM_WORKERS must be >= 1")
+        check(self.PIPELINE_QUEUE_SIZE is None or (is_int(self.PIPELINE_QUEUE_SIZE) and self.PIPELINE_QUEUE_SIZE >= 1),
+              "PIPELINE_QUEUE_SIZE must be None or >= 1")
+        check(is_int(self.DECODE_QUEUE_SIZE) and self.DECODE_QUEUE_SIZE >= 0, "DECODE_QUEUE_SIZE must be >= 0")
+        check(is_int(self.ENCODE_QUEUE_SIZE) and self.ENCODE_QUEUE_SIZE >= 0, "ENCODE_QUEUE_SIZE must be >= 0")
+        check(len(self.DIRECTIONS) == len(self.DIRECTION_NAMES) == len(self.DIRECTION_ANGLES),
+              "DIRECTIONS, DIRECTION_NAMES and DIRECTION_ANGLES must have the same length")
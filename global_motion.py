@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+
+class GlobalMotionEstimator:
+    """Camera motion between two frames from phase correlation on downscaled copies.
+
+    Costs two small FFTs per frame pair instead of a search per section, and
+    gives a sub-pixel (dx, dy) displacement of the frame content with the
+    correlation peak response (0-1) as its confidence. The downscaled copy of
+    the current frame is kept, so the next pair reuses it as its previous frame.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._window = None
+        self._last: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        if self._last is not None and self._last[0] is frame:
+            return self._last[1]
+
+        height, width = frame.shape[:2]
+        target_width = min(self.config.GLOBAL_MOTION_WIDTH, width)
+        size = (target_width, max(1, round(height * target_width / width)))
+        small = frame if size == (width, height) else cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        small = small.astype(np.float32)
+
+        if self._window is None or self._window.shape != small.shape:
+            # Tapers the borders so the wrap-around of the FFT doesn't add a false peak at 0
+            self._window = cv2.createHanningWindow(size, cv2.CV_32F)
+        self._last = (frame, small)
+        return small
+
+    def estimate(self, prev_frame: np.ndarray, curr_frame: np.ndarray) -> Tuple[float, float, float]:
+        """(dx, dy, response): content displacement in frame pixels and the peak response."""
+        prev_small = self._prepare(prev_frame)
+        curr_small = self._prepare(curr_frame)
+        (dx, dy), response = cv2.phaseCorrelate(prev_small, curr_small, self._window)
+
+        scale = prev_frame.shape[1] / prev_small.shape[1]
+        return dx * scale, dy * scale, float(response)
+
+    @staticmethod
+    def compensate(frame: np.ndarray, dx: float, dy: float) -> np.ndarray:
+        """Shift frame content back by the (rounded) global motion, so only local motion remains."""
+        shift_x, shift_y = int(round(dx)), int(round(dy))
+        if shift_x == 0 and shift_y == 0:
+            return frame
+        matrix = np.float32([[1, 0, -shift_x], [0, 1, -shift_y]])
+        return cv2.warpAffine(frame, matrix, (frame.shape[1], frame.shape[0]), borderMode=cv2.BORDER_REPLICATE)
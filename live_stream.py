@@ -0,0 +1,158 @@
+import threading
+import time
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+from synthetic_video import RESOLUTIONS, frame_transform, make_texture, scenario_motion
+
+
+class SyntheticCamera:
+    """Stand-in for a live camera: synthetic motion frames delivered in real time.
+
+    Supports the parts of cv2.VideoCapture the streaming mode uses. read()
+    blocks until the next frame is due at `fps`, like a camera would; a reader
+    that falls behind gets the frame due now rather than a backlog.
+    """
+
+    def __init__(self, width: int = 1280, height: int = 720, fps: float = 30, scenario: str = 'translate',
+                 frames: Optional[int] = None, seed: int = 0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = frames
+        self.motion = scenario_motion(scenario)
+        self.noise = self.motion.pop('noise', 0.0)
+        self.texture = make_texture(width, height, seed)
+        self.rng = np.random.default_rng(seed + 1)
+        self._index = 0
+        self._start = None
+        self._opened = True
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        return 0.0
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self._opened or (self.frames is not None and self._index >= self.frames):
+            return False, None
+
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = now
+        else:
+            # Wait for the next frame time; if we're late, jump to the frame due now
+            due = self._start + self._index / self.fps
+            if due > now:
+                time.sleep(due - now)
+            else:
+                self._index = max(self._index, int((now - self._start) * self.fps))
+
+        matrix = frame_transform(self._index, self.width, self.height, **self.motion)
+        frame = cv2.warpAffine(self.texture, matrix, (self.width, self.height), flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_REFLECT)
+        if self.noise > 0:
+            grain = self.rng.normal(0, self.noise, frame.shape)
+            frame = np.clip(frame + grain, 0, 255).astype(np.uint8)
+        self._index += 1
+        return True, frame
+
+    def release(self):
+        self._opened = False
+
+
+def open_stream(source: str):
+    """Open a live source: a device index ("0"), a stream URL, or "synthetic[:scenario[:resolution]]"."""
+    if source.startswith('synthetic'):
+        parts = source.split(':')
+        scenario = parts[1] if len(parts) > 1 and parts[1] else 'translate'
+        resolution = parts[2] if len(parts) > 2 else '720p'
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        width, height = RESOLUTIONS[resolution]
+        return SyntheticCamera(width, height, scenario=scenario)
+
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open stream: {source}")
+    # Ask the backend not to queue frames on its side either, where supported
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class LatestFrameSource:
+    """Reads a live capture on a background thread, keeping only the newest frame.
+
+    latest() returns the newest frame not handed out yet, with its sequence
+    number and capture time. Frames replaced before anyone took them are
+    counted in `dropped` instead of being queued, so a slow consumer always
+    works on fresh frames.
+
+    The source owns the capture from then on: the reading thread releases it
+    when it exits, so it is never released during a read().
+    """
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.captured = 0
+        self.dropped = 0
+        self._latest = None
+        self._taken = 0
+        self._ended = False
+        self._running = True
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while self._running:
+                ret, frame = self.cap.read()
+                captured_at = time.perf_counter()
+                with self._condition:
+                    if not ret:
+                        break
+                    self.captured += 1
+                    if self._latest is not None and self._latest[0] > self._taken:
+                        self.dropped += 1
+                    self._latest = (self.captured, captured_at, frame)
+                    self._condition.notify_all()
+        finally:
+            with self._condition:
+                self._ended = True
+                self._condition.notify_all()
+            self.cap.release()
+
+    def latest(self, timeout: Optional[float] = None) -> Optional[Tuple[int, float, np.ndarray]]:
+        """(sequence, captured_at, frame) of the newest unseen frame; None once the stream ended."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._ended or (self._latest is not None and self._latest[0] > self._taken),
+                timeout)
+            if self._latest is None or self._latest[0] <= self._taken:
+                return None
+            self._taken = self._latest[0]
+            return self._latest
+
+    def close(self, timeout: float = 1.0):
+        self._running = False
+        # A blocked read() on a live device can't be interrupted; don't wait on it forever.
+        # The thread releases the capture itself once that read() returns.
+        self._thread.join(timeout)
+
+
+def latency_summary(latencies_ms) -> str:
+    if not latencies_ms:
+        return "no frames analyzed"
+    values = np.asarray(latencies_ms)
+    return (f"mean {values.mean():.0f} ms, p95 {np.percentile(values, 95):.0f} ms, "
+            f"max {values.max():.0f} ms")
+
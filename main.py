@@ -3,10 +3,31 @@ import argparse
 from motion_analyzer import VideoMotionAnalyzer
 from config import Config
 
+def parse_polygon(points: str):
+    """'x,y x,y ...' -> [(x, y), ...]"""
+    try:
+        return [tuple(float(value) for value in point.split(',')) for point in points.split()]
+    except ValueError:
+        raise ValueError(f"Invalid ROI polygon: {points}")
+
 def main():
     parser = argparse.ArgumentParser(description='Video Motion Analyzer')
-    parser.add_argument('input_video', help='Path to input video file')
+    parser.add_argument('input_video',
+                       help='Path to input video file, or with --live a device index, stream URL or '
+                            '"synthetic[:scenario[:resolution]]"')
     parser.add_argument('-o', '--output', help='Path to output video file (optional)')
+    parser.add_argument('--export', metavar='DIR',
+                       help='Write every frame\'s motion field to a columnar export directory (optional)')
+    parser.add_argument('--cache-dir', metavar='DIR',
+                       help='Cache analysis results here and reuse them on later runs (optional)')
+    parser.add_argument('--telemetry', metavar='FILE',
+                       help='Periodically write run metrics to FILE (.prom/.txt: Prometheus text, else JSON)')
+    parser.add_argument('--telemetry-interval', type=float, metavar='SECONDS',
+                       help='Seconds between telemetry file updates, default: 10')
+    parser.add_argument('--live', action='store_true',
+                       help='Treat the input as a live source: analyze the newest frame, dropping stale ones')
+    parser.add_argument('--latency-ms', type=float, metavar='MS',
+                       help='Live mode: end-to-end latency target, default: 200')
     parser.add_argument('--grid-size', type=int, nargs=2, metavar=('ROWS', 'COLS'),
                        help='Grid size (rows cols), default: 16 16')
     parser.add_argument('--step-size', type=int, metavar='PIXELS',
@@ -19,36 +40,181 @@ def main():
                        help='Process only first N frames (default: all frames)')
     parser.add_argument('--skip-frames', type=int, metavar='N',
                        help='Skip first N frames before processing (default: 0)')
+    parser.add_argument('--start', type=float, metavar='SECONDS',
+                       help='Start analyzing at this time in the video (seeks, no decoding before it)')
+    parser.add_argument('--end', type=float, metavar='SECONDS',
+                       help='Stop analyzing at this time in the video')
+    parser.add_argument('--analysis-width', type=int, metavar='PIXELS',
+                       help='Analyze motion on frames downscaled to this width (default: full resolution)')
+    parser.add_argument('--match-mode', choices=['template', 'vectorized', 'pyramid'],
+                       help='Direction scoring engine, default: template')
+    parser.add_argument('--pyramid-levels', type=int, metavar='N',
+                       help='Pyramid levels for --match-mode pyramid, default: 3')
+    parser.add_argument('--recursion-mode', choices=['threshold', 'adaptive'],
+                       help='Subdivision scheduling, default: threshold')
+    parser.add_argument('--budget-ms', type=float, metavar='MS',
+                       help='Adaptive recursion: per-frame analysis time budget')
+    parser.add_argument('--budget-evals', type=int, metavar='N',
+                       help='Adaptive recursion: per-frame candidate evaluation budget')
+    parser.add_argument('--pruned-search', action='store_true',
+                       help='Template mode: try likely directions first and skip those that cannot win')
+    prune_accept = parser.add_mutually_exclusive_group()
+    prune_accept.add_argument('--prune-accept', type=float, metavar='SCORE',
+                              help='Pruned search: stop a section at this score, default: 0.95')
+    prune_accept.add_argument('--prune-exact', action='store_true',
+                              help='Pruned search: only skip directions by bound, so results match a full search')
+    parser.add_argument('--global-motion', choices=['off', 'estimate', 'only'],
+                       help="Estimate camera motion by phase correlation: alongside the grid, or instead of it")
+    parser.add_argument('--subtract-global', action='store_true',
+                       help='With --global-motion estimate: show section motion relative to the camera')
+    parser.add_argument('--change-gate', action='store_true',
+                       help='Skip the motion search on sections that did not change between the frames')
+    parser.add_argument('--change-threshold', type=float, metavar='LEVELS',
+                       help='Change gate: mean absolute gray level difference below which a section is static, '
+                            'default: 2.0')
+    parser.add_argument('--roi', action='append', metavar='POINTS',
+                       help='Only analyze inside this polygon: "x,y x,y x,y ..." as fractions of the frame '
+                            'width and height (repeatable)')
+    parser.add_argument('--mask', metavar='IMAGE',
+                       help='Only analyze where this mask image is nonzero (scaled to the frame)')
+    parser.add_argument('--letterbox', action='store_true',
+                       help='Detect black letterbox bars and leave them out of the analysis')
+    parser.add_argument('--warm-start', action='store_true',
+                       help="Seed each frame's search from the previous frame's motion field")
+    parser.add_argument('--headless', action='store_true',
+                       help='Run without a display window; only draw frames when writing --output')
+    parser.add_argument('--workers', type=int, metavar='N',
+                       help='Analyze frame pairs in N worker processes, default: 1')
+    parser.add_argument('--queue-size', type=int, metavar='N',
+                       help='Max frame pairs in flight with --workers, default: 2 per worker')
+    parser.add_argument('--buffer-pool', action='store_true',
+                       help='Decode, convert and draw into recycled buffers instead of new arrays per frame')
 
     args = parser.parse_args()
 
-    # Update configuration if arguments provided
-    if args.grid_size:
-        Config.GRID_ROWS, Config.GRID_COLS = args.grid_size
-    if args.step_size:
-        Config.SEARCH_STEP_SIZE = args.step_size
-    if args.max_depth:
-        Config.MAX_RECURSIVE_DEPTH = args.max_depth
-    if args.motion_threshold:
-        Config.MOTION_THRESHOLD = args.motion_threshold
-    if args.max_frames:
-        Config.MAX_FRAMES = args.max_frames
-    if args.skip_frames:
-        Config.SKIP_FRAMES = args.skip_frames
+    # Settings given on the command line override the config.py defaults
+    overrides = {}
+    if args.grid_size is not None:
+        overrides['GRID_ROWS'], overrides['GRID_COLS'] = args.grid_size
+    if args.step_size is not None:
+        overrides['SEARCH_STEP_SIZE'] = args.step_size
+    if args.max_depth is not None:
+        overrides['MAX_RECURSIVE_DEPTH'] = args.max_depth
+    if args.motion_threshold is not None:
+        overrides['MOTION_THRESHOLD'] = args.motion_threshold
+    if args.max_frames is not None:
+        overrides['MAX_FRAMES'] = args.max_frames
+    if args.skip_frames is not None:
+        overrides['SKIP_FRAMES'] = args.skip_frames
+    if args.cache_dir is not None:
+        overrides['CACHE_DIR'] = args.cache_dir
+    if args.telemetry is not None:
+        overrides['TELEMETRY_FILE'] = args.telemetry
+    if args.telemetry_interval is not None:
+        overrides['TELEMETRY_INTERVAL'] = args.telemetry_interval
+    if args.start is not None:
+        overrides['START_TIME'] = args.start
+    if args.end is not None:
+        overrides['END_TIME'] = args.end
+    if args.analysis_width is not None:
+        overrides['ANALYSIS_WIDTH'] = args.analysis_width
+    if args.match_mode is not None:
+        overrides['MATCH_MODE'] = args.match_mode
+    if args.recursion_mode is not None:
+        overrides['RECURSION_MODE'] = args.recursion_mode
+    if args.budget_ms is not None:
+        overrides['RECURSION_BUDGET_MS'] = args.budget_ms
+    if args.budget_evals is not None:
+        overrides['RECURSION_BUDGET_EVALUATIONS'] = args.budget_evals
+    if args.pruned_search:
+        overrides['PRUNED_SEARCH'] = True
+    if args.prune_accept is not None:
+        overrides['PRUNE_ACCEPT_SCORE'] = args.prune_accept
+    if args.prune_exact:
+        overrides['PRUNE_ACCEPT_SCORE'] = None
+    if args.global_motion is not None:
+        overrides['GLOBAL_MOTION'] = args.global_motion
+    if args.subtract_global:
+        overrides['SUBTRACT_GLOBAL_MOTION'] = True
+    if args.change_gate:
+        overrides['CHANGE_GATE'] = True
+    if args.change_threshold is not None:
+        overrides['CHANGE_THRESHOLD'] = args.change_threshold
+    if args.mask is not None:
+        overrides['MASK_IMAGE'] = args.mask
+    if args.letterbox:
+        overrides['AUTO_LETTERBOX'] = True
+    if args.warm_start:
+        overrides['TEMPORAL_WARM_START'] = True
+    if args.headless:
+        overrides['HEADLESS'] = True
+    if args.pyramid_levels is not None:
+        overrides['PYRAMID_LEVELS'] = args.pyramid_levels
+    if args.workers is not None:
+        overrides['NUM_WORKERS'] = args.workers
+    if args.queue_size is not None:
+        overrides['PIPELINE_QUEUE_SIZE'] = args.queue_size
+    if args.buffer_pool:
+        overrides['BUFFER_POOL'] = True
+    if args.latency_ms is not None:
+        overrides['LATENCY_TARGET_MS'] = args.latency_ms
+    if (args.live and overrides.get('RECURSION_MODE') == 'adaptive'
+            and 'RECURSION_BUDGET_MS' not in overrides):
+        # Leave half of the latency target for capture, drawing and display
+        overrides['RECURSION_BUDGET_MS'] = overrides.get('LATENCY_TARGET_MS', Config.LATENCY_TARGET_MS) / 2
+
+    try:
+        if args.roi is not None:
+            overrides['ROI_POLYGONS'] = [parse_polygon(points) for points in args.roi]
+        config = Config(**overrides)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
     print("Video Motion Analyzer")
     print("=" * 50)
-    print(f"Grid Size: {Config.GRID_ROWS}x{Config.GRID_COLS}")
-    print(f"Search Step Size: {Config.SEARCH_STEP_SIZE} pixels")
-    print(f"Max Recursive Depth: {Config.MAX_RECURSIVE_DEPTH}")
-    print(f"Motion Threshold: {Config.MOTION_THRESHOLD}")
-    print(f"Max Frames: {Config.MAX_FRAMES if Config.MAX_FRAMES else 'All'}")
-    print(f"Skip Frames: {Config.SKIP_FRAMES}")
+    print(f"Grid Size: {config.GRID_ROWS}x{config.GRID_COLS}")
+    print(f"Search Step Size: {config.SEARCH_STEP_SIZE} pixels")
+    print(f"Max Recursive Depth: {config.MAX_RECURSIVE_DEPTH}")
+    print(f"Motion Threshold: {config.MOTION_THRESHOLD}")
+    print(f"Max Frames: {config.MAX_FRAMES if config.MAX_FRAMES else 'All'}")
+    print(f"Skip Frames: {config.SKIP_FRAMES}")
+    if config.START_TIME is not None or config.END_TIME is not None:
+        print(f"Time Range: {config.START_TIME or 0:.2f}s - "
+              f"{f'{config.END_TIME:.2f}s' if config.END_TIME is not None else 'end'}")
+    print(f"Analysis Width: {config.ANALYSIS_WIDTH or 'Full'}")
+    print(f"Match Mode: {config.MATCH_MODE}")
+    print(f"Recursion Mode: {config.RECURSION_MODE}")
+    if config.GLOBAL_MOTION != 'off':
+        print(f"Global Motion: {config.GLOBAL_MOTION}"
+              f"{' (subtracted from sections)' if config.SUBTRACT_GLOBAL_MOTION else ''}")
+    if config.ROI_POLYGONS or config.MASK_IMAGE or config.AUTO_LETTERBOX:
+        regions = []
+        if config.ROI_POLYGONS:
+            regions.append(f"{len(config.ROI_POLYGONS)} ROI polygon(s)")
+        if config.MASK_IMAGE:
+            regions.append(f"mask {config.MASK_IMAGE}")
+        if config.AUTO_LETTERBOX:
+            regions.append("letterbox detection")
+        print(f"Analyzed Region: {', '.join(regions)}")
+    if config.CHANGE_GATE:
+        print(f"Change Gate: static below {config.CHANGE_THRESHOLD} gray levels")
+    print(f"Workers: {config.NUM_WORKERS}")
+    if config.BUFFER_POOL:
+        print("Buffer Pool: on")
+    print(f"Headless: {config.HEADLESS}")
+    if config.TELEMETRY_FILE:
+        print(f"Telemetry: {config.TELEMETRY_FILE} every {config.TELEMETRY_INTERVAL}s")
+    if args.live:
+        print(f"Live Source: latency target {config.LATENCY_TARGET_MS} ms")
     print("=" * 50)
 
     try:
-        analyzer = VideoMotionAnalyzer()
-        analyzer.process_video(args.input_video, args.output)
+        analyzer = VideoMotionAnalyzer(config)
+        if args.live:
+            analyzer.process_stream(args.input_video, args.output)
+        else:
+            analyzer.process_video(args.input_video, args.output, export_path=args.export)
     except Exception as e:
         print(f"Error processing video: {e}")
         sys.exit(1)
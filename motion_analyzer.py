@@ -1,9 +1,26 @@
 import cv2
 import numpy as np
 from config import Config
-from typing import List, Tuple, Optional
+from batch_matcher import BatchMotionMatcher
+from change_gate import STATIC_DIRECTION, ChangeGate
+from frame_stats import FrameStatsCache
+from global_motion import GlobalMotionEstimator
+from motion_field import MotionField
+from motion_renderer import MotionRenderer
+from pruned_search import BOUND_EPSILON, PrunedDirectionSearch
+from pyramid_search import PyramidMotionSearch
+from recursion_scheduler import RecursionScheduler
+from roi import LETTERBOX_SAMPLES, RegionMask, detect_letterbox
+from telemetry import Telemetry
+from video_io import AsyncVideoWriter, BufferPool, FramePrefetcher, frame_range, seek_to_frame
+import time
+from typing import Dict, List, Tuple, Optional
 import colorsys
 
+# Buffers a pool keeps beyond what the queues hold, for frames held by the loops and frame caches
+POOL_SPARE_BUFFERS = 4
+
+
 class MotionSection:
     def __init__(self, x: int, y: int, width: int, height: int, depth: int = 0):
         self.x = x
@@ -14,18 +31,113 @@ class MotionSection:
         self.motion_angle = 0
         self.motion_strength = 0
         self.best_direction = None
+        self.dx = 0.0  # displacement of the section content in pixels
+        self.dy = 0.0
         self.subsections = []
 
 class VideoMotionAnalyzer:
-    def __init__(self):
-        self.config = Config()
+    def __init__(self, config: Optional[Config] = None):
+        # Settings are per analyzer and immutable, so analyzers can run side by side
+        self.config = config if config is not None else Config()
+        self.frame_stats = FrameStatsCache()
+        self.matcher = BatchMotionMatcher(self.config, self.frame_stats)
+        self.pyramid_search = PyramidMotionSearch(self.config)
+        self.pruned_search = PrunedDirectionSearch(self.config)
+        # Only per-candidate matchTemplate calls are worth pruning; the vectorized engine
+        # scores all candidates for less than the bounds cost, pyramid has its own search
+        self.use_pruned_search = self.config.PRUNED_SEARCH and self.config.MATCH_MODE == 'template'
+        self.recursion_scheduler = RecursionScheduler(self.config)
+        self.global_motion = GlobalMotionEstimator(self.config)
+        # ROI polygons, mask image and letterbox bars; built on the first frame pair
+        self.region_mask = RegionMask(self.config)
+        self.change_gate = ChangeGate(self.config)
+        # Reused for every frame pair, see analyze_motion_field
+        self.motion_field = MotionField()
+        # The same results in frame coordinates when analyzing at ANALYSIS_WIDTH
+        self.frame_field = MotionField()
+        # Temporal warm start state: the last analyzed field and its frame shape
+        self.previous_field: Optional[MotionField] = None
+        self.previous_frame_shape = None
+        # Candidate evaluations performed/saved, for the last frame and in total; with
+        # PRUNED_SEARCH also candidates pruned by bound and sections accepted early, with
+        # CHANGE_GATE sections and whole frames found static (out of all sections)
+        self.last_search_stats = self.empty_search_stats()
+        self.search_totals = self.empty_search_stats()
+        self.renderer = MotionRenderer(self.config, self.angle_to_color)
+        # Optional {stage: seconds} accumulator for the analysis stages, see benchmark.py
+        self.stage_times: Optional[dict] = None
+        # Optional metrics collector with hooks (see telemetry.py); None costs nothing
+        self.telemetry: Optional[Telemetry] = None
+        # Per-frame stage and recursion depth timings, only kept while telemetry is set
+        self._frame_stages = {}
+        self._frame_depths = {}
+        # Decode/encode queue statistics of the last process_video run
+        self.io_stats = {}
+        # Recycled frame, grayscale and output buffers, with BUFFER_POOL
+        self.buffer_pools = self.create_buffer_pools() if self.config.BUFFER_POOL else {}
+        # The compass legend resized to the frame height: (legend, height, resized)
+        self._resized_legend = None
+        # Frame pairs loaded from / added to the result cache in the last run
+        self.cache_stats = {'loaded': 0, 'analyzed': 0}
+        # Capture/drop counts and per-frame latencies of the last process_stream run
+        self.stream_stats = {}
+
+    def create_buffer_pools(self) -> Dict[str, BufferPool]:
+        """One pool per kind of per-frame array, sized for the frames the queues can hold."""
+        in_flight = self.config.PIPELINE_QUEUE_SIZE or 2 * self.config.NUM_WORKERS
+        frames = self.config.DECODE_QUEUE_SIZE + in_flight + POOL_SPARE_BUFFERS
+        return {
+            'frame': BufferPool(frames),
+            'gray': BufferPool(frames),
+            # Full-resolution grayscale before ANALYSIS_WIDTH scaling; never leaves analysis_frame
+            'gray_full': BufferPool(1),
+            'output': BufferPool(self.config.ENCODE_QUEUE_SIZE + POOL_SPARE_BUFFERS),
+        }
+
+    @staticmethod
+    def empty_search_stats() -> dict:
+        return {'evaluations': 0, 'saved': 0, 'pruned': 0, 'accepted': 0,
+                'sections': 0, 'static': 0, 'static_frames': 0}
 
     def load_video(self, video_path: str) -> cv2.VideoCapture:
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError(f"Could not open video file: {video_path}")
+        # Letterbox bars are detected again for every video
+        self.region_mask.reset()
+        if self.config.AUTO_LETTERBOX:
+            self.region_mask.letterbox = self.video_letterbox(video_path)
         return cap
 
+    def video_letterbox(self, video_path: str) -> Optional[Tuple[int, int, int, int]]:
+        """Letterbox bars of a video file, detected on LETTERBOX_SAMPLES frames spread over all of it.
+
+        The bars don't depend on the analyzed range, so every range, batch chunk
+        and cached run of a video leaves out the same pixels. Returns None if no
+        frame could be read.
+        """
+        cap = cv2.VideoCapture(video_path)
+        brightest = None
+        try:
+            last = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) - 1, 0)
+            for target in sorted({i * last // (LETTERBOX_SAMPLES - 1) for i in range(LETTERBOX_SAMPLES)}):
+                if seek_to_frame(cap, target) != target:
+                    break
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                gray_frame = self.analysis_frame(frame)
+                brightest = gray_frame.copy() if brightest is None else np.maximum(brightest, gray_frame)
+        finally:
+            cap.release()
+        return None if brightest is None else detect_letterbox(brightest, self.config.LETTERBOX_THRESHOLD)
+
+    def _section_mask(self, frame_height: int, frame_width: int, xs, ys, ws, hs) -> Optional[np.ndarray]:
+        """Which of these sections to create, or None when no region mask applies."""
+        if not self.region_mask.applies_to(frame_height, frame_width):
+            return None
+        return self.region_mask.keep(xs, ys, ws, hs)
+
     def create_grid_sections(self, frame_height: int, frame_width: int, depth: int = 0) -> List[MotionSection]:
         sections = []
         rows = self.config.GRID_ROWS
@@ -54,18 +166,95 @@ class VideoMotionAnalyzer:
                 section = MotionSection(x, y, width, height, depth)
                 sections.append(section)
 
+        keep = self._section_mask(frame_height, frame_width, *(
+            [getattr(section, name) for section in sections] for name in ('x', 'y', 'width', 'height')))
+        if keep is not None:
+            sections = [section for section, kept in zip(sections, keep) if kept]
         return sections
 
+    def create_grid_field(self, frame_height: int, frame_width: int, field: MotionField) -> MotionField:
+        """Array version of create_grid_sections: fill a (reset) field with the grid sections."""
+        field.reset()
+        rows = self.config.GRID_ROWS
+        cols = self.config.GRID_COLS
+
+        section_height = frame_height // rows
+        section_width = frame_width // cols
+
+        if self.config.EXCLUDE_BORDER_SECTIONS:
+            row_range, col_range = np.arange(1, rows - 1), np.arange(1, cols - 1)
+        else:
+            row_range, col_range = np.arange(rows), np.arange(cols)
+
+        grid_rows, grid_cols = np.meshgrid(row_range, col_range, indexing='ij')
+        xs = grid_cols.ravel() * section_width
+        ys = grid_rows.ravel() * section_height
+        widths = np.minimum(section_width, frame_width - xs)
+        heights = np.minimum(section_height, frame_height - ys)
+
+        keep = self._section_mask(frame_height, frame_width, xs, ys, widths, heights)
+        if keep is not None:
+            xs, ys, widths, heights = xs[keep], ys[keep], widths[keep], heights[keep]
+
+        field.append(xs, ys, widths, heights, 0)
+        return field
+
+    def subdivide_field(self, field: MotionField, rows: np.ndarray) -> Tuple[int, int]:
+        """Array version of create_recursive_subsections for several field rows at once.
+
+        Appends the subsections of every row in `rows` (in that order) and returns
+        the (start, end) row range of the new subsections.
+        """
+        rows = rows[field.depth[rows] < self.config.MAX_RECURSIVE_DEPTH]
+        factor = self.config.RECURSIVE_SUBDIVISION_FACTOR
+
+        xs = field.x[rows].astype(np.int64)[:, None]
+        ys = field.y[rows].astype(np.int64)[:, None]
+        widths = field.width[rows].astype(np.int64)[:, None]
+        heights = field.height[rows].astype(np.int64)[:, None]
+        sub_width = widths // factor
+        sub_height = heights // factor
+
+        # Row-major order of the factor x factor subsections of each parent
+        sub_rows, sub_cols = np.divmod(np.arange(factor * factor), factor)
+        sub_xs = xs + sub_cols * sub_width
+        sub_ys = ys + sub_rows * sub_height
+        actual_widths = np.minimum(sub_width, widths - sub_cols * sub_width)
+        actual_heights = np.minimum(sub_height, heights - sub_rows * sub_height)
+
+        # Minimum size check
+        keep = (actual_widths > 10) & (actual_heights > 10)
+        if self.region_mask.mask is not None:
+            height, width = self.region_mask.mask.shape
+            keep &= self._section_mask(height, width, *np.broadcast_arrays(
+                sub_xs, sub_ys, actual_widths, actual_heights))
+        parents = np.broadcast_to(rows[:, None], keep.shape)
+        depths = np.broadcast_to(field.depth[rows][:, None] + 1, keep.shape)
+
+        return field.append(sub_xs[keep], sub_ys[keep], actual_widths[keep], actual_heights[keep],
+                            depths[keep], parents[keep])
+
     def extract_section(self, frame: np.ndarray, section: MotionSection) -> np.ndarray:
         return frame[section.y:section.y + section.height,
                     section.x:section.x + section.width]
 
+    def section_mean_variance(self, frame: np.ndarray, section: MotionSection) -> Tuple[float, float]:
+        """Mean and variance of a section from the frame's cached integral images."""
+        stats = self.frame_stats.get(frame)
+        mean, variance = stats.mean_variance(section.x, section.y, section.width, section.height)
+        return float(mean), float(variance)
+
     def template_match_score(self, template: np.ndarray, target: np.ndarray) -> float:
         if template.shape != target.shape:
             return 0.0
 
         # Normalize both images to reduce lighting effects
         template_norm = cv2.normalize(template, None, 0, 1, cv2.NORM_MINMAX, dtype=cv2.CV_32F)
+        return self.normalized_match_score(template_norm, target)
+
+    @staticmethod
+    def normalized_match_score(template_norm: np.ndarray, target: np.ndarray) -> float:
+        """template_match_score with the template already normalized, e.g. to reuse it across candidates."""
         target_norm = cv2.normalize(target, None, 0, 1, cv2.NORM_MINMAX, dtype=cv2.CV_32F)
 
         # Use normalized cross-correlation
@@ -77,15 +266,15 @@ class VideoMotionAnalyzer:
         best_score = -1
         best_direction = 0
 
-        for i, (dx, dy) in enumerate(self.config.DIRECTIONS):
+        for i, (dx, dy) in enumerate(self.config.direction_offsets):
             # Calculate new position
-            new_x = section.x + dx * self.config.SEARCH_STEP_SIZE
-            new_y = section.y + dy * self.config.SEARCH_STEP_SIZE
+            new_x = section.x + dx
+            new_y = section.y + dy
 
-            # Check bounds
+            # Check bounds: the candidate must lie inside the frame, touching its edge is fine
             if (new_x < 0 or new_y < 0 or
-                new_x + section.width >= curr_frame.shape[1] or
-                new_y + section.height >= curr_frame.shape[0]):
+                new_x + section.width > curr_frame.shape[1] or
+                new_y + section.height > curr_frame.shape[0]):
                 continue
 
             # Extract candidate section
@@ -123,10 +312,20 @@ class VideoMotionAnalyzer:
                     subsection = MotionSection(sub_x, sub_y, actual_width, actual_height, section.depth + 1)
                     subsections.append(subsection)
 
+        if self.region_mask.mask is not None and subsections:
+            height, width = self.region_mask.mask.shape
+            keep = self._section_mask(height, width, *(
+                [getattr(s, name) for s in subsections] for name in ('x', 'y', 'width', 'height')))
+            subsections = [subsection for subsection, kept in zip(subsections, keep) if kept]
+
         return subsections
 
     def analyze_motion_recursive(self, prev_frame: np.ndarray, curr_frame: np.ndarray,
                                sections: List[MotionSection]) -> List[MotionSection]:
+        # The change gate checks a whole level of sections at once
+        if self.config.MATCH_MODE != 'template' or self.config.CHANGE_GATE:
+            return self.analyze_motion_batched(prev_frame, curr_frame, sections)
+
         analyzed_sections = []
 
         for section in sections:
@@ -134,12 +333,23 @@ class VideoMotionAnalyzer:
             prev_section = self.extract_section(prev_frame, section)
 
             # Find best motion direction
-            best_dir, score = self.find_best_motion_direction(prev_section, curr_frame, section)
+            started = time.perf_counter()
+            geometry = ([section.x], [section.y], [section.width], [section.height])
+            if self._masked_rows(curr_frame, *geometry) is not None:
+                scores = self.matcher.score_masked_sections(prev_frame, curr_frame, self.region_mask.mask,
+                                                            *(np.array(values) for values in geometry))
+                best_dirs, best_scores = self.matcher.best_directions(scores)
+                best_dir, score = int(best_dirs[0]), float(best_scores[0])
+            else:
+                best_dir, score = self.find_best_motion_direction(prev_section, curr_frame, section)
+            if self.telemetry is not None:
+                self._record_depths(np.array([section.depth]), started)
 
             # Store results
             section.best_direction = best_dir
             section.motion_angle = self.config.DIRECTION_ANGLES[best_dir]
             section.motion_strength = score
+            section.dx, section.dy = self.config.direction_offsets[best_dir]
 
             analyzed_sections.append(section)
 
@@ -152,8 +362,469 @@ class VideoMotionAnalyzer:
                     analyzed_subsections = self.analyze_motion_recursive(prev_frame, curr_frame, subsections)
                     section.subsections = analyzed_subsections
 
+        self._count_evaluations(len(sections), len(sections) * len(self.config.DIRECTIONS))
         return analyzed_sections
 
+    def template_score_matrix(self, prev_frame: np.ndarray, curr_frame: np.ndarray,
+                              xs: np.ndarray, ys: np.ndarray, widths: np.ndarray, heights: np.ndarray,
+                              evaluate: Optional[np.ndarray] = None) -> np.ndarray:
+        """(N, len(DIRECTIONS)) template_match_score matrix.
+
+        Out-of-bounds candidates, and candidates left out by the optional boolean
+        `evaluate` mask, are -inf.
+        """
+        scores = np.full((len(xs), len(self.config.DIRECTIONS)), -np.inf)
+        if evaluate is None:
+            evaluate = np.ones(scores.shape, dtype=bool)
+
+        # Candidates come row by row, so each previous-frame section is extracted and normalized once
+        section_row = -1
+        for row, i in zip(*(index.tolist() for index in np.nonzero(evaluate))):
+            if row != section_row:
+                section = MotionSection(int(xs[row]), int(ys[row]), int(widths[row]), int(heights[row]))
+                prev_norm = cv2.normalize(self.extract_section(prev_frame, section), None, 0, 1,
+                                          cv2.NORM_MINMAX, dtype=cv2.CV_32F)
+                section_row = row
+
+            dx, dy = self.config.direction_offsets[i]
+            new_x = section.x + dx
+            new_y = section.y + dy
+
+            # Same bounds rule as find_best_motion_direction
+            if (new_x < 0 or new_y < 0 or
+                new_x + section.width > curr_frame.shape[1] or
+                new_y + section.height > curr_frame.shape[0]):
+                continue
+
+            candidate = curr_frame[new_y:new_y + section.height, new_x:new_x + section.width]
+            scores[row, i] = self.normalized_match_score(prev_norm, candidate)
+
+        return scores
+
+    def direction_score_matrix(self, prev_frame: np.ndarray, curr_frame: np.ndarray,
+                               xs: np.ndarray, ys: np.ndarray, widths: np.ndarray, heights: np.ndarray,
+                               evaluate: Optional[np.ndarray] = None) -> np.ndarray:
+        """Direction scores from the template or vectorized engine, per MATCH_MODE.
+
+        Partly masked sections are scored on their valid pixels instead (see roi.py).
+        """
+        masked = self._masked_rows(curr_frame, xs, ys, widths, heights)
+        if masked is not None:
+            if evaluate is None:
+                evaluate = np.ones((len(xs), len(self.config.DIRECTIONS)), dtype=bool)
+            full_evaluate = evaluate.copy()
+            full_evaluate[masked] = False
+        else:
+            full_evaluate = evaluate
+
+        if self.config.MATCH_MODE == 'template':
+            scores = self.template_score_matrix(prev_frame, curr_frame, xs, ys, widths, heights, full_evaluate)
+        else:
+            self.matcher.prepare(prev_frame, curr_frame)
+            scores = self.matcher.score_sections(xs, ys, widths, heights, full_evaluate)
+
+        if masked is not None:
+            scores[masked] = self.matcher.score_masked_sections(prev_frame, curr_frame, self.region_mask.mask,
+                                                                xs[masked], ys[masked], widths[masked],
+                                                                heights[masked], evaluate[masked])
+        return scores
+
+    def _masked_rows(self, curr_frame: np.ndarray, xs, ys, widths, heights) -> Optional[np.ndarray]:
+        """Indices of the partly masked sections, or None if there are none."""
+        if not self.region_mask.applies_to(*curr_frame.shape[:2]):
+            return None
+        masked = np.nonzero(self.region_mask.partial(xs, ys, widths, heights))[0]
+        return masked if len(masked) else None
+
+    def warm_start_score_matrix(self, prev_frame: np.ndarray, curr_frame: np.ndarray,
+                                xs: np.ndarray, ys: np.ndarray, widths: np.ndarray, heights: np.ndarray,
+                                predicted: np.ndarray) -> Tuple[np.ndarray, int]:
+        """Direction scores, trying each section's predicted direction first.
+
+        The predicted direction and its two neighbors are scored first. If the
+        predicted direction beats both neighbors and reaches WARM_START_ACCEPT_SCORE
+        it is accepted and the other directions are never evaluated. Sections
+        without a prediction (-1) get a full search. Returns the scores and the
+        number of candidate evaluations performed.
+        """
+        count = len(self.config.DIRECTIONS)
+        rows = np.arange(len(xs))
+        has_prediction = predicted >= 0
+        center = np.where(has_prediction, predicted, 0)
+        left = (center - 1) % count
+        right = (center + 1) % count
+
+        first = np.zeros((len(xs), count), dtype=bool)
+        for columns in (left, center, right):
+            first[rows, columns] = True
+        first[~has_prediction] = True
+        scores = self.direction_score_matrix(prev_frame, curr_frame, xs, ys, widths, heights, first)
+
+        predicted_scores = scores[rows, center]
+        accepted = (has_prediction &
+                    (predicted_scores >= self.config.WARM_START_ACCEPT_SCORE) &
+                    (predicted_scores > scores[rows, left]) &
+                    (predicted_scores > scores[rows, right]))
+
+        rest = ~first & ~accepted[:, None]
+        if rest.any():
+            rest_scores = self.direction_score_matrix(prev_frame, curr_frame, xs, ys, widths, heights, rest)
+            scores = np.where(rest, rest_scores, scores)
+
+        return scores, int(first.sum() + rest.sum())
+
+    def pruned_score_matrix(self, prev_frame: np.ndarray, curr_frame: np.ndarray,
+                            xs: np.ndarray, ys: np.ndarray, widths: np.ndarray, heights: np.ndarray,
+                            predicted: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Direction scores from a PrunedDirectionSearch; returns (scores, estimates, evaluations)."""
+        def score(mask: np.ndarray) -> np.ndarray:
+            return self.direction_score_matrix(prev_frame, curr_frame, xs, ys, widths, heights, mask)
+
+        def upper_bounds(rows: np.ndarray) -> np.ndarray:
+            bounds = self.pruned_search.upper_bounds(self.frame_stats.get(prev_frame), self.frame_stats.get(curr_frame),
+                                                     xs[rows], ys[rows], widths[rows], heights[rows])
+            masked = self._masked_rows(curr_frame, xs[rows], ys[rows], widths[rows], heights[rows])
+            if masked is not None:
+                # The bounds hold for whole patches only; never prune partly masked sections
+                bounds[masked] = np.where(np.isfinite(bounds[masked]), 1.0 + BOUND_EPSILON, -np.inf)
+            return bounds
+
+        result = self.pruned_search.search(score, upper_bounds, len(xs), predicted)
+        for stats in (self.last_search_stats, self.search_totals):
+            stats['pruned'] += self.pruned_search.last_stats['pruned']
+            stats['accepted'] += self.pruned_search.last_stats['accepted']
+        return result
+
+    def evaluations_per_section(self) -> int:
+        """Candidate evaluations needed to score one section in the current match mode."""
+        if self.config.MATCH_MODE == 'pyramid':
+            return self.pyramid_search.full_search_evaluations()
+        return len(self.config.DIRECTIONS)
+
+    def _count_evaluations(self, sections: int, performed: int):
+        saved = sections * self.evaluations_per_section() - performed
+        for stats in (self.last_search_stats, self.search_totals):
+            stats['evaluations'] += performed
+            stats['saved'] += saved
+            stats['sections'] += sections
+
+    def _count_static(self, sections: int, frames: int = 0):
+        for stats in (self.last_search_stats, self.search_totals):
+            stats['static'] += sections
+            stats['static_frames'] += frames
+
+    def _static_rows(self, prev_frame: np.ndarray, curr_frame: np.ndarray,
+                     xs, ys, widths, heights) -> Optional[np.ndarray]:
+        """Which sections the change gate finds static, or None without CHANGE_GATE."""
+        if not self.config.CHANGE_GATE:
+            return None
+        mask = coverage = None
+        if self.region_mask.applies_to(*curr_frame.shape[:2]):
+            mask = self.region_mask.mask
+            coverage = self.region_mask.coverage(xs, ys, widths, heights)
+        self.change_gate.prepare(prev_frame, curr_frame, mask)
+        return self.change_gate.static(xs, ys, widths, heights, coverage)
+
+    def score_section_arrays(self, prev_frame: np.ndarray, curr_frame: np.ndarray,
+                             xs: np.ndarray, ys: np.ndarray, widths: np.ndarray, heights: np.ndarray,
+                             predictions: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+                             likely_directions: Optional[np.ndarray] = None,
+                             static: Optional[np.ndarray] = None):
+        """Motion results for many sections at once.
+
+        predictions optionally holds (directions, dxs, dys) from the previous frame,
+        with direction -1 where a section has no prediction. likely_directions
+        (e.g. the parent sections' directions, -1 for none) are tried first by the
+        pruned search where there is no prediction. With CHANGE_GATE, sections
+        found static are not searched: they get STATIC_DIRECTION, strength 0 and
+        margin 1. `static` passes in the gate's result if it is already known.
+
+        Returns (directions, angles, strengths, dxs, dys, margins) arrays, where the
+        margin is how far the best score is ahead of the runner-up direction.
+        """
+        if static is None:
+            static = self._static_rows(prev_frame, curr_frame, xs, ys, widths, heights)
+        if static is None or not static.any():
+            return self._search_section_arrays(prev_frame, curr_frame, xs, ys, widths, heights,
+                                               predictions, likely_directions)
+
+        count = len(xs)
+        self._count_static(int(static.sum()))
+        self._count_evaluations(int(static.sum()), 0)
+        results = (np.full(count, STATIC_DIRECTION, dtype=np.int64), np.zeros(count), np.zeros(count),
+                   np.zeros(count), np.zeros(count), np.ones(count))
+
+        moving = np.nonzero(~static)[0]
+        if len(moving):
+            if predictions is not None:
+                predictions = tuple(values[moving] for values in predictions)
+            if likely_directions is not None:
+                likely_directions = likely_directions[moving]
+            searched = self._search_section_arrays(prev_frame, curr_frame, xs[moving], ys[moving],
+                                                   widths[moving], heights[moving], predictions,
+                                                   likely_directions)
+            for values, moving_values in zip(results, searched):
+                values[moving] = moving_values
+        return results
+
+    def _search_section_arrays(self, prev_frame: np.ndarray, curr_frame: np.ndarray,
+                               xs: np.ndarray, ys: np.ndarray, widths: np.ndarray, heights: np.ndarray,
+                               predictions: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+                               likely_directions: Optional[np.ndarray] = None):
+        """score_section_arrays without the change gate."""
+        if self.config.MATCH_MODE == 'pyramid':
+            self.pyramid_search.prepare(prev_frame, curr_frame)
+            predicted_dxs = predicted_dys = None
+            if predictions is not None:
+                has_prediction = predictions[0] >= 0
+                predicted_dxs = np.where(has_prediction, predictions[1], np.nan)
+                predicted_dys = np.where(has_prediction, predictions[2], np.nan)
+            dxs, dys, scores, evaluations = self.pyramid_search.search_sections(
+                xs, ys, widths, heights, predicted_dxs, predicted_dys, self.config.WARM_START_ACCEPT_SCORE)
+            self._count_evaluations(len(xs), evaluations)
+
+            # Continuous angle, with the nearest of the 8 directions for reference
+            angles = np.degrees(np.arctan2(dxs, -dys)) % 360
+            sector = 360 / len(self.config.DIRECTIONS)
+            directions = np.rint(angles / sector).astype(np.int64) % len(self.config.DIRECTIONS)
+
+            # Motion smaller than one search step counts as proportionally weaker
+            magnitude = np.hypot(dxs, dys)
+            strengths = scores * np.minimum(magnitude / self.config.SEARCH_STEP_SIZE, 1.0)
+
+            # A continuous search has no runner-up; treat a weak peak as an ambiguous one
+            margins = np.clip(scores, 0, 1)
+            return directions, angles, strengths, dxs, dys, margins
+
+        estimates = None
+        if self.use_pruned_search:
+            likely = likely_directions
+            if predictions is not None:
+                likely = predictions[0] if likely is None else np.where(predictions[0] >= 0, predictions[0], likely)
+            scores, estimates, evaluations = self.pruned_score_matrix(prev_frame, curr_frame, xs, ys,
+                                                                      widths, heights, likely)
+        elif predictions is not None:
+            scores, evaluations = self.warm_start_score_matrix(prev_frame, curr_frame, xs, ys,
+                                                               widths, heights, predictions[0])
+        else:
+            scores = self.direction_score_matrix(prev_frame, curr_frame, xs, ys, widths, heights)
+            evaluations = scores.size
+        self._count_evaluations(len(xs), evaluations)
+        directions, strengths = self.matcher.best_directions(scores)
+
+        if scores.shape[1] > 1:
+            # Unevaluated candidates count with their score bound, so pruning never hides ambiguity
+            runner_up = np.sort(scores if estimates is None else estimates, axis=1)[:, -2]
+            margins = strengths - np.where(np.isfinite(runner_up), runner_up, -1.0)
+        else:
+            margins = np.ones(len(strengths))
+
+        offsets = self.config.offset_table[directions]
+        angles = self.config.angle_table[directions]
+        return directions, angles, strengths, offsets[:, 0], offsets[:, 1], margins
+
+    def analyze_motion_batched(self, prev_frame: np.ndarray, curr_frame: np.ndarray,
+                               sections: List[MotionSection]) -> List[MotionSection]:
+        """Level-by-level equivalent of analyze_motion_recursive for the batched match modes."""
+        level = sections
+        while level:
+            xs = np.array([s.x for s in level])
+            ys = np.array([s.y for s in level])
+            ws = np.array([s.width for s in level])
+            hs = np.array([s.height for s in level])
+
+            results = self.score_section_arrays(prev_frame, curr_frame, xs, ys, ws, hs)
+
+            next_level = []
+            for section, best_dir, angle, score, dx, dy, _ in zip(level, *results):
+                section.best_direction = int(best_dir)
+                section.motion_angle = float(angle)
+                section.motion_strength = float(score)
+                section.dx = float(dx)
+                section.dy = float(dy)
+
+                # Same recursion rule as the per-section path
+                if (score > self.config.MOTION_THRESHOLD and
+                    section.depth < self.config.MAX_RECURSIVE_DEPTH):
+
+                    subsections = self.create_recursive_subsections(section)
+                    if subsections:
+                        section.subsections = subsections
+                        next_level.extend(subsections)
+
+            level = next_level
+
+        return sections
+
+    def _prediction_lookup(self, frame_shape: Tuple[int, ...]) -> Optional[dict]:
+        """Map section geometry -> (direction, dx, dy) from the previous frame's field."""
+        if (not self.config.TEMPORAL_WARM_START or self.previous_field is None or
+            self.previous_frame_shape != frame_shape):
+            return None
+
+        prior = self.previous_field
+        return {geometry: result for geometry, result in zip(
+            zip(prior.x.tolist(), prior.y.tolist(), prior.width.tolist(), prior.height.tolist()),
+            zip(prior.direction.tolist(), prior.dx.tolist(), prior.dy.tolist()))}
+
+    def _score_field_rows(self, prev_frame: np.ndarray, curr_frame: np.ndarray, field: MotionField,
+                          start: int, end: int, lookup: Optional[dict], static: Optional[np.ndarray] = None):
+        """Score field rows [start, end) in place; returns (strengths, margins)."""
+        predictions = None
+        if lookup is not None:
+            geometry = zip(field.x[start:end].tolist(), field.y[start:end].tolist(),
+                           field.width[start:end].tolist(), field.height[start:end].tolist())
+            prior = np.array([lookup.get(key, (-1, 0.0, 0.0)) for key in geometry],
+                             dtype=np.float64).reshape(-1, 3)
+            predictions = (prior[:, 0].astype(np.int64), prior[:, 1], prior[:, 2])
+
+        likely = None
+        if self.use_pruned_search:
+            # Subsections most likely move like their parent, which is always scored first
+            parents = field.parent[start:end]
+            likely = np.where(parents >= 0, field.direction[np.maximum(parents, 0)], -1)
+
+        started = time.perf_counter()
+        directions, angles, strengths, dxs, dys, margins = self.score_section_arrays(
+            prev_frame, curr_frame, field.x[start:end], field.y[start:end],
+            field.width[start:end], field.height[start:end], predictions, likely, static)
+        field.set_results(start, end, directions, angles, strengths, dxs, dys)
+        if self.telemetry is not None:
+            self._record_depths(field.depth[start:end], started)
+        return strengths, margins
+
+    def _record_stage(self, stage: str, started: float):
+        if self.stage_times is None and self.telemetry is None:
+            return
+        elapsed = time.perf_counter() - started
+        if self.stage_times is not None:
+            self.stage_times[stage] = self.stage_times.get(stage, 0.0) + elapsed
+        if self.telemetry is not None:
+            self._frame_stages[stage] = self._frame_stages.get(stage, 0.0) + elapsed
+
+    def _record_depths(self, depths: np.ndarray, started: float):
+        # Sections of mixed depth (adaptive batches) share the time by count
+        elapsed = time.perf_counter() - started
+        counts = np.bincount(depths)
+        for depth in np.nonzero(counts)[0].tolist():
+            self._frame_depths[depth] = self._frame_depths.get(depth, 0.0) + elapsed * counts[depth] / len(depths)
+
+    def _report_frame(self, field: MotionField, elapsed: float):
+        """Hand one analyzed frame pair's timings and counts to the telemetry."""
+        telemetry = self.telemetry
+        for stage, seconds in self._frame_stages.items():
+            telemetry.observe('stage_seconds', seconds, stage)
+        telemetry.observe('stage_seconds', elapsed, 'analysis')
+        for depth, seconds in self._frame_depths.items():
+            telemetry.observe('depth_seconds', seconds, depth)
+
+        evaluations = self.last_search_stats['evaluations']
+        telemetry.count('frames_analyzed')
+        telemetry.count('candidate_evaluations', evaluations)
+        telemetry.count('sections', field.size)
+        if self.config.CHANGE_GATE:
+            telemetry.count('static_sections', self.last_search_stats['static'])
+            telemetry.count('static_frames', self.last_search_stats['static_frames'])
+        telemetry.emit('analysis', {
+            'analysis_s': elapsed,
+            'stages': dict(self._frame_stages),
+            'depths': dict(self._frame_depths),
+            'evaluations': evaluations,
+            'sections': field.size,
+        })
+
+    def analyze_motion_field(self, prev_frame: np.ndarray, curr_frame: np.ndarray) -> MotionField:
+        """Analyze a frame pair into self.motion_field.
+
+        The returned field is reused by the next call; use MotionField.copy() to keep it.
+        With TEMPORAL_WARM_START, the previous frame's field seeds the search of
+        each section with the same geometry. The tree is still built level by
+        level, so subsections are only scored once their parent qualifies.
+
+        With stage_times set, time spent creating the grid ('sections'), scoring
+        the grid ('matching') and subdividing/scoring subsections ('recursion') is
+        accumulated into it. The per-section template path recurses while it
+        matches, so its recursion is counted as matching.
+
+        With CHANGE_GATE, the grid is checked with one gate call, whose result is
+        reused to score it, and every further level with one call per level.
+        """
+        start_time = time.perf_counter()
+        height, width = curr_frame.shape[:2]
+        self.region_mask.prepare(prev_frame, curr_frame)
+        self.last_search_stats = self.empty_search_stats()
+        lookup = self._prediction_lookup(curr_frame.shape)
+
+        grid_static = None
+        if self.config.CHANGE_GATE:
+            # A frame pair without any changed grid section needs no search at all
+            field = self.create_grid_field(height, width, self.motion_field)
+            grid_static = self._static_rows(prev_frame, curr_frame, field.x, field.y, field.width, field.height)
+            if grid_static.all():
+                field.set_results(0, field.size, STATIC_DIRECTION, 0.0, 0.0)
+                self._count_static(field.size, frames=1)
+                self._count_evaluations(field.size, 0)
+                self._record_stage('sections', start_time)
+                return self._remember_field(field, curr_frame)
+
+        if self.config.RECURSION_MODE == 'adaptive':
+            field = self.create_grid_field(height, width, self.motion_field)
+            self._record_stage('sections', start_time)
+
+            def score_rows(start: int, end: int) -> Tuple[np.ndarray, int]:
+                started = time.perf_counter()
+                evaluations = self.last_search_stats['evaluations']
+                margins = self._score_field_rows(prev_frame, curr_frame, field, start, end, lookup,
+                                                 grid_static if start == 0 else None)[1]
+                self._record_stage('matching' if start == 0 else 'recursion', started)
+                return margins, self.last_search_stats['evaluations'] - evaluations
+
+            def subdivide(rows: np.ndarray) -> Tuple[int, int]:
+                started = time.perf_counter()
+                rows = self.subdivide_field(field, rows)
+                self._record_stage('recursion', started)
+                return rows
+
+            self.recursion_scheduler.run(field, score_rows, subdivide,
+                                         self.evaluations_per_section(), start_time)
+            return self._remember_field(field, curr_frame)
+
+        if (self.config.MATCH_MODE == 'template' and not self.config.TEMPORAL_WARM_START and
+                not self.use_pruned_search and not self.config.CHANGE_GATE):
+            sections = self.create_grid_sections(height, width)
+            self._record_stage('sections', start_time)
+            started = time.perf_counter()
+            sections = self.analyze_motion_recursive(prev_frame, curr_frame, sections)
+            field = MotionField.from_sections(sections, self.motion_field)
+            self._record_stage('matching', started)
+            return field
+
+        field = self.create_grid_field(height, width, self.motion_field)
+        self._record_stage('sections', start_time)
+
+        started = time.perf_counter()
+        start, end = 0, field.size
+        while end > start:
+            strengths, _ = self._score_field_rows(prev_frame, curr_frame, field, start, end, lookup,
+                                                  grid_static if start == 0 else None)
+
+            # Recursive analysis if motion is significant
+            expand = start + np.nonzero((strengths > self.config.MOTION_THRESHOLD) &
+                                        (field.depth[start:end] < self.config.MAX_RECURSIVE_DEPTH))[0]
+            if start == 0:
+                self._record_stage('matching', started)
+                started = time.perf_counter()
+            start, end = self.subdivide_field(field, expand)
+        self._record_stage('recursion', started)
+
+        return self._remember_field(field, curr_frame)
+
+    def _remember_field(self, field: MotionField, curr_frame: np.ndarray) -> MotionField:
+        if self.config.TEMPORAL_WARM_START:
+            self.previous_field = field.copy(self.previous_field)
+            self.previous_frame_shape = curr_frame.shape
+        return field
+
     def angle_to_color(self, angle: float, strength: float) -> Tuple[int, int, int]:
         # Convert angle to hue (0-360 degrees -> 0-1)
         hue = angle / 360.0
@@ -166,49 +837,11 @@ class VideoMotionAnalyzer:
         return tuple(int(c * 255) for c in rgb)
 
     def draw_motion_visualization(self, frame: np.ndarray, sections: List[MotionSection]) -> np.ndarray:
-        vis_frame = frame.copy()
-
-        def draw_sections_recursive(sections: List[MotionSection]):
-            for section in sections:
-                if self.config.COLOR_CODE_MOTION:
-                    # Color-code the section based on motion
-                    color = self.angle_to_color(section.motion_angle, section.motion_strength)
-
-                    # Draw filled rectangle with transparency
-                    overlay = vis_frame.copy()
-                    cv2.rectangle(overlay,
-                                (section.x, section.y),
-                                (section.x + section.width, section.y + section.height),
-                                color, -1)
-                    cv2.addWeighted(vis_frame, 0.7, overlay, 0.3, 0, vis_frame)
-
-                if self.config.SHOW_GRID_LINES:
-                    # Draw section boundaries
-                    cv2.rectangle(vis_frame,
-                                (section.x, section.y),
-                                (section.x + section.width, section.y + section.height),
-                                (255, 255, 255), 1)
-
-                if self.config.SHOW_MOTION_VECTORS and section.motion_strength > 0.1:
-                    # Draw motion vector
-                    center_x = section.x + section.width // 2
-                    center_y = section.y + section.height // 2
-
-                    angle_rad = np.radians(section.motion_angle)
-                    vector_length = section.motion_strength * self.config.VECTOR_SCALE * 20
-
-                    end_x = int(center_x + vector_length * np.sin(angle_rad))
-                    end_y = int(center_y - vector_length * np.cos(angle_rad))  # Negative for screen coordinates
-
-                    cv2.arrowedLine(vis_frame, (center_x, center_y), (end_x, end_y),
-                                  (0, 255, 255), 2, tipLength=0.3)
-
-                # Recursively draw subsections
-                if section.subsections:
-                    draw_sections_recursive(section.subsections)
+        return self.draw_motion_field(frame, MotionField.from_sections(sections))
 
-        draw_sections_recursive(sections)
-        return vis_frame
+    def draw_motion_field(self, frame: np.ndarray, field: MotionField) -> np.ndarray:
+        """Draw section colors, grid lines and vectors with a single blend per frame."""
+        return self.renderer.render(frame, field)
 
     def create_motion_legend(self) -> np.ndarray:
         legend_size = 200
@@ -271,6 +904,49 @@ class VideoMotionAnalyzer:
 
         return 0, 0
 
+    def calculate_field_movement(self, field: MotionField) -> Tuple[float, float]:
+        """Vectorized calculate_overall_movement over a motion field.
+
+        If the field carries an estimated global motion, that is the overall movement instead.
+        """
+        if field.global_motion is not None:
+            return self.global_movement(*field.global_motion)
+
+        strength = field.strength.astype(np.float64)
+        significant = strength > 0.1  # Only consider significant motion
+        if not significant.any():
+            return 0, 0
+
+        angle_rad = np.radians(field.angle[significant].astype(np.float64))
+        # Weight by section area and motion strength
+        weight = (field.width[significant].astype(np.float64) * field.height[significant]
+                  * strength[significant])
+
+        total_strength = weight.sum()
+        if total_strength <= 0:
+            return 0, 0
+
+        avg_x = (weight * np.sin(angle_rad)).sum() / total_strength
+        avg_y = (-weight * np.cos(angle_rad)).sum() / total_strength  # Negative for screen coordinates
+
+        overall_angle = np.degrees(np.arctan2(avg_x, -avg_y)) % 360
+        overall_strength = min(np.sqrt(avg_x**2 + avg_y**2), 1.0)
+
+        return overall_angle, overall_strength
+
+    def global_movement(self, dx: float, dy: float, response: float) -> Tuple[float, float]:
+        """Overall (angle, strength) of a global motion estimate.
+
+        Strength is the correlation response, scaled down for motion smaller than
+        SEARCH_STEP_SIZE pixels like sub-step motion in the pyramid match mode.
+        """
+        magnitude = np.hypot(dx, dy)
+        if magnitude == 0:
+            return 0, 0
+        overall_angle = np.degrees(np.arctan2(dx, -dy)) % 360
+        overall_strength = response * min(magnitude / self.config.SEARCH_STEP_SIZE, 1.0)
+        return overall_angle, overall_strength
+
     def draw_overall_direction_gauge(self, frame: np.ndarray, overall_angle: float, overall_strength: float) -> np.ndarray:
         """Draw overall movement direction gauge on the frame."""
         gauge_size = 80
@@ -321,99 +997,529 @@ class VideoMotionAnalyzer:
 
         return frame
 
-    def process_video(self, video_path: str, output_path: Optional[str] = None):
-        cap = self.load_video(video_path)
+    def analyze_frame_pair(self, prev_frame: np.ndarray, curr_frame: np.ndarray) -> MotionField:
+        """Run the full grid + recursive analysis on one pair of grayscale frames.
+
+        With GLOBAL_MOTION set, the camera motion is estimated first and stored in
+        field.global_motion; in 'only' mode the grid is skipped and the field has
+        no sections. With SUBTRACT_GLOBAL_MOTION the grid is analyzed on the current
+        frame shifted back by the camera motion, so sections show motion relative
+        to the camera.
+
+        With telemetry set, the pair's stage and recursion depth timings, candidate
+        evaluations and section count are reported to it.
+        """
+        if self.telemetry is None:
+            return self._analyze_frame_pair(prev_frame, curr_frame)
+
+        self._frame_stages = {}
+        self._frame_depths = {}
+        started = time.perf_counter()
+        field = self._analyze_frame_pair(prev_frame, curr_frame)
+        self._report_frame(field, time.perf_counter() - started)
+        return field
+
+    def _analyze_frame_pair(self, prev_frame: np.ndarray, curr_frame: np.ndarray) -> MotionField:
+        if self.config.GLOBAL_MOTION == 'off':
+            return self.analyze_motion_field(prev_frame, curr_frame)
+
+        started = time.perf_counter()
+        global_motion = self.global_motion.estimate(prev_frame, curr_frame)
+        self._record_stage('global', started)
+
+        if self.config.GLOBAL_MOTION == 'only':
+            field = self.motion_field
+            field.reset()
+        else:
+            if self.config.SUBTRACT_GLOBAL_MOTION:
+                curr_frame = self.global_motion.compensate(curr_frame, global_motion[0], global_motion[1])
+            field = self.analyze_motion_field(prev_frame, curr_frame)
+        field.global_motion = global_motion
+        return field
+
+    def resized_legend(self, legend: np.ndarray, height: int) -> np.ndarray:
+        """The legend scaled to the frame height, resized once per legend and height."""
+        cached = self._resized_legend
+        if cached is None or cached[0] is not legend or cached[1] != height:
+            cached = self._resized_legend = (legend, height, cv2.resize(legend, (200, height)))
+        return cached[2]
+
+    def render_frame(self, frame: np.ndarray, field: MotionField,
+                     legend: Optional[np.ndarray] = None) -> np.ndarray:
+        """Build the output frame: motion overlay, overall gauge and optional legend.
+
+        With BUFFER_POOL everything is drawn straight into a recycled output
+        canvas, whose legend strip is filled once when the canvas is allocated.
+        """
+        with_legend = self.config.SHOW_COMPASS and legend is not None
+        height, width = frame.shape[:2]
+
+        pool = self.buffer_pools.get('output')
+        if pool is not None:
+            def fill_legend(canvas: np.ndarray):
+                canvas[:, width:] = self.resized_legend(legend, height)
+
+            canvas = pool.get((height, width + (200 if with_legend else 0), 3),
+                              init=fill_legend if with_legend else None)
+            vis_frame = self.renderer.render(frame, field, out=canvas[:, :width])
+        else:
+            canvas = None
+            vis_frame = self.draw_motion_field(frame, field)
 
-        # Get video properties
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Add overall direction gauge if enabled
+        if self.config.SHOW_OVERALL_DIRECTION:
+            overall_angle, overall_strength = self.calculate_field_movement(field)
+            vis_frame = self.draw_overall_direction_gauge(vis_frame, overall_angle, overall_strength)
 
-        print(f"Processing video: {width}x{height} @ {fps}fps, {total_frames} frames")
+        if canvas is not None:
+            return canvas
 
-        # Calculate output dimensions based on compass visibility
-        output_width = width + (200 if self.config.SHOW_COMPASS else 0)
+        # Combine with legend if enabled
+        if with_legend:
+            return np.hstack([vis_frame, self.resized_legend(legend, height)])
 
-        # Setup output video if specified
-        if output_path:
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (output_width, height))
+        return vis_frame
 
-        # Create motion legend if needed
-        legend = self.create_motion_legend() if self.config.SHOW_COMPASS else None
+    def iter_frames(self, cap: cv2.VideoCapture, resume_at: Optional[int] = None):
+        """Yield (frame_count, frame, gray_frame) for every frame selected for analysis.
 
-        # Initialize
-        prev_frame = None
-        frame_count = 0
+        Skipped frames are never fully decoded: the capture seeks past SKIP_FRAMES
+        and START_TIME, and frames left out by FRAME_SKIP are only grabbed.
+        resume_at starts at that frame_count instead of the first selected frame.
+        """
+        first, end = frame_range(self.config, cap.get(cv2.CAP_PROP_FPS))
+        if resume_at is not None:
+            first = max(first, resume_at - 1)
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        # Skip initial frames if configured
+        frame_count = seek_to_frame(cap, first)
 
+        # Stop if max frames or the end time is reached (after skipping)
+        while end is None or frame_count < end:
             frame_count += 1
 
-            # Skip initial frames if configured
-            if frame_count <= self.config.SKIP_FRAMES:
-                continue
-
-            # Stop if max frames reached (after skipping)
-            processed_frames = frame_count - self.config.SKIP_FRAMES
-            if self.config.MAX_FRAMES and processed_frames > self.config.MAX_FRAMES:
-                break
-
             # Skip frames if configured
             if frame_count % self.config.FRAME_SKIP != 0:
+                if not cap.grab():
+                    break
                 continue
 
-            # Convert to grayscale for motion analysis
+            ret, frame = self.read_frame(cap)
+            if not ret:
+                break
+
+            yield frame_count, frame, self.analysis_frame(frame)
+
+    def read_frame(self, cap: cv2.VideoCapture) -> Tuple[bool, Optional[np.ndarray]]:
+        """cap.read(), decoding into a recycled buffer with BUFFER_POOL."""
+        pool = self.buffer_pools.get('frame')
+        buffer = pool.get(pool.shape) if pool is not None and pool.shape is not None else None
+        ret, frame = cap.read(buffer)
+        if ret and pool is not None and frame.shape != pool.shape:
+            # First frame, or the frame size changed: decode into buffers of this shape from now on
+            pool.get(frame.shape)
+        return ret, frame
+
+    def analysis_size(self, frame_width: int, frame_height: int) -> Tuple[int, int]:
+        """(width, height) frames are analyzed at: ANALYSIS_WIDTH wide, never upscaled."""
+        target_width = self.config.ANALYSIS_WIDTH
+        if not target_width or target_width >= frame_width:
+            return frame_width, frame_height
+        return target_width, max(1, round(frame_height * target_width / frame_width))
+
+    def analysis_frame(self, frame: np.ndarray) -> np.ndarray:
+        """Grayscale frame for motion analysis, downscaled to ANALYSIS_WIDTH if set.
+
+        With BUFFER_POOL the conversion writes into recycled buffers: a frame
+        pair's current frame becomes the next pair's previous one, and the
+        buffer of the frame before is reused once nothing refers to it.
+        """
+        pools = self.buffer_pools
+        height, width = frame.shape[:2]
+        size = self.analysis_size(width, height)
+
+        if not pools:
             gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if size != (width, height):
+                gray_frame = cv2.resize(gray_frame, size, interpolation=cv2.INTER_AREA)
+            return gray_frame
+
+        if size == (width, height):
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pools['gray'].get((height, width)))
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pools['gray_full'].get((height, width)))
+        return cv2.resize(gray_frame, size, dst=pools['gray'].get((size[1], size[0])),
+                          interpolation=cv2.INTER_AREA)
+
+    def to_frame_scale(self, field: MotionField, frame_shape: Tuple[int, ...]) -> MotionField:
+        """Map a field analyzed at analysis_size to frame coordinates (a no-op at full resolution)."""
+        height, width = frame_shape[:2]
+        analysis_width, analysis_height = self.analysis_size(width, height)
+        if (analysis_width, analysis_height) == (width, height):
+            return field
+        return field.scaled(width / analysis_width, height / analysis_height, self.frame_field)
+
+    def frame_source(self, cap: cv2.VideoCapture, resume_at: Optional[int] = None):
+        """iter_frames, decoded ahead on a background thread if DECODE_QUEUE_SIZE is set."""
+        frames = self.iter_frames(cap, resume_at)
+        if self.config.DECODE_QUEUE_SIZE > 0:
+            prefetcher = FramePrefetcher(frames, self.config.DECODE_QUEUE_SIZE)
+            self.io_stats['decode'] = prefetcher.stats
+            return prefetcher
+        return frames
+
+    def iter_motion_results(self, cap: cv2.VideoCapture, cached=None, resume_at: Optional[int] = None):
+        """Yield (frame_count, frame, motion_field) for consecutive frame pairs, in order.
+
+        The field is in frame coordinates, also when analyzing at ANALYSIS_WIDTH.
+        Pairs for which the optional cached(frame_count) returns a field are not
+        analyzed; see iter_video_results.
+        """
+        frames = self.frame_source(cap, resume_at)
+        try:
+            if self.config.NUM_WORKERS > 1:
+                from pipeline import iter_parallel_results
+                for frame_count, frame, field in iter_parallel_results(frames, self.config, cached,
+                                                                       self.region_mask.letterbox):
+                    yield frame_count, frame, self.to_frame_scale(field, frame.shape)
+                return
+
+            prev_frame = None
+            for frame_count, frame, gray_frame in frames:
+                if prev_frame is not None:
+                    field = cached(frame_count) if cached is not None else None
+                    if field is None:
+                        field = self.to_frame_scale(self.analyze_frame_pair(prev_frame, gray_frame),
+                                                    frame.shape)
+                    yield frame_count, frame, field
+                prev_frame = gray_frame
+        finally:
+            # Stops the decode thread before the capture is released
+            if isinstance(frames, FramePrefetcher):
+                frames.close()
+
+    def iter_video_results(self, video_path: str, cap: cv2.VideoCapture, need_frames: bool = True):
+        """iter_motion_results through the result cache, if CACHE_DIR is set.
+
+        Cached frame pairs are loaded instead of analyzed, and newly analyzed ones
+        are added to the cache. Without need_frames, the frames are yielded as None
+        and the cached frames at the start of the range are not even decoded: the
+        capture seeks straight to the last of them and analysis resumes there.
+        """
+        self.cache_stats = {'loaded': 0, 'analyzed': 0}
+        if not self.config.CACHE_DIR:
+            yield from self.iter_motion_results(cap)
+            return
+
+        from result_cache import ResultCache
+        cache = ResultCache(self.config.CACHE_DIR, int(self.config.CACHE_MAX_MB * 1024 ** 2))
+        key = cache.key(video_path, self.config)
+        reader, writer = cache.open(key, metadata={'video': video_path})
+        index = {int(frame_count): i for i, frame_count in enumerate(reader.frames['frame_count'])}
+
+        def cached(frame_count: int) -> Optional[MotionField]:
+            i = index.get(frame_count)
+            if i is None:
+                return None
+            self.cache_stats['loaded'] += 1
+            return reader.field(i)
+
+        try:
+            resume_at = None
+            if not need_frames:
+                # Serve the cached frames at the start of the range without decoding them
+                first, end = frame_range(self.config, cap.get(cv2.CAP_PROP_FPS))
+                step = self.config.FRAME_SKIP
+                # The first selected frame only starts the first pair
+                frame_count = (first // step + 2) * step
+                while frame_count in index and (end is None or frame_count <= end):
+                    yield frame_count, None, cached(frame_count)
+                    resume_at = frame_count
+                    frame_count += self.config.FRAME_SKIP
+
+            results = self.iter_motion_results(cap, cached, resume_at)
+            try:
+                for frame_count, frame, field in results:
+                    if frame_count not in index:
+                        writer.write(frame_count, field, self.calculate_field_movement(field))
+                        self.cache_stats['analyzed'] += 1
+                    yield frame_count, frame, field
+            finally:
+                results.close()
+        finally:
+            writer.close()
+            cache.evict(keep=key)
+
+    def analyze_video(self, video_path: str):
+        """Analysis-only API: yield (frame_count, motion_field) without any GUI or drawing work.
+
+        Every frame gets its own field, which stays valid after the next one is
+        yielded (the analyzer's reused field never leaves it). Call
+        motion_field.to_sections() for the MotionSection tree view.
+        """
+        cap = self.load_video(video_path)
+        results = self.iter_video_results(video_path, cap, need_frames=False)
+        try:
+            for frame_count, _, field in results:
+                yield frame_count, field.copy()
+        finally:
+            results.close()
+            cap.release()
+
+    def process_video(self, video_path: str, output_path: Optional[str] = None,
+                      headless: Optional[bool] = None, export_path: Optional[str] = None):
+        """Analyze a video, showing and/or writing the visualization.
+
+        With export_path, every frame's motion field and overall movement are
+        also streamed to a columnar export (see motion_export.py). With
+        TELEMETRY_FILE set (or a telemetry attached), per-frame timings, decode and
+        encode stall times and the analysis counters are collected and dumped
+        every TELEMETRY_INTERVAL seconds.
+        """
+        if headless is None:
+            headless = self.config.HEADLESS
 
-            if prev_frame is not None:
-                # Create grid sections
-                sections = self.create_grid_sections(height, width)
+        cap = self.load_video(video_path)
 
-                # Analyze motion
-                analyzed_sections = self.analyze_motion_recursive(prev_frame, gray_frame, sections)
+        # Get video properties
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-                # Create visualization
-                vis_frame = self.draw_motion_visualization(frame, analyzed_sections)
+        print(f"Processing video: {width}x{height} @ {fps}fps, {total_frames} frames")
+        if self.config.NUM_WORKERS > 1:
+            print(f"Using {self.config.NUM_WORKERS} worker processes")
 
-                # Add overall direction gauge if enabled
-                if self.config.SHOW_OVERALL_DIRECTION:
-                    overall_angle, overall_strength = self.calculate_overall_movement(analyzed_sections)
-                    vis_frame = self.draw_overall_direction_gauge(vis_frame, overall_angle, overall_strength)
+        # Visualization is only built when something consumes it
+        render = not headless or bool(output_path)
 
-                # Combine with legend if enabled
-                if self.config.SHOW_COMPASS and legend is not None:
-                    legend_resized = cv2.resize(legend, (200, height))
-                    combined_frame = np.hstack([vis_frame, legend_resized])
-                else:
-                    combined_frame = vis_frame
+        # Calculate output dimensions based on compass visibility
+        output_width = width + (200 if self.config.SHOW_COMPASS else 0)
 
-                # Display
-                cv2.imshow('Motion Analysis', combined_frame)
+        # Setup output video if specified
+        self.io_stats = {}
+        if output_path:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(output_path, fourcc, fps, (output_width, height))
+            if self.config.ENCODE_QUEUE_SIZE > 0:
+                # Encode on a background thread; render_frame never reuses a frame still queued
+                out = AsyncVideoWriter(out, self.config.ENCODE_QUEUE_SIZE)
+                self.io_stats['encode'] = out.stats
 
-                # Save if output specified
-                if output_path:
-                    out.write(combined_frame)
+        if export_path:
+            from motion_export import MotionFieldWriter
+            exporter = MotionFieldWriter(export_path, metadata={
+                'video': video_path, 'width': width, 'height': height, 'fps': fps})
+
+        # Create motion legend if needed
+        legend = self.create_motion_legend() if self.config.SHOW_COMPASS and render else None
+
+        if self.telemetry is None and self.config.TELEMETRY_FILE:
+            self.telemetry = Telemetry(self.config.TELEMETRY_FILE, self.config.TELEMETRY_INTERVAL)
+        telemetry = self.telemetry
+
+        results = self.iter_video_results(video_path, cap, need_frames=render)
+        run_started = frame_started = time.perf_counter()
+        frames_done = 0
+        try:
+            for frame_count, frame, field in results:
+                if export_path:
+                    exporter.write(frame_count, field, self.calculate_field_movement(field))
+
+                if render:
+                    # Create visualization
+                    started = time.perf_counter()
+                    combined_frame = self.render_frame(frame, field, legend)
+                    if telemetry is not None:
+                        telemetry.observe('stage_seconds', time.perf_counter() - started, 'drawing')
+
+                    # Display
+                    if not headless:
+                        cv2.imshow('Motion Analysis', combined_frame)
+
+                    # Save if output specified
+                    if output_path:
+                        started = time.perf_counter()
+                        out.write(combined_frame)
+                        if telemetry is not None:
+                            telemetry.observe('stage_seconds', time.perf_counter() - started, 'encode')
+
+                frames_done += 1
+                if telemetry is not None:
+                    now = time.perf_counter()
+                    telemetry.observe('frame_seconds', now - frame_started)
+                    if 'decode' in self.io_stats:
+                        telemetry.set('decode_stall_seconds', self.io_stats['decode'].consumer_wait)
+                    if 'encode' in self.io_stats:
+                        telemetry.set('encode_stall_seconds', self.io_stats['encode'].producer_wait)
+                    telemetry.frame_done({'frame': frame_count, 'frame_s': now - frame_started,
+                                          'sections': field.size})
+                    frame_started = now
 
                 # Print progress
                 if frame_count % 30 == 0:
                     progress = (frame_count / total_frames) * 100
-                    print(f"Progress: {progress:.1f}%")
-
-            prev_frame = gray_frame
-
-            # Exit on 'q' key
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-
-        # Cleanup
-        cap.release()
-        if output_path:
-            out.release()
-        cv2.destroyAllWindows()
-
-        print("Video processing complete!")
\ No newline at end of file
+                    rate = frames_done / max(time.perf_counter() - run_started, 1e-9)
+                    if headless:
+                        overall_angle, overall_strength = self.calculate_field_movement(field)
+                        print(f"Progress: {progress:.1f}% ({rate:.1f} fps, overall motion {overall_angle:.0f}°, "
+                              f"strength {overall_strength:.2f})")
+                    else:
+                        print(f"Progress: {progress:.1f}% ({rate:.1f} fps)")
+
+                # Exit on 'q' key
+                if not headless and cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        finally:
+            # Stops the worker pool, if any, before the capture is released
+            results.close()
+
+            # Cleanup
+            cap.release()
+            if output_path:
+                out.release()
+            if export_path:
+                exporter.close()
+            if not headless:
+                cv2.destroyAllWindows()
+            if telemetry is not None:
+                telemetry.close()
+
+        if telemetry is not None and telemetry.path:
+            print(f"Telemetry written to {telemetry.path}")
+        if self.config.CACHE_DIR:
+            print(f"Result cache: {self.cache_stats['loaded']} frames loaded, "
+                  f"{self.cache_stats['analyzed']} analyzed")
+        if 'decode' in self.io_stats:
+            stats = self.io_stats['decode'].as_dict()
+            print(f"Decode queue: mean depth {stats['mean_depth']:.1f}/{stats['queue_size']}, "
+                  f"analysis waited {stats['consumer_wait_s']:.2f}s for frames, "
+                  f"decoder waited {stats['producer_wait_s']:.2f}s for space")
+        if 'encode' in self.io_stats:
+            stats = self.io_stats['encode'].as_dict()
+            print(f"Encode queue: mean depth {stats['mean_depth']:.1f}/{stats['queue_size']}, "
+                  f"analysis waited {stats['producer_wait_s']:.2f}s for the encoder, "
+                  f"encoder idle {stats['consumer_wait_s']:.2f}s")
+        if self.buffer_pools:
+            print("Buffer pool: " + ", ".join(
+                f"{name} {pool.allocated} allocated, {pool.reused} reused"
+                for name, pool in self.buffer_pools.items() if pool.allocated))
+
+        if (self.config.TEMPORAL_WARM_START or self.use_pruned_search) and self.config.NUM_WORKERS <= 1:
+            performed = self.search_totals['evaluations']
+            saved = self.search_totals['saved']
+            if performed + saved > 0:
+                label = 'Pruned search' if self.use_pruned_search else 'Warm start'
+                print(f"{label}: {performed} candidate evaluations, {saved} saved "
+                      f"({saved / (performed + saved) * 100:.1f}%)")
+            if self.use_pruned_search:
+                print(f"Pruned search: {self.search_totals['pruned']} candidates skipped by score bound, "
+                      f"{self.search_totals['accepted']} sections accepted at PRUNE_ACCEPT_SCORE")
+        if self.config.CHANGE_GATE and self.config.NUM_WORKERS <= 1:
+            print(self.change_gate_summary())
+
+        print("Video processing complete!")
+
+    def change_gate_summary(self) -> str:
+        totals = self.search_totals
+        rate = totals['static'] / totals['sections'] * 100 if totals['sections'] else 0.0
+        return (f"Change gate: {totals['static']} of {totals['sections']} sections static ({rate:.1f}% skipped), "
+                f"{totals['static_frames']} frames short-circuited")
+
+    def process_stream(self, source: str, output_path: Optional[str] = None,
+                       headless: Optional[bool] = None):
+        """Analyze a live source (see live_stream.open_stream) with bounded latency.
+
+        A capture thread keeps only the newest frame, so analysis always works on
+        the freshest one; frames replaced before analysis got to them, and frames
+        already older than LATENCY_TARGET_MS when analysis could start, are
+        dropped. Motion is measured between consecutive analyzed frames. Latency
+        is measured from capture until the frame was shown or written. Stops
+        after MAX_FRAMES analyzed pairs, at the end of the stream, or on 'q'.
+        """
+        from live_stream import LatestFrameSource, latency_summary, open_stream
+
+        if headless is None:
+            headless = self.config.HEADLESS
+
+        cap = open_stream(source)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        render = not headless or bool(output_path)
+        target = self.config.LATENCY_TARGET_MS / 1000
+        print(f"Streaming from {source}, latency target {self.config.LATENCY_TARGET_MS} ms")
+
+        self.io_stats = {}
+        if self.telemetry is None and self.config.TELEMETRY_FILE:
+            self.telemetry = Telemetry(self.config.TELEMETRY_FILE, self.config.TELEMETRY_INTERVAL)
+        telemetry = self.telemetry
+        out = None
+        legend = self.create_motion_legend() if self.config.SHOW_COMPASS and render else None
+        latencies = []
+        stale = 0
+        prev_frame = None
+        self.region_mask.reset()
+        stream = LatestFrameSource(cap)
+        try:
+            while self.config.MAX_FRAMES is None or len(latencies) < self.config.MAX_FRAMES:
+                latest = stream.latest()
+                if latest is None:
+                    break
+                _, captured_at, frame = latest
+                if time.perf_counter() - captured_at > target:
+                    stale += 1
+                    if telemetry is not None:
+                        telemetry.count('frames_dropped')
+                    continue
+
+                gray_frame = self.analysis_frame(frame)
+                if prev_frame is not None:
+                    field = self.to_frame_scale(self.analyze_frame_pair(prev_frame, gray_frame), frame.shape)
+
+                    if render:
+                        combined_frame = self.render_frame(frame, field, legend)
+                        if not headless:
+                            cv2.imshow('Motion Analysis', combined_frame)
+                        if output_path:
+                            if out is None:
+                                height, width = combined_frame.shape[:2]
+                                out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'),
+                                                      fps, (width, height))
+                                if self.config.ENCODE_QUEUE_SIZE > 0:
+                                    out = AsyncVideoWriter(out, self.config.ENCODE_QUEUE_SIZE)
+                                    self.io_stats['encode'] = out.stats
+                            out.write(combined_frame)
+
+                    latencies.append((time.perf_counter() - captured_at) * 1000)
+                    if telemetry is not None:
+                        telemetry.observe('latency_seconds', latencies[-1] / 1000)
+                        telemetry.frame_done({'frame': len(latencies), 'latency_ms': latencies[-1],
+                                              'sections': field.size})
+                    if len(latencies) % 30 == 0:
+                        overall_angle, overall_strength = self.calculate_field_movement(field)
+                        print(f"Frame {len(latencies)}: latency {latencies[-1]:.0f} ms "
+                              f"(overall motion {overall_angle:.0f}°, strength {overall_strength:.2f})")
+                prev_frame = gray_frame
+
+                # Exit on 'q' key
+                if not headless and cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        finally:
+            # Releases the capture once its reading thread is done with it
+            stream.close()
+            if out is not None:
+                out.release()
+            if not headless:
+                cv2.destroyAllWindows()
+            if telemetry is not None:
+                telemetry.close()
+
+        dropped = stream.dropped + stale
+        self.stream_stats = {'captured': stream.captured, 'dropped': dropped, 'stale': stale,
+                             'latencies_ms': latencies}
+        drop_rate = dropped / stream.captured * 100 if stream.captured else 0.0
+        print(f"Stream: {stream.captured} frames captured, {dropped} dropped ({drop_rate:.1f}%, "
+              f"{stale} over the latency target), {len(latencies)} analyzed")
+        print(f"Latency: {latency_summary(latencies)}")
+        if self.config.CHANGE_GATE:
+            print(self.change_gate_summary())
+        print("Stream processing complete!")
@@ -0,0 +1,211 @@
+import json
+import os
+import numpy as np
+from typing import Dict, Iterator, Optional, Tuple
+
+from motion_field import MotionField
+
+FORMAT_VERSION = 1
+
+# Per-frame columns; every section row also gets its frame's index in the 'frame' column
+FRAME_COLUMNS = (
+    ('frame_count', np.int64),
+    ('row_start', np.int64),
+    ('row_count', np.int32),
+    ('overall_angle', np.float32),
+    ('overall_strength', np.float32),
+    # Global motion estimate of the frame pair, NaN when none was made
+    ('global_dx', np.float32),
+    ('global_dy', np.float32),
+    ('global_response', np.float32),
+)
+SECTION_COLUMNS = (('frame', np.int64),) + MotionField.COLUMNS
+
+
+def _column_file(kind: str, name: str) -> str:
+    return f"{kind}.{name}.bin"
+
+
+class _ColumnChunk:
+    """Fixed-size in-memory chunk of a group of columns, appended to their files when full."""
+
+    def __init__(self, directory: str, kind: str, columns, rows: int, existing: int = 0):
+        self.columns = [(name, np.dtype(dtype).newbyteorder('<')) for name, dtype in columns]
+        self.arrays = {name: np.zeros(rows, dtype=dtype) for name, dtype in self.columns}
+        self.files = {}
+        for name, dtype in self.columns:
+            file_path = os.path.join(directory, _column_file(kind, name))
+            if existing:
+                # Continue after the last complete row, dropping anything half-written
+                os.truncate(file_path, existing * dtype.itemsize)
+                self.files[name] = open(file_path, 'ab')
+            else:
+                self.files[name] = open(file_path, 'wb')
+        self.capacity = rows
+        self.size = 0
+        self.total = existing
+
+    def append(self, count: int, values: Dict):
+        """Append `count` rows; values maps column name -> scalar or array of length count."""
+        offset = 0
+        while offset < count:
+            take = min(count - offset, self.capacity - self.size)
+            for name, _ in self.columns:
+                value = values[name]
+                if np.ndim(value):
+                    value = value[offset:offset + take]
+                self.arrays[name][self.size:self.size + take] = value
+            self.size += take
+            offset += take
+            if self.size == self.capacity:
+                self.flush()
+        self.total += count
+
+    def flush(self):
+        for name, _ in self.columns:
+            self.files[name].write(self.arrays[name][:self.size].tobytes())
+        self.size = 0
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+class MotionFieldWriter:
+    """Streams motion fields to a directory of little-endian binary columns.
+
+    Layout: one `sections.<column>.bin` file per MotionField column, plus a
+    `frame` column holding each row's frame index, and `frames.<column>.bin`
+    files with one row per frame (frame_count, its first section row and row
+    count, and the overall movement). `schema.json` describes the columns.
+    Rows are buffered in fixed-size chunks, so memory stays bounded however long
+    the video is. Parent indices are relative to the frame's first row.
+
+    With append=True an existing export is continued instead of replaced.
+    """
+
+    def __init__(self, path: str, chunk_rows: int = 65536, metadata: Optional[Dict] = None,
+                 append: bool = False):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.metadata = metadata or {}
+
+        frames, sections = 0, 0
+        if append and os.path.exists(os.path.join(path, 'schema.json')):
+            existing = MotionFieldReader(path)
+            frames = len(existing)
+            if frames:
+                sections = int(existing.frames['row_start'][-1] + existing.frames['row_count'][-1])
+            self.metadata = dict(existing.metadata, **self.metadata)
+            del existing
+
+        self.sections = _ColumnChunk(path, 'sections', SECTION_COLUMNS, chunk_rows, sections)
+        self.frames = _ColumnChunk(path, 'frames', FRAME_COLUMNS, max(1, chunk_rows // 64), frames)
+        self.closed = False
+        self._write_schema()
+
+    def _write_schema(self):
+        schema = {
+            'version': FORMAT_VERSION,
+            'frames': self.frames.total,
+            'sections': self.sections.total,
+            'frame_columns': {name: dtype.str for name, dtype in self.frames.columns},
+            'section_columns': {name: dtype.str for name, dtype in self.sections.columns},
+            'metadata': self.metadata,
+        }
+        with open(os.path.join(self.path, 'schema.json'), 'w') as f:
+            json.dump(schema, f, indent=2)
+
+    def write(self, frame_count: int, field: MotionField, overall: Tuple[float, float]):
+        """Append one frame's field; the field can be reused right after."""
+        index = self.frames.total
+        values = {'frame': index}
+        values.update({name: field.column(name) for name, _ in MotionField.COLUMNS})
+        global_dx, global_dy, global_response = field.global_motion or (np.nan, np.nan, np.nan)
+        self.frames.append(1, {'frame_count': frame_count, 'row_start': self.sections.total,
+                               'row_count': field.size, 'overall_angle': overall[0],
+                               'overall_strength': overall[1], 'global_dx': global_dx,
+                               'global_dy': global_dy, 'global_response': global_response})
+        self.sections.append(field.size, values)
+
+    def close(self):
+        if self.closed:
+            return
+        self.sections.close()
+        self.frames.close()
+        self._write_schema()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MotionFieldReader:
+    """Memory-mapped reader for MotionFieldWriter output.
+
+    `frames[name]` and `sections[name]` are read-only np.memmap columns, so whole
+    columns can be processed without loading them. Row counts come from the file
+    sizes, so a run that was interrupted before close() can still be read.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, 'schema.json')) as f:
+            self.schema = json.load(f)
+        if self.schema.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported motion export version: {self.schema.get('version')}")
+
+        self.path = path
+        self.metadata = self.schema.get('metadata', {})
+        self.frames = self._map('frames', self.schema['frame_columns'])
+        self.sections = self._map('sections', self.schema['section_columns'])
+
+        # Only frames whose sections were completely written
+        count = min(len(column) for column in self.frames.values())
+        section_rows = min(len(column) for column in self.sections.values())
+        while count and self.frames['row_start'][count - 1] + self.frames['row_count'][count - 1] > section_rows:
+            count -= 1
+        self.frames = {name: column[:count] for name, column in self.frames.items()}
+
+    def _map(self, kind: str, columns: Dict[str, str]) -> Dict[str, np.ndarray]:
+        mapped = {}
+        for name, dtype in columns.items():
+            file_path = os.path.join(self.path, _column_file(kind, name))
+            dtype = np.dtype(dtype)
+            rows = os.path.getsize(file_path) // dtype.itemsize
+            # np.memmap can't map empty files
+            mapped[name] = (np.memmap(file_path, dtype=dtype, mode='r', shape=(rows,)) if rows
+                            else np.zeros(0, dtype=dtype))
+        return mapped
+
+    def __len__(self) -> int:
+        return len(self.frames['frame_count'])
+
+    def frame_rows(self, index: int) -> slice:
+        start = int(self.frames['row_start'][index])
+        return slice(start, start + int(self.frames['row_count'][index]))
+
+    def field(self, index: int, out: Optional[MotionField] = None) -> MotionField:
+        """MotionField of the index-th exported frame, optionally into a reused field."""
+        rows = self.frame_rows(index)
+        columns = {name: self.sections[name][rows] for name, _ in MotionField.COLUMNS}
+        field = out if out is not None else MotionField(rows.stop - rows.start)
+        field.reset()
+        field.append(columns['x'], columns['y'], columns['width'], columns['height'],
+                     columns['depth'], columns['parent'])
+        field.set_results(0, field.size, columns['direction'], columns['angle'], columns['strength'],
+                          columns['dx'], columns['dy'])
+        # Exports written before global motion was added have no global columns
+        if 'global_dx' in self.frames and not np.isnan(self.frames['global_dx'][index]):
+            field.global_motion = (float(self.frames['global_dx'][index]), float(self.frames['global_dy'][index]),
+                                   float(self.frames['global_response'][index]))
+        return field
+
+    def __iter__(self) -> Iterator[Tuple[int, MotionField]]:
+        """Yield (frame_count, field) for every frame; the field is reused between frames."""
+        field = MotionField()
+        for index in range(len(self)):
+            yield int(self.frames['frame_count'][index]), self.field(index, field)
@@ -0,0 +1,236 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+
+class MotionField:
+    """Structure-of-arrays motion field for one frame pair.
+
+    Every analyzed section - grid sections and recursive subsections alike - is
+    one row across a set of preallocated NumPy columns. A parent always comes
+    before its subsections (rows are normally stored level by level), and
+    `parent` holds the row index of the section a subsection was split from
+    (-1 for grid sections). The buffers are kept when the field is reset, so a field reused
+    across frames stops allocating once it has grown to the largest frame.
+
+    `global_motion` holds the (dx, dy, response) camera motion of the frame pair
+    when it was estimated (see global_motion.py), else None.
+    """
+
+    COLUMNS = (
+        ('x', np.int32),
+        ('y', np.int32),
+        ('width', np.int32),
+        ('height', np.int32),
+        ('depth', np.int16),
+        ('direction', np.int16),
+        ('angle', np.float32),
+        ('strength', np.float32),
+        ('dx', np.float32),
+        ('dy', np.float32),
+        ('parent', np.int32),
+    )
+
+    def __init__(self, capacity: int = 256):
+        self.size = 0
+        self.capacity = max(1, capacity)
+        self._columns = {name: np.zeros(self.capacity, dtype=dtype) for name, dtype in self.COLUMNS}
+        self.global_motion: Optional[Tuple[float, float, float]] = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getstate__(self):
+        # Only ship the used rows, e.g. when returned from a worker process
+        return {'size': self.size, 'capacity': self.size, 'global_motion': self.global_motion,
+                '_columns': {name: column[:self.size].copy() for name, column in self._columns.items()}}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.capacity == 0:
+            self.capacity = 1
+            self._columns = {name: np.zeros(1, dtype=dtype) for name, dtype in self.COLUMNS}
+
+    def column(self, name: str) -> np.ndarray:
+        """View of the used rows of one column."""
+        return self._columns[name][:self.size]
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.column('x')
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.column('y')
+
+    @property
+    def width(self) -> np.ndarray:
+        return self.column('width')
+
+    @property
+    def height(self) -> np.ndarray:
+        return self.column('height')
+
+    @property
+    def depth(self) -> np.ndarray:
+        return self.column('depth')
+
+    @property
+    def direction(self) -> np.ndarray:
+        return self.column('direction')
+
+    @property
+    def angle(self) -> np.ndarray:
+        return self.column('angle')
+
+    @property
+    def strength(self) -> np.ndarray:
+        return self.column('strength')
+
+    @property
+    def dx(self) -> np.ndarray:
+        return self.column('dx')
+
+    @property
+    def dy(self) -> np.ndarray:
+        return self.column('dy')
+
+    @property
+    def parent(self) -> np.ndarray:
+        return self.column('parent')
+
+    def reset(self):
+        """Drop all rows but keep the allocated buffers."""
+        self.size = 0
+        self.global_motion = None
+
+    def reserve(self, capacity: int):
+        if capacity <= self.capacity:
+            return
+        new_capacity = max(capacity, 2 * self.capacity)
+        for name, dtype in self.COLUMNS:
+            column = np.zeros(new_capacity, dtype=dtype)
+            column[:self.size] = self._columns[name][:self.size]
+            self._columns[name] = column
+        self.capacity = new_capacity
+
+    def append(self, xs, ys, widths, heights, depth, parents=-1) -> Tuple[int, int]:
+        """Add sections (results zeroed) and return the (start, end) row range."""
+        count = len(xs)
+        start, end = self.size, self.size + count
+        self.reserve(end)
+
+        columns = self._columns
+        columns['x'][start:end] = xs
+        columns['y'][start:end] = ys
+        columns['width'][start:end] = widths
+        columns['height'][start:end] = heights
+        columns['depth'][start:end] = depth
+        columns['parent'][start:end] = parents
+        columns['direction'][start:end] = 0
+        columns['angle'][start:end] = 0
+        columns['strength'][start:end] = 0
+        columns['dx'][start:end] = 0
+        columns['dy'][start:end] = 0
+
+        self.size = end
+        return start, end
+
+    def set_results(self, start: int, end: int, directions, angles, strengths, dxs=0, dys=0):
+        self._columns['direction'][start:end] = directions
+        self._columns['angle'][start:end] = angles
+        self._columns['strength'][start:end] = strengths
+        self._columns['dx'][start:end] = dxs
+        self._columns['dy'][start:end] = dys
+
+    def depth_first_order(self) -> np.ndarray:
+        """Row indices in tree pre-order (each section followed by its subsections)."""
+        children = [[] for _ in range(self.size)]
+        roots = []
+        for i, parent in enumerate(self.parent.tolist()):
+            if parent < 0:
+                roots.append(i)
+            else:
+                children[parent].append(i)
+
+        order = []
+        stack = roots[::-1]
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            stack.extend(children[i][::-1])
+        return np.array(order, dtype=np.int64)
+
+    def copy(self, out: 'MotionField' = None) -> 'MotionField':
+        """Copy of the field, optionally into an existing field to reuse its buffers."""
+        field = out if out is not None else MotionField(self.size)
+        field.reset()
+        field.append(self.x, self.y, self.width, self.height, self.depth, self.parent)
+        field.set_results(0, self.size, self.direction, self.angle, self.strength, self.dx, self.dy)
+        field.global_motion = self.global_motion
+        return field
+
+    def scaled(self, scale_x: float, scale_y: float, out: 'MotionField' = None) -> 'MotionField':
+        """Copy with geometry and displacements scaled, e.g. from analysis to frame resolution.
+
+        Section edges are scaled and rounded, so sections that touched still touch.
+        """
+        field = self.copy(out)
+        columns = field._columns
+        for start, length, scale in (('x', 'width', scale_x), ('y', 'height', scale_y)):
+            begin = np.rint(self.column(start) * scale)
+            end = np.rint((self.column(start) + self.column(length)) * scale)
+            columns[start][:self.size] = begin
+            columns[length][:self.size] = end - begin
+        columns['dx'][:self.size] *= scale_x
+        columns['dy'][:self.size] *= scale_y
+        if self.global_motion is not None:
+            dx, dy, response = self.global_motion
+            field.global_motion = (dx * scale_x, dy * scale_y, response)
+        return field
+
+    @classmethod
+    def from_sections(cls, sections: List, field: 'MotionField' = None) -> 'MotionField':
+        """Flatten a MotionSection tree, level by level, into a (reused) field."""
+        if field is None:
+            field = cls()
+        field.reset()
+
+        level = [(section, -1) for section in sections]
+        while level:
+            start = field.size
+            field.append([s.x for s, _ in level], [s.y for s, _ in level],
+                         [s.width for s, _ in level], [s.height for s, _ in level],
+                         [s.depth for s, _ in level], [parent for _, parent in level])
+            field.set_results(start, field.size,
+                              [s.best_direction or 0 for s, _ in level],
+                              [s.motion_angle for s, _ in level],
+                              [s.motion_strength for s, _ in level],
+                              [s.dx for s, _ in level], [s.dy for s, _ in level])
+
+            level = [(sub, start + i) for i, (s, _) in enumerate(level) for sub in s.subsections]
+
+        return field
+
+    def to_sections(self) -> List:
+        """Compatibility view: rebuild the MotionSection tree and return the top-level sections."""
+        from motion_analyzer import MotionSection
+
+        sections = []
+        nodes = []
+        for i in range(self.size):
+            section = MotionSection(int(self.x[i]), int(self.y[i]), int(self.width[i]),
+                                    int(self.height[i]), int(self.depth[i]))
+            section.best_direction = int(self.direction[i])
+            section.motion_angle = float(self.angle[i])
+            section.motion_strength = float(self.strength[i])
+            section.dx = float(self.dx[i])
+            section.dy = float(self.dy[i])
+            nodes.append(section)
+
+            parent = self.parent[i]
+            if parent < 0:
+                sections.append(section)
+            else:
+                nodes[parent].subsections.append(section)
+
+        return sections
@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+from typing import Callable, Optional, Tuple
+
+from change_gate import STATIC_DIRECTION
+from motion_field import MotionField
+
+# Saturation steps in the color lookup table (strength is mapped to saturation)
+SATURATION_LEVELS = 101
+
+# Sections the change gate found static are tinted dark gray and outlined in gray (BGR)
+STATIC_COLOR = (64, 64, 64)
+STATIC_LINE_COLOR = (128, 128, 128)
+
+
+class MotionRenderer:
+    """Draws a motion field with a single blend per frame.
+
+    The per-section look is "blend the section color at 30% over whatever is
+    already there", applied section by section, with grid lines and vectors
+    painted opaquely in between. Instead of blending the whole frame once per
+    section, the renderer records the same operations in two reusable buffers:
+
+    - `overlay`: the color contribution accumulated so far
+    - `keep`: the fraction of the original frame that still shows through
+
+    Blending a section scales both by 0.7 inside its rectangle and adds 30% of
+    its color to `overlay`; painting a line sets `overlay` to the line color and
+    `keep` to 0. The result, frame * keep + overlay, is then composed once.
+    Only the rectangles themselves are touched per section, never the full frame.
+    Sections are visited in tree pre-order, as the recursive drawing did, so
+    overlapping sections and vectors stack the same way.
+    """
+
+    def __init__(self, config, angle_to_color: Callable[[float, float], Tuple[int, int, int]]):
+        self.config = config
+        self.angle_to_color = angle_to_color
+        self._color_lut = None
+        self._shape = None
+        self._overlay = None
+        self._keep = None
+        self._compose = None
+
+    def color_lut(self) -> np.ndarray:
+        """(360, SATURATION_LEVELS, 3) table of angle_to_color, built once."""
+        if self._color_lut is None:
+            lut = np.zeros((360, SATURATION_LEVELS, 3), dtype=np.float32)
+            for angle in range(360):
+                for level in range(SATURATION_LEVELS):
+                    # angle_to_color saturates at strength 0.5
+                    strength = level / (SATURATION_LEVELS - 1) / 2
+                    lut[angle, level] = self.angle_to_color(angle, strength)
+            self._color_lut = np.clip(lut, 0, 255)
+        return self._color_lut
+
+    def section_colors(self, field: MotionField) -> np.ndarray:
+        """Vectorized angle_to_color for every row of the field."""
+        angle_idx = np.rint(field.angle).astype(np.int64) % 360
+        saturation = np.clip(field.strength.astype(np.float64) * 2, 0.0, 1.0)
+        level_idx = np.rint(saturation * (SATURATION_LEVELS - 1)).astype(np.int64)
+        return self.color_lut()[angle_idx, level_idx]
+
+    def _buffers(self, shape: Tuple[int, ...]):
+        if self._shape != shape:
+            height, width = shape[:2]
+            self._shape = shape
+            self._overlay = np.zeros((height, width, 3), dtype=np.float32)
+            self._keep = np.zeros((height, width), dtype=np.float32)
+            self._compose = np.zeros((height, width, 3), dtype=np.float32)
+        return self._overlay, self._keep, self._compose
+
+    def render(self, frame: np.ndarray, field: MotionField, out: Optional[np.ndarray] = None) -> np.ndarray:
+        overlay, keep, compose = self._buffers(frame.shape)
+        overlay.fill(0)
+        keep.fill(1)
+
+        height, width = frame.shape[:2]
+        x0 = field.x.astype(np.int64)
+        y0 = field.y.astype(np.int64)
+        x1 = x0 + field.width
+        y1 = y0 + field.height
+        strength = field.strength.astype(np.float64)
+        static = field.direction == STATIC_DIRECTION
+
+        if self.config.COLOR_CODE_MOTION:
+            blend_colors = 0.3 * self.section_colors(field)
+            blend_colors[static] = 0.3 * np.array(STATIC_COLOR, dtype=np.float32)
+
+        # Motion vector geometry for all sections at once
+        angle_rad = np.radians(field.angle.astype(np.float64))
+        vector_length = strength * self.config.VECTOR_SCALE * 20
+        center_x = x0 + field.width // 2
+        center_y = y0 + field.height // 2
+        end_x = (center_x + vector_length * np.sin(angle_rad)).astype(np.int64)
+        end_y = (center_y - vector_length * np.cos(angle_rad)).astype(np.int64)
+        show_vector = strength > 0.1
+
+        # Same order as the recursive drawing: each section, then its subsections
+        for i in field.depth_first_order():
+            if self.config.COLOR_CODE_MOTION:
+                # cv2.rectangle fills its corner points inclusively
+                rows = slice(max(y0[i], 0), min(y1[i] + 1, height))
+                cols = slice(max(x0[i], 0), min(x1[i] + 1, width))
+                section_overlay = overlay[rows, cols]
+                section_overlay *= 0.7
+                section_overlay += blend_colors[i]
+                keep[rows, cols] *= 0.7
+
+            if self.config.SHOW_GRID_LINES:
+                line_color = STATIC_LINE_COLOR if static[i] else (255, 255, 255)
+                cv2.rectangle(overlay, (x0[i], y0[i]), (x1[i], y1[i]), line_color, 1)
+                cv2.rectangle(keep, (x0[i], y0[i]), (x1[i], y1[i]), 0, 1)
+
+            if self.config.SHOW_MOTION_VECTORS and show_vector[i]:
+                cv2.arrowedLine(overlay, (center_x[i], center_y[i]), (end_x[i], end_y[i]),
+                                (0, 255, 255), 2, tipLength=0.3)
+                cv2.arrowedLine(keep, (center_x[i], center_y[i]), (end_x[i], end_y[i]),
+                                0, 2, tipLength=0.3)
+
+        # Single blend: frame * keep + overlay, rounded back to uint8
+        np.multiply(frame, keep[:, :, None], out=compose)
+        compose += overlay
+        compose += 0.5
+        if out is None:
+            out = np.empty(frame.shape, dtype=np.uint8)
+        np.copyto(out, compose, casting='unsafe')
+        return out
@@ -0,0 +1,159 @@
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import time
+import cv2
+import numpy as np
+from typing import Dict, Iterator, List, Optional
+
+from config import Config
+from video_io import frame_range, seek_to_frame
+
+# Frames of the sweep, opened read-only by each worker process in _init_sweep_worker
+_worker_frames = None
+_worker_config = None
+
+
+class SharedFrames:
+    """Grayscale test frames decoded once into a read-only memory-mapped .npy file.
+
+    Worker processes map the same file instead of each decoding the video, and
+    the OS page cache keeps a single copy of the pixels for all of them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.frames = np.load(path, mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @classmethod
+    def decode(cls, video_path: str, config: Config, directory: Optional[str] = None) -> 'SharedFrames':
+        """Decode the test window (SKIP_FRAMES/START_TIME up to MAX_FRAMES/END_TIME) of a video.
+
+        Frames are converted straight into the memory-mapped file, sized from the
+        window or the reported frame count, so only one frame is held in memory.
+        Without an end setting the window runs to the reported end of the video.
+        """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file: {video_path}")
+
+        directory = tempfile.mkdtemp(prefix='motion_sweep_', dir=directory)
+        path = os.path.join(directory, 'frames.npy')
+        try:
+            # Seek to the test section
+            first, end = frame_range(config, cap.get(cv2.CAP_PROP_FPS))
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if total > 0:
+                end = total if end is None else min(end, total)
+            if end is None:
+                raise ValueError(f"Frame count of {video_path} unknown; set MAX_FRAMES or END_TIME")
+            position = seek_to_frame(cap, first)
+
+            buffer = None
+            count = 0
+            while position + count < end:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if buffer is None:
+                    buffer = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8,
+                                                       shape=(end - position,) + frame.shape[:2])
+                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffer[count])
+                count += 1
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        finally:
+            cap.release()
+
+        if not count:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise ValueError(f"No frames to test in {video_path} from frame {first}")
+
+        if count < len(buffer):
+            # The video ended before its reported frame count: copy the decoded frames to a file of their size
+            trimmed_path = os.path.join(directory, 'trimmed.npy')
+            trimmed = np.lib.format.open_memmap(trimmed_path, mode='w+', dtype=np.uint8,
+                                                shape=(count,) + buffer.shape[1:])
+            for i in range(count):
+                trimmed[i] = buffer[i]
+            trimmed.flush()
+            del trimmed
+            del buffer
+            os.replace(trimmed_path, path)
+        else:
+            buffer.flush()
+            del buffer
+        return cls(path)
+
+    def close(self):
+        self.frames = None
+        shutil.rmtree(os.path.dirname(self.path), ignore_errors=True)
+
+
+def grid_configurations(space: Dict[str, List]) -> Iterator[Dict]:
+    """Every combination of the values in `space` ({param: [values]})."""
+    names = list(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_configurations(space: Dict[str, List], samples: int, seed: int = 0) -> List[Dict]:
+    """`samples` distinct combinations drawn at random from `space`."""
+    configurations = list(grid_configurations(space))
+    return random.Random(seed).sample(configurations, min(samples, len(configurations)))
+
+
+def configuration_name(params: Dict) -> str:
+    return ', '.join(f"{name}={value}" for name, value in params.items())
+
+
+def _init_sweep_worker(frames_path: str, config: Config):
+    global _worker_frames, _worker_config
+    _worker_frames = np.load(frames_path, mmap_mode='r')
+    _worker_config = config
+
+
+def evaluate_frames(frames: np.ndarray, params: Dict, config: Config,
+                    frame_count: Optional[int] = None) -> Dict:
+    """Analyze the first `frame_count` frames with `params` applied on top of `config`.
+
+    Returns the raw per-frame data MotionTestOptimizer.analyze_test_results expects.
+    """
+    from motion_analyzer import VideoMotionAnalyzer
+
+    analyzer = VideoMotionAnalyzer(config.replace(**params))
+
+    if frame_count is None:
+        frame_count = len(frames)
+
+    motion_data = []
+    overall_directions = []
+    processing_times = []
+    prev_frame = np.asarray(frames[0])
+    for i in range(1, min(frame_count, len(frames))):
+        # Same array objects across pairs, so per-frame caches in the analyzer are hit
+        curr_frame = np.asarray(frames[i])
+        start_time = time.perf_counter()
+        field = analyzer.analyze_frame_pair(prev_frame, curr_frame)
+        overall_directions.append(analyzer.calculate_field_movement(field))
+        processing_times.append(time.perf_counter() - start_time)
+
+        top = field.parent < 0
+        motion_data.append([{'angle': float(angle), 'strength': float(strength), 'area': int(area)}
+                            for angle, strength, area in zip(
+                                field.angle[top], field.strength[top],
+                                field.width[top] * field.height[top])])
+        prev_frame = curr_frame
+
+    return {'motion_data': motion_data, 'overall_directions': overall_directions,
+            'processing_times': processing_times}
+
+
+def _evaluate(params: Dict, frame_count: Optional[int]) -> Dict:
+    return evaluate_frames(_worker_frames, params, _worker_config, frame_count)
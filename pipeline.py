@@ -0,0 +1,76 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Iterable, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from motion_field import MotionField
+
+# Analyzer owned by each worker process, created once by _init_worker
+_worker_analyzer = None
+
+
+def _init_worker(config: Config, letterbox: Optional[Tuple[int, int, int, int]] = None):
+    global _worker_analyzer
+    from motion_analyzer import VideoMotionAnalyzer
+
+    # The parent's config is pickled along, so workers use exactly the same settings
+    _worker_analyzer = VideoMotionAnalyzer(config)
+    # Likewise the parent's letterbox bars, instead of each worker detecting its own
+    _worker_analyzer.region_mask.letterbox = letterbox
+
+
+def _analyze_pair(prev_frame: np.ndarray, curr_frame: np.ndarray):
+    return _worker_analyzer.analyze_frame_pair(prev_frame, curr_frame)
+
+
+def _result(frame_count: int, frame: np.ndarray, field):
+    if isinstance(field, Future):
+        field = field.result()
+    return frame_count, frame, field
+
+
+def iter_parallel_results(frames: Iterable[Tuple[int, np.ndarray, np.ndarray]], config: Config,
+                          cached: Optional[Callable[[int], Optional[MotionField]]] = None,
+                          letterbox: Optional[Tuple[int, int, int, int]] = None):
+    """Analyze consecutive frame pairs on a process pool, yielding results in frame order.
+
+    frames yields (frame_count, frame, gray_frame) as VideoMotionAnalyzer.iter_frames
+    does. Each (prev_gray, curr_gray) pair is submitted to the pool as soon as it is
+    read. Pending pairs are kept in a FIFO reorder buffer: workers may finish out of
+    order, but results are only handed out from the head of the buffer, so the
+    consumer always sees frames in order. Once queue_size pairs are in flight the
+    reader waits for the oldest one, which keeps memory bounded on long videos.
+    Uses config.NUM_WORKERS processes and config.PIPELINE_QUEUE_SIZE. Pairs for
+    which cached(frame_count) returns a field are not submitted; the cached field
+    takes their place in the buffer. letterbox, if known, is used by every worker
+    (see VideoMotionAnalyzer.video_letterbox).
+    """
+    workers = config.NUM_WORKERS
+    queue_size = config.PIPELINE_QUEUE_SIZE
+    if queue_size is None:
+        queue_size = 2 * workers
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(config, letterbox))
+    pending = deque()
+
+    try:
+        prev_frame = None
+        for frame_count, frame, gray_frame in frames:
+            if prev_frame is not None:
+                field = cached(frame_count) if cached is not None else None
+                if field is None:
+                    field = executor.submit(_analyze_pair, prev_frame, gray_frame)
+                pending.append((frame_count, frame, field))
+
+                if len(pending) >= queue_size:
+                    yield _result(*pending.popleft())
+
+            prev_frame = gray_frame
+
+        while pending:
+            yield _result(*pending.popleft())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,223 @@
+import numpy as np
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+from frame_stats import FrameStatistics
+
+# Bound slack against rounding (template scores are float32), so pruning never drops the best candidate
+BOUND_EPSILON = 1e-6
+
+# Centered energy per pixel below which a patch counts as flat (the sums carry some rounding error)
+FLAT_ENERGY = 1e-6
+
+# Priority boosts over the score bound (which lies in [-1, 1]) for the likely candidates
+CONSENSUS_PRIORITY = 4.0
+NEIGHBOR_PRIORITY = 2.0
+
+# Bounds that skip a smaller share of the candidates they are computed for cost more than
+# they save (e.g. on noisy footage); they are then left out, and tried again after this many searches.
+# The share is taken over the last BOUND_HISTORY searches with bounds, by candidate count.
+MIN_PRUNED_SHARE = 0.15
+BOUND_RETRY_SEARCHES = 16
+BOUND_HISTORY = 8
+
+
+class PrunedDirectionSearch:
+    """Direction search that evaluates likely candidates first and skips hopeless ones.
+
+    Candidates are tried in rounds, one per unresolved section per round, in
+    order of likelihood: the predicted direction (the previous frame's or the
+    parent section's, else the direction most sections ended up with in the
+    last search), then that consensus direction, the predicted direction's
+    neighbors, and the rest by score bound. A section is resolved once its best
+    score reaches PRUNE_ACCEPT_SCORE, or when no remaining candidate's upper
+    bound can beat its best score.
+
+    The bound splits the section into PRUNE_BOUND_BLOCKS x PRUNE_BOUND_BLOCKS
+    blocks. By Cauchy-Schwarz, a block's contribution to the covariance is at
+    most the square root of the product of both patches' centered energy in
+    that block, and those energies are O(1) lookups in the FrameStatistics
+    integral images, looked up once per block corner. The bound holds up to
+    rounding, so without PRUNE_ACCEPT_SCORE the result is the same as a full
+    search's (barring exactly tied scores).
+
+    When the bounds of the recent searches skip less than MIN_PRUNED_SHARE of
+    the candidates, the following searches score all candidates of the unresolved sections at once
+    instead, until bounds are tried again after BOUND_RETRY_SEARCHES searches.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        # Direction most sections ended up with in the last search, tried first next time
+        self.consensus: Optional[int] = None
+        # (skipped, bounded) candidates of the recent searches with bounds, and searches since bounds were left out
+        self._bound_history = deque(maxlen=BOUND_HISTORY)
+        self._unbounded_searches = 0
+        # Candidates skipped by bound, sections stopped by PRUNE_ACCEPT_SCORE, in the last search
+        self.last_stats = {'pruned': 0, 'accepted': 0, 'rounds': 0}
+
+    @property
+    def pruned_share(self) -> float:
+        """Share of the candidates with a bound that the recent searches skipped."""
+        skipped = sum(count for count, _ in self._bound_history)
+        bounded = sum(count for _, count in self._bound_history)
+        return skipped / bounded if bounded else 1.0
+
+    def upper_bounds(self, prev_stats: FrameStatistics, curr_stats: FrameStatistics,
+                     xs: np.ndarray, ys: np.ndarray, ws: np.ndarray, hs: np.ndarray) -> np.ndarray:
+        """(N, len(DIRECTIONS)) upper bounds of the correlation scores; -inf where out of bounds."""
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        ws = np.asarray(ws, dtype=np.int64)
+        hs = np.asarray(hs, dtype=np.int64)
+        height, width = curr_stats.frame.shape[:2]
+        blocks = self.config.PRUNE_BOUND_BLOCKS
+
+        # Block edges relative to the section origin, (N, blocks + 1) per axis
+        steps = np.arange(blocks + 1)
+        edges_x = (ws[:, None] * steps) // blocks
+        edges_y = (hs[:, None] * steps) // blocks
+        block_n = (np.diff(edges_y, axis=1)[:, :, None] *
+                   np.diff(edges_x, axis=1)[:, None, :]).reshape(len(xs), -1).astype(np.float64)
+
+        def lattice_sums(table: np.ndarray, corners: np.ndarray):
+            # Block sums from the integral image at every block corner, and the whole section's sum
+            values = table.ravel().take(corners)
+            sums = values[:, 1:, 1:] - values[:, :-1, 1:] - values[:, 1:, :-1] + values[:, :-1, :-1]
+            total = values[:, -1, -1] - values[:, 0, -1] - values[:, -1, 0] + values[:, 0, 0]
+            return sums.reshape(len(corners), -1), total
+
+        def centered_energy(stats: FrameStatistics, x0: np.ndarray, y0: np.ndarray, rows: np.ndarray):
+            # Energy of each block of sections `rows` at (x0, y0), around the mean of the whole section.
+            # Neighboring blocks share corners, so each corner is looked up once per table.
+            corners = ((y0[:, None] + edges_y[rows])[:, :, None] * (width + 1) +
+                       (x0[:, None] + edges_x[rows])[:, None, :])
+            sums, total = lattice_sums(stats.sum, corners)
+            sqsums, _ = lattice_sums(stats.sqsum, corners)
+            mean = (total / (ws[rows] * hs[rows]).astype(np.float64))[:, None]
+            return np.maximum(sqsums - 2 * mean * sums + block_n[rows] * mean ** 2, 0.0)
+
+        all_rows = np.arange(len(xs))
+        prev_energy = centered_energy(prev_stats, xs, ys, all_rows)
+        prev_total = prev_energy.sum(axis=1)
+
+        bounds = np.full((len(xs), len(self.config.DIRECTIONS)), -np.inf)
+        for i, (sx, sy) in enumerate(self.config.direction_offsets):
+            new_xs, new_ys = xs + sx, ys + sy
+            # Same bounds rule as BatchMotionMatcher.score_sections
+            valid = (new_xs >= 0) & (new_ys >= 0) & (new_xs + ws <= width) & (new_ys + hs <= height)
+            if not valid.any():
+                continue
+
+            idx = np.nonzero(valid)[0]
+            curr_energy = centered_energy(curr_stats, new_xs[idx], new_ys[idx], idx)
+            curr_total = curr_energy.sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                bound = np.sqrt(prev_energy[idx] * curr_energy).sum(axis=1) / np.sqrt(prev_total[idx] * curr_total)
+
+            # Flat patches score as in the matcher: 1 against a flat candidate, 0 from a flat previous patch
+            pixels = (ws[idx] * hs[idx]).astype(np.float64)
+            bound = np.where(prev_total[idx] <= FLAT_ENERGY * pixels, 0.0, bound)
+            bound = np.where(curr_total <= FLAT_ENERGY * pixels, 1.0, bound)
+            bounds[idx, i] = np.minimum(bound, 1.0) + BOUND_EPSILON
+
+        return bounds
+
+    def search(self, score: Callable[[np.ndarray], np.ndarray],
+               upper_bounds: Callable[[np.ndarray], np.ndarray], count: int,
+               predicted: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Pruned search over the candidates of `count` sections.
+
+        score(mask) returns the (count, len(DIRECTIONS)) scores of the candidates
+        in the boolean mask, -inf elsewhere; upper_bounds(rows) returns the score
+        bounds of those sections' candidates (see upper_bounds()). predicted
+        holds a likely direction per section (-1 for none). Bounds are only
+        computed for sections the first round did not resolve.
+
+        Returns (scores, estimates, evaluations): scores are -inf for candidates
+        that were never evaluated, and estimates hold the score, or for
+        candidates skipped by bound the bound, e.g. to judge how ambiguous the
+        best direction is.
+        """
+        directions = len(self.config.DIRECTIONS)
+        shape = (count, directions)
+        rows = np.arange(count)
+        accept = self.config.PRUNE_ACCEPT_SCORE
+        scores = np.full(shape, -np.inf)
+        evaluated = np.zeros(shape, dtype=bool)
+        resolved = np.zeros(count, dtype=bool)
+
+        if predicted is None:
+            predicted = np.full(count, -1)
+        if self.consensus is not None:
+            # Without a better guess, sections probably move like most sections did last time
+            predicted = np.where(predicted >= 0, predicted, self.consensus)
+        has_prediction = predicted >= 0
+
+        # First round: the predicted direction, before any bounds are computed
+        rounds = 0
+        if has_prediction.any():
+            evaluated[rows[has_prediction], predicted[has_prediction]] = True
+            scores = np.where(evaluated, score(evaluated), -np.inf)
+            rounds = 1
+        best = scores.max(axis=1)
+        if accept is not None:
+            resolved = best >= accept
+
+        bounds = np.full(shape, -np.inf)
+        open_rows = np.nonzero(~resolved)[0]
+        use_bounds = (self.pruned_share >= MIN_PRUNED_SHARE or
+                      self._unbounded_searches >= BOUND_RETRY_SEARCHES)
+        if len(open_rows) and use_bounds:
+            bounds[open_rows] = upper_bounds(open_rows)
+            self._unbounded_searches = 0
+        elif len(open_rows):
+            # Full search of the unresolved sections, in one round
+            mask = ~evaluated & ~resolved[:, None]
+            scores = np.where(mask, score(mask), scores)
+            evaluated |= mask
+            best = scores.max(axis=1)
+            rounds += 1
+            self._unbounded_searches += 1
+
+        priority = bounds.copy()
+        center = np.where(has_prediction, predicted, 0)
+        for offset in (-1, 1):
+            column = (center + offset) % directions
+            priority[rows[has_prediction], column[has_prediction]] += NEIGHBOR_PRIORITY
+        if self.consensus is not None:
+            priority[:, self.consensus] += CONSENSUS_PRIORITY
+
+        while True:
+            remaining = (~evaluated & ~resolved[:, None] & np.isfinite(bounds) &
+                         (bounds > best[:, None]))
+            active = remaining.any(axis=1)
+            if not active.any():
+                break
+
+            choice = np.argmax(np.where(remaining, priority, -np.inf), axis=1)
+            mask = np.zeros(shape, dtype=bool)
+            mask[rows[active], choice[active]] = True
+            round_scores = score(mask)
+            scores = np.where(mask, round_scores, scores)
+            evaluated |= mask
+            best = np.maximum(best, np.where(mask, round_scores, -np.inf).max(axis=1))
+            if accept is not None:
+                resolved |= best >= accept
+            rounds += 1
+
+        found = np.isfinite(best)
+        if found.any():
+            winners = np.argmax(scores[found], axis=1)
+            self.consensus = int(np.bincount(winners, minlength=directions).argmax())
+
+        skipped = np.isfinite(bounds) & ~evaluated & ~resolved[:, None]
+        if len(open_rows) and use_bounds:
+            self._bound_history.append((int(skipped.sum()), int(np.isfinite(bounds).sum())))
+        self.last_stats = {
+            'pruned': int(skipped.sum()),
+            'accepted': int(resolved.sum()),
+            'rounds': rounds,
+        }
+        estimates = np.where(skipped, np.minimum(bounds, 1.0), scores)
+        return scores, estimates, int(evaluated.sum())
@@ -0,0 +1,182 @@
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+# Smallest template side (in pixels) searched at a downsampled level
+MIN_LEVEL_SIZE = 8
+
+
+def subpixel_offset(left: float, center: float, right: float) -> float:
+    """Peak offset of a parabola through three equally spaced samples, in [-0.5, 0.5]."""
+    curvature = left - 2 * center + right
+    if curvature >= 0:
+        return 0.0
+    return float(np.clip(0.5 * (left - right) / curvature, -0.5, 0.5))
+
+
+class PyramidMotionSearch:
+    """Coarse-to-fine displacement search with a sub-pixel peak fit.
+
+    Each section is first matched over a small window of offsets on a
+    downsampled level of a Gaussian pyramid, where a few pixels cover a large
+    full-resolution displacement. The best offset is doubled onto the next
+    finer level and only refined within a +-PYRAMID_REFINE_RADIUS window,
+    down to full resolution, where a parabola fit through the correlation
+    peak gives a sub-pixel (dx, dy). The number of correlations per section is
+    therefore fixed by the radii and the number of levels, not by the size of
+    the motion.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._pyramids: List[Tuple[np.ndarray, List[np.ndarray]]] = []
+        self.prev_pyramid: List[np.ndarray] = []
+        self.curr_pyramid: List[np.ndarray] = []
+
+    def _pyramid(self, frame: np.ndarray) -> List[np.ndarray]:
+        # The current frame of one pair is the previous frame of the next
+        for cached_frame, levels in self._pyramids:
+            if cached_frame is frame:
+                return levels
+
+        levels = [frame]
+        for _ in range(1, self.config.PYRAMID_LEVELS):
+            if min(levels[-1].shape[:2]) < 2 * MIN_LEVEL_SIZE:
+                break
+            levels.append(cv2.pyrDown(levels[-1]))
+
+        self._pyramids = self._pyramids[-1:] + [(frame, levels)]
+        return levels
+
+    def prepare(self, prev_frame: np.ndarray, curr_frame: np.ndarray):
+        self.prev_pyramid = self._pyramid(prev_frame)
+        self.curr_pyramid = self._pyramid(curr_frame)
+
+    def _start_level(self, width: int, height: int) -> int:
+        level = len(self.prev_pyramid) - 1
+        while level > 0 and min(width, height) >> level < MIN_LEVEL_SIZE:
+            level -= 1
+        return level
+
+    def _match_window(self, level: int, lx: int, ly: int, lw: int, lh: int,
+                      pred_x: int, pred_y: int, radius: int):
+        """Correlate one section over a window of offsets around a predicted offset.
+
+        Returns (result, score, pred_x, pred_y, peak_x, peak_y), where pred is the
+        best offset at this level, or None if no candidate fits inside the frame.
+        """
+        curr_level = self.curr_pyramid[level]
+        level_height, level_width = curr_level.shape[:2]
+
+        # Range of candidate top-left corners that keep the section inside the frame
+        x0 = max(0, lx + pred_x - radius)
+        x1 = min(level_width - lw, lx + pred_x + radius)
+        y0 = max(0, ly + pred_y - radius)
+        y1 = min(level_height - lh, ly + pred_y + radius)
+        if x1 < x0 or y1 < y0:
+            return None
+
+        template = self.prev_pyramid[level][ly:ly + lh, lx:lx + lw]
+        region = curr_level[y0:y1 + lh, x0:x1 + lw]
+        result = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (peak_x, peak_y) = cv2.minMaxLoc(result)
+        return result, score, x0 + peak_x - lx, y0 + peak_y - ly, peak_x, peak_y
+
+    def full_search_evaluations(self) -> int:
+        """Candidate offsets correlated by a search without a prediction."""
+        search = 2 * self.config.PYRAMID_SEARCH_RADIUS + 1
+        refine = 2 * self.config.PYRAMID_REFINE_RADIUS + 1
+        return search ** 2 + (self.config.PYRAMID_LEVELS - 1) * refine ** 2
+
+    def _refine(self, result: np.ndarray, score: float, lx: int, ly: int, lw: int, lh: int,
+                pred_x: int, pred_y: int, peak_x: int, peak_y: int) -> Tuple[float, float, float]:
+        # The sub-pixel fit needs both neighbors of the peak; if the peak sits on
+        # the edge of the refinement window, re-center the window on it
+        for _ in range(2):
+            rows, cols = result.shape
+            if 0 < peak_x < cols - 1 and 0 < peak_y < rows - 1:
+                break
+            match = self._match_window(0, lx, ly, lw, lh, pred_x, pred_y, 1)
+            if match is None or match[1] < score:
+                break
+            result, score, pred_x, pred_y, peak_x, peak_y = match
+
+        # Sub-pixel refinement around the full-resolution peak
+        dx, dy = float(pred_x), float(pred_y)
+        if 0 < peak_x < result.shape[1] - 1:
+            dx += subpixel_offset(result[peak_y, peak_x - 1], score, result[peak_y, peak_x + 1])
+        if 0 < peak_y < result.shape[0] - 1:
+            dy += subpixel_offset(result[peak_y - 1, peak_x], score, result[peak_y + 1, peak_x])
+
+        return dx, dy, float(score)
+
+    def search_section(self, x: int, y: int, width: int, height: int,
+                       predicted: Optional[Tuple[float, float]] = None,
+                       accept_score: float = 1.0) -> Tuple[float, float, float, int]:
+        """Return (dx, dy, score, evaluations) of the best match of one previous-frame section.
+
+        With a predicted (dx, dy), e.g. from the previous frame, only a
+        +-PYRAMID_REFINE_RADIUS window around it is searched at full resolution
+        first. If that window's peak is interior and scores at least
+        accept_score, the coarse-to-fine search is skipped.
+        """
+        evaluations = 0
+
+        if predicted is not None:
+            lw = min(width, self.curr_pyramid[0].shape[1] - x)
+            lh = min(height, self.curr_pyramid[0].shape[0] - y)
+            radius = self.config.PYRAMID_REFINE_RADIUS
+            match = self._match_window(0, x, y, lw, lh, int(round(predicted[0])),
+                                       int(round(predicted[1])), radius)
+            if match is not None:
+                result, score, pred_x, pred_y, peak_x, peak_y = match
+                evaluations += result.size
+                rows, cols = result.shape
+                if score >= accept_score and 0 < peak_x < cols - 1 and 0 < peak_y < rows - 1:
+                    dx, dy, score = self._refine(result, score, x, y, lw, lh, pred_x, pred_y, peak_x, peak_y)
+                    return dx, dy, score, evaluations
+
+        top = self._start_level(width, height)
+        pred_x, pred_y = 0, 0
+
+        for level in range(top, -1, -1):
+            level_height, level_width = self.curr_pyramid[level].shape[:2]
+            lx, ly = x >> level, y >> level
+            lw = min(max(width >> level, 1), level_width - lx)
+            lh = min(max(height >> level, 1), level_height - ly)
+            if lw <= 0 or lh <= 0:
+                return 0.0, 0.0, -1.0, evaluations
+
+            radius = self.config.PYRAMID_SEARCH_RADIUS if level == top else self.config.PYRAMID_REFINE_RADIUS
+            match = self._match_window(level, lx, ly, lw, lh, pred_x, pred_y, radius)
+            if match is None:
+                return float(pred_x << level), float(pred_y << level), -1.0, evaluations
+
+            result, score, pred_x, pred_y, peak_x, peak_y = match
+            evaluations += result.size
+            if level > 0:
+                pred_x *= 2
+                pred_y *= 2
+
+        dx, dy, score = self._refine(result, score, lx, ly, lw, lh, pred_x, pred_y, peak_x, peak_y)
+        return dx, dy, score, evaluations
+
+    def search_sections(self, xs, ys, widths, heights, predicted_dxs=None, predicted_dys=None,
+                        accept_score: float = 1.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """Vector of (dx, dy, score) for many sections, plus the total evaluation count.
+
+        Predictions are optional; NaN entries mean no prediction for that section.
+        """
+        count = len(xs)
+        dxs = np.zeros(count)
+        dys = np.zeros(count)
+        scores = np.full(count, -1.0)
+        evaluations = 0
+        for i in range(count):
+            predicted = None
+            if predicted_dxs is not None and not np.isnan(predicted_dxs[i]):
+                predicted = (predicted_dxs[i], predicted_dys[i])
+            dxs[i], dys[i], scores[i], section_evaluations = self.search_section(
+                int(xs[i]), int(ys[i]), int(widths[i]), int(heights[i]), predicted, accept_score)
+            evaluations += section_evaluations
+        return dxs, dys, scores, evaluations
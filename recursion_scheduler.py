@@ -0,0 +1,133 @@
+import heapq
+import time
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+
+from motion_field import MotionField
+
+# Sections expanded per scoring call; keeps the matcher batched without overshooting the budget much
+EXPANSION_BATCH = 8
+
+
+class RecursionScheduler:
+    """Expands the most informative sections first, within a per-frame budget.
+
+    Every analyzed section that may be subdivided (depth below
+    MAX_RECURSIVE_DEPTH and strength above MOTION_THRESHOLD) becomes a
+    candidate with a priority made of two parts:
+
+    - ambiguity: how close the runner-up direction came to the best one
+    - disagreement: how far the section's direction is from its neighbors'
+      (grid neighbors for grid sections, siblings for subsections)
+
+    Candidates are expanded in priority order, and their subsections become
+    candidates in turn, until RECURSION_BUDGET_MS or
+    RECURSION_BUDGET_EVALUATIONS runs out. The evaluation budget counts the
+    candidate evaluations score_rows reports as performed, so searches that
+    skip candidates leave room for more expansions. Without a budget the
+    resulting tree is the same as with the plain threshold rule.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.last_stats: Dict = {}
+
+    def _grid_shape(self) -> Tuple[int, int]:
+        rows, cols = self.config.GRID_ROWS, self.config.GRID_COLS
+        if self.config.EXCLUDE_BORDER_SECTIONS:
+            return rows - 2, cols - 2
+        return rows, cols
+
+    def disagreement(self, field: MotionField, start: int, end: int) -> np.ndarray:
+        """0 when a section moves like its neighbors, 1 when it moves the opposite way."""
+        angle_rad = np.radians(field.angle[start:end].astype(np.float64))
+        weight = np.clip(field.strength[start:end].astype(np.float64), 0, None)
+        vectors = np.stack([np.sin(angle_rad), np.cos(angle_rad)], axis=1)
+        weighted = vectors * weight[:, None]
+
+        rows, cols = self._grid_shape()
+        if start == 0 and end - start == rows * cols and np.all(field.parent[start:end] < 0):
+            # Grid sections: sum of the 3x3 neighborhood, minus the section itself
+            grid = np.pad(weighted.reshape(rows, cols, 2), ((1, 1), (1, 1), (0, 0)))
+            neighborhood = sum(grid[r:r + rows, c:c + cols] for r in range(3) for c in range(3))
+            neighbors = neighborhood.reshape(-1, 2) - weighted
+        else:
+            # Subsections: sum over siblings sharing the same parent, minus the section itself
+            parents = field.parent[start:end]
+            groups, inverse = np.unique(parents, return_inverse=True)
+            sums = np.zeros((len(groups), 2))
+            np.add.at(sums, inverse, weighted)
+            neighbors = sums[inverse] - weighted
+
+        norm = np.linalg.norm(neighbors, axis=1)
+        cosine = np.where(norm > 0, (vectors * neighbors).sum(axis=1) / np.maximum(norm, 1e-12), 1.0)
+        return (1 - cosine) / 2
+
+    def priorities(self, field: MotionField, start: int, end: int, margins: np.ndarray) -> np.ndarray:
+        ambiguity = 1 - np.clip(margins, 0, 1)
+        return 0.5 * ambiguity + 0.5 * self.disagreement(field, start, end)
+
+    def run(self, field: MotionField,
+            score_rows: Callable[[int, int], Tuple[np.ndarray, int]],
+            subdivide: Callable[[np.ndarray], Tuple[int, int]],
+            evaluations_per_section: int,
+            start_time: Optional[float] = None) -> MotionField:
+        """Score the grid sections already in `field`, then expand candidates by priority.
+
+        score_rows(start, end) scores field rows [start, end) in place and returns
+        their score margins and the candidate evaluations it performed;
+        subdivide(rows) appends subsections and returns their (start, end) row
+        range. evaluations_per_section, the most one section can cost, limits
+        how many expansions are batched near the end of the evaluation budget.
+        """
+        if start_time is None:
+            start_time = time.perf_counter()
+        budget_ms = self.config.RECURSION_BUDGET_MS
+        budget_evaluations = self.config.RECURSION_BUDGET_EVALUATIONS
+
+        heap = []
+        evaluations = 0
+        expanded = 0
+
+        def score_and_queue(start: int, end: int):
+            nonlocal evaluations
+            margins, performed = score_rows(start, end)
+            evaluations += performed
+
+            priority = self.priorities(field, start, end, margins)
+            eligible = ((field.strength[start:end] > self.config.MOTION_THRESHOLD) &
+                        (field.depth[start:end] < self.config.MAX_RECURSIVE_DEPTH))
+            for row in np.nonzero(eligible)[0]:
+                heapq.heappush(heap, (-priority[row], start + int(row)))
+
+        # The grid level is always analyzed in full
+        score_and_queue(0, field.size)
+
+        exhausted = False
+        while heap:
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            if ((budget_ms is not None and elapsed_ms >= budget_ms) or
+                (budget_evaluations is not None and evaluations >= budget_evaluations)):
+                exhausted = True
+                break
+
+            batch_size = min(EXPANSION_BATCH, len(heap))
+            if budget_evaluations is not None:
+                # Don't overshoot the evaluation budget by more than one expansion
+                per_expansion = self.config.RECURSIVE_SUBDIVISION_FACTOR ** 2 * evaluations_per_section
+                batch_size = max(1, min(batch_size, (budget_evaluations - evaluations) // per_expansion))
+
+            batch = [heapq.heappop(heap)[1] for _ in range(batch_size)]
+            start, end = subdivide(np.array(batch, dtype=np.int64))
+            expanded += len(batch)
+            if end > start:
+                score_and_queue(start, end)
+
+        self.last_stats = {
+            'expanded': expanded,
+            'pending': len(heap),
+            'evaluations': evaluations,
+            'budget_exhausted': exhausted,
+            'time_ms': (time.perf_counter() - start_time) * 1000,
+        }
+        return field
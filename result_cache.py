@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Optional, Tuple
+
+from motion_export import MotionFieldReader, MotionFieldWriter
+
+# Bumped when analysis results change for the same settings, so old entries are not reused
+CACHE_VERSION = 3
+
+# Settings that change how results are drawn, shown or computed in parallel, but not the results
+NON_ANALYSIS_SETTINGS = {
+    'SHOW_MOTION_VECTORS', 'SHOW_GRID_LINES', 'COLOR_CODE_MOTION', 'VECTOR_SCALE', 'SHOW_COMPASS',
+    'SHOW_OVERALL_DIRECTION', 'HEADLESS', 'NUM_WORKERS', 'PIPELINE_QUEUE_SIZE', 'DECODE_QUEUE_SIZE',
+    'ENCODE_QUEUE_SIZE', 'BUFFER_POOL', 'CACHE_DIR', 'CACHE_MAX_MB', 'LATENCY_TARGET_MS',
+    'TELEMETRY_FILE', 'TELEMETRY_INTERVAL', 'BATCH_CHUNK_FRAMES', 'BATCH_JOBS',
+    # The analyzed range: entries hold results per frame, whatever range they came from
+    'SKIP_FRAMES', 'MAX_FRAMES', 'START_TIME', 'END_TIME',
+}
+
+# Bytes hashed from the start, the end and evenly spaced blocks of the video
+FINGERPRINT_BLOCK = 1 << 20
+FINGERPRINT_SAMPLES = 16
+
+
+def video_fingerprint(video_path: str) -> str:
+    """Content hash of a video from its size and sampled blocks; cheap even for very long files."""
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(video_path, 'rb') as f:
+        if size <= FINGERPRINT_BLOCK * FINGERPRINT_SAMPLES:
+            digest.update(f.read())
+        else:
+            step = (size - FINGERPRINT_BLOCK) / (FINGERPRINT_SAMPLES - 1)
+            for i in range(FINGERPRINT_SAMPLES):
+                f.seek(int(i * step))
+                digest.update(f.read(FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """Content hash of a small file, such as a mask image."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def analysis_settings(config) -> Dict:
+    return {name: value for name, value in config.to_dict().items() if name not in NON_ANALYSIS_SETTINGS}
+
+
+class ResultCache:
+    """On-disk cache of per-frame motion fields, keyed by video content and analysis settings.
+
+    Each entry is a motion export directory (see motion_export.py) holding the
+    fields of every analyzed frame in frame coordinates. Entries are appended
+    to as frames get analyzed, so an interrupted or partial run is resumed
+    rather than redone. When the cache grows past max_bytes, the least recently
+    used entries are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, video_path: str, config) -> str:
+        """Hash of the cache version, video content and analysis settings.
+
+        MASK_IMAGE is a path, so the mask's content is hashed too: editing the
+        mask in place invalidates the entries made with it. Letterbox bars need
+        no entry of their own, as they are detected on frames spread over the
+        whole video regardless of the analyzed range.
+        """
+        description = json.dumps({
+            'version': CACHE_VERSION,
+            'video': video_fingerprint(video_path),
+            'settings': analysis_settings(config),
+            'mask_image': file_digest(config.MASK_IMAGE) if config.MASK_IMAGE else None,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(description.encode()).hexdigest()[:32]
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def open(self, key: str, metadata: Optional[Dict] = None) -> Tuple[MotionFieldReader, MotionFieldWriter]:
+        """Reader over the frames cached so far, and a writer appending new frames to the entry."""
+        path = self.entry_path(key)
+        try:
+            writer = MotionFieldWriter(path, metadata=metadata, append=True)
+        except (ValueError, OSError, KeyError):
+            # Unreadable entry, e.g. from an older format: start it over
+            shutil.rmtree(path, ignore_errors=True)
+            writer = MotionFieldWriter(path, metadata=metadata)
+        self.touch(key)
+        return MotionFieldReader(path), writer
+
+    @staticmethod
+    def _entry_size(path: str) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir():
+                entries.append((entry.stat().st_mtime, entry.name, self._entry_size(entry.path)))
+
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(self.entry_path(name), ignore_errors=True)
+            total -= size
+
+    def touch(self, key: str):
+        """Mark an entry as used now; the directory mtime orders entries for eviction."""
+        path = self.entry_path(key)
+        if os.path.exists(path):
+            now = time.time()
+            os.utime(path, (now, now))
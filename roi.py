@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+from frame_stats import FrameStatistics
+
+# Letterbox bars covering more than this fraction of a dimension are taken for a dark frame instead
+MAX_LETTERBOX_FRACTION = 0.4
+# Frames spread over a video file that its letterbox bars are detected on
+LETTERBOX_SAMPLES = 5
+
+
+def detect_letterbox(frame: np.ndarray, threshold: int) -> Tuple[int, int, int, int]:
+    """(top, bottom, left, right) sizes of the black bars around a grayscale frame.
+
+    A bar is a run of rows (or columns) from the frame edge whose brightest pixel
+    is at most threshold.
+    """
+    def run_length(dark: np.ndarray) -> int:
+        return len(dark) if dark.all() else int(np.argmin(dark))
+
+    dark_rows = frame.max(axis=1) <= threshold
+    dark_cols = frame.max(axis=0) <= threshold
+    top, bottom = run_length(dark_rows), run_length(dark_rows[::-1])
+    left, right = run_length(dark_cols), run_length(dark_cols[::-1])
+
+    height, width = frame.shape[:2]
+    if top + bottom > MAX_LETTERBOX_FRACTION * height:
+        top = bottom = 0
+    if left + right > MAX_LETTERBOX_FRACTION * width:
+        left = right = 0
+    return top, bottom, left, right
+
+
+class RegionMask:
+    """The pixels of the frame that take part in motion analysis.
+
+    Combines ROI_POLYGONS (only pixels inside one of them count; points are
+    fractions of the frame width and height, so they hold at any
+    ANALYSIS_WIDTH), MASK_IMAGE (its nonzero pixels count, scaled to the frame)
+    and, with AUTO_LETTERBOX, black bars. For video files the analyzer sets
+    `letterbox` from frames spread over the whole file (see
+    VideoMotionAnalyzer.video_letterbox); otherwise the bars are detected on the
+    first frame pair. Sections whose valid fraction is below ROI_MIN_COVERAGE are not
+    created; partly masked sections are scored on the pixels valid in both the
+    section and the candidate (BatchMotionMatcher.score_masked_sections).
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.active = bool(config.ROI_POLYGONS or config.MASK_IMAGE or config.AUTO_LETTERBOX)
+        self.mask: Optional[np.ndarray] = None  # 1 where pixels are analyzed
+        self.letterbox: Optional[Tuple[int, int, int, int]] = None
+        self._integral: Optional[np.ndarray] = None
+
+    def reset(self):
+        """Forget the mask and letterbox of the last video."""
+        self.mask = None
+        self.letterbox = None
+        self._integral = None
+
+    def prepare(self, prev_frame: np.ndarray, curr_frame: np.ndarray):
+        """Build the mask for this frame size, once (no-op when inactive)."""
+        if not self.active or (self.mask is not None and self.mask.shape == curr_frame.shape[:2]):
+            return
+
+        height, width = curr_frame.shape[:2]
+        mask = np.ones((height, width), dtype=np.uint8)
+
+        if self.config.ROI_POLYGONS:
+            inside = np.zeros_like(mask)
+            scale = np.array([width, height], dtype=np.float64)
+            polygons = [np.round(np.asarray(polygon, dtype=np.float64) * scale).astype(np.int32)
+                        for polygon in self.config.ROI_POLYGONS]
+            cv2.fillPoly(inside, polygons, 1)
+            mask &= inside
+
+        if self.config.MASK_IMAGE:
+            image = cv2.imread(self.config.MASK_IMAGE, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise ValueError(f"Could not read mask image: {self.config.MASK_IMAGE}")
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_NEAREST)
+            mask &= (image > 0).astype(np.uint8)
+
+        if self.config.AUTO_LETTERBOX:
+            if self.letterbox is None:
+                self.letterbox = detect_letterbox(np.maximum(prev_frame, curr_frame),
+                                                  self.config.LETTERBOX_THRESHOLD)
+            top, bottom, left, right = self.letterbox
+            mask[:top] = 0
+            mask[height - bottom:] = 0
+            mask[:, :left] = 0
+            mask[:, width - right:] = 0
+
+        self.mask = mask
+        self._integral = cv2.integral(mask)
+
+    def applies_to(self, frame_height: int, frame_width: int) -> bool:
+        return self.mask is not None and self.mask.shape == (frame_height, frame_width)
+
+    def coverage(self, xs, ys, ws, hs) -> np.ndarray:
+        """Fraction of valid pixels in each section."""
+        xs, ys, ws, hs = (np.asarray(values, dtype=np.int64) for values in (xs, ys, ws, hs))
+        return FrameStatistics.box_sums(self._integral, xs, ys, ws, hs) / np.maximum(ws * hs, 1)
+
+    def keep(self, xs, ys, ws, hs) -> np.ndarray:
+        """Which sections are created: those with at least ROI_MIN_COVERAGE valid pixels."""
+        coverage = self.coverage(xs, ys, ws, hs)
+        return (coverage > 0) & (coverage >= self.config.ROI_MIN_COVERAGE)
+
+    def partial(self, xs, ys, ws, hs) -> np.ndarray:
+        """Which sections contain masked pixels (and need masked scoring)."""
+        if self.mask is None:
+            return np.zeros(len(xs), dtype=bool)
+        return self.coverage(xs, ys, ws, hs) < 1.0
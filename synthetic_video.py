@@ -0,0 +1,110 @@
+import cv2
+import numpy as np
+from typing import Dict, Iterator, Tuple
+
+# Standard 16:9 frame sizes (width, height)
+RESOLUTIONS = {
+    '480p': (854, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+
+# Per-frame motion of each scenario: translation in pixels, rotation in degrees,
+# zoom as a scale factor and additive Gaussian noise sigma in gray levels
+SCENARIOS = {
+    'translate': {'dx': 2.0, 'dy': -1.0},
+    'rotate': {'rotation': 0.5},
+    'zoom': {'zoom': 1.01},
+    'noise': {'dx': 2.0, 'dy': -1.0, 'noise': 8.0},
+}
+
+
+def make_texture(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Random multi-scale texture with some hard edges, so every section has structure to match."""
+    rng = np.random.default_rng(seed)
+    texture = np.zeros((height, width), dtype=np.float32)
+
+    # Octaves of smoothed noise, from coarse blobs down to fine grain
+    for sigma, weight in ((32, 0.5), (8, 0.3), (2, 0.2)):
+        noise = rng.standard_normal((height, width)).astype(np.float32)
+        noise = cv2.GaussianBlur(noise, (0, 0), sigma)
+        texture += weight * noise / (noise.std() + 1e-6)
+    texture = cv2.normalize(texture, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+    image = cv2.cvtColor(texture, cv2.COLOR_GRAY2BGR)
+    scale = max(width, height)
+    for _ in range(40):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        if rng.random() < 0.5:
+            cv2.circle(image, center, int(rng.integers(scale // 80, scale // 20)), color, -1)
+        else:
+            size = rng.integers(scale // 80, scale // 20, 2)
+            cv2.rectangle(image, center, (center[0] + int(size[0]), center[1] + int(size[1])), color, -1)
+    return image
+
+
+def frame_transform(index: int, width: int, height: int, dx: float = 0.0, dy: float = 0.0,
+                    rotation: float = 0.0, zoom: float = 1.0) -> np.ndarray:
+    """2x3 affine matrix taking the texture to frame `index`.
+
+    Rotation and zoom accumulate about the frame center, translation accumulates
+    on top, so consecutive frames always differ by the same per-frame motion.
+    """
+    center = (width / 2, height / 2)
+    matrix = cv2.getRotationMatrix2D(center, -rotation * index, zoom ** index)
+    matrix[0, 2] += dx * index
+    matrix[1, 2] += dy * index
+    return matrix
+
+
+def expected_flow(xs: np.ndarray, ys: np.ndarray, index: int, width: int, height: int,
+                  dx: float = 0.0, dy: float = 0.0, rotation: float = 0.0,
+                  zoom: float = 1.0, **_) -> Tuple[np.ndarray, np.ndarray]:
+    """Displacement of content at (xs, ys) in frame `index` when moving to frame index + 1."""
+    cx, cy = width / 2, height / 2
+    angle = np.radians(rotation)
+    cos, sin = np.cos(angle) * zoom, np.sin(angle) * zoom
+
+    # Undo the accumulated translation, apply one step of rotation/zoom, redo translation
+    px = np.asarray(xs, dtype=np.float64) - cx - dx * index
+    py = np.asarray(ys, dtype=np.float64) - cy - dy * index
+    new_x = cx + cos * px - sin * py + dx * (index + 1)
+    new_y = cy + sin * px + cos * py + dy * (index + 1)
+    return new_x - xs, new_y - ys
+
+
+def synthetic_frames(width: int, height: int, frames: int, seed: int = 0, dx: float = 0.0,
+                     dy: float = 0.0, rotation: float = 0.0, zoom: float = 1.0,
+                     noise: float = 0.0) -> Iterator[np.ndarray]:
+    """Yield BGR frames of a texture moving with the given per-frame motion."""
+    rng = np.random.default_rng(seed + 1)
+    texture = make_texture(width, height, seed)
+
+    for index in range(frames):
+        matrix = frame_transform(index, width, height, dx, dy, rotation, zoom)
+        frame = cv2.warpAffine(texture, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_REFLECT)
+        if noise > 0:
+            grain = rng.normal(0, noise, frame.shape)
+            frame = np.clip(frame + grain, 0, 255).astype(np.uint8)
+        yield frame
+
+
+def write_clip(path: str, width: int, height: int, frames: int, fps: float = 30,
+               seed: int = 0, **motion) -> str:
+    """Render a synthetic clip to an mp4v video file and return its path."""
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not out.isOpened():
+        raise ValueError(f"Could not open video writer: {path}")
+    for frame in synthetic_frames(width, height, frames, seed, **motion):
+        out.write(frame)
+    out.release()
+    return path
+
+
+def scenario_motion(scenario: str) -> Dict[str, float]:
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario: {scenario} (choose from {', '.join(SCENARIOS)})")
+    return dict(SCENARIOS[scenario])
@@ -0,0 +1,170 @@
+import bisect
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+# Upper bounds (seconds) of the timing histogram buckets; the last bucket is unbounded
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Metric name -> (Prometheus type, label name for histograms, help text)
+METRICS = {
+    'frames': ('counter', None, 'Frames processed'),
+    'frames_analyzed': ('counter', None, 'Frame pairs analyzed in this process'),
+    'candidate_evaluations': ('counter', None, 'Candidate direction/offset evaluations'),
+    'sections': ('counter', None, 'Sections and subsections created'),
+    'frames_dropped': ('counter', None, 'Live frames dropped as stale'),
+    'static_sections': ('counter', None, 'Sections the change gate found static'),
+    'static_frames': ('counter', None, 'Frame pairs the change gate short-circuited'),
+    'decode_stall_seconds': ('gauge', None, 'Time analysis waited for decoded frames'),
+    'encode_stall_seconds': ('gauge', None, 'Time analysis waited for the encoder'),
+    'stage_seconds': ('histogram', 'stage', 'Time per frame spent in each stage'),
+    'depth_seconds': ('histogram', 'depth', 'Time per frame spent scoring sections of each recursion depth'),
+    'frame_seconds': ('histogram', None, 'Wall time per output frame'),
+    'latency_seconds': ('histogram', None, 'Live capture-to-output latency'),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[int]:
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def as_dict(self) -> Dict:
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'buckets': dict(zip(bounds, self.cumulative())),
+        }
+
+
+class Telemetry:
+    """Counters, gauges and timing histograms of a run, with hooks and periodic file dumps.
+
+    Attach one to an analyzer (analyzer.telemetry = Telemetry(...)) to collect
+    per-stage and per-recursion-depth timings, candidate evaluations and
+    sections per frame, and decode/encode stall time; without one, the analyzer
+    only pays for an `is None` check. Hooks are called as hook(event, data)
+    for every 'analysis' (one analyzed frame pair) and 'frame' (one output
+    frame) event. With a path, the metrics are written there at most every
+    `interval` seconds and on close(): Prometheus text format for .prom/.txt
+    files, JSON otherwise.
+    """
+
+    def __init__(self, path: Optional[str] = None, interval: float = 10.0, prefix: str = 'motion'):
+        self.path = path
+        self.interval = interval
+        self.prefix = prefix
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Dict[str, Histogram]] = {}
+        self.hooks: List[Callable[[str, Dict], None]] = []
+        self.started = time.perf_counter()
+        self._last_dump = self.started
+
+    def add_hook(self, hook: Callable[[str, Dict], None]):
+        self.hooks.append(hook)
+
+    def count(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float, label=''):
+        histograms = self.histograms.setdefault(name, {})
+        histogram = histograms.get(str(label))
+        if histogram is None:
+            histogram = histograms[str(label)] = Histogram()
+        histogram.observe(seconds)
+
+    def emit(self, event: str, data: Dict):
+        for hook in self.hooks:
+            hook(event, data)
+
+    def frame_done(self, data: Dict):
+        """Count an output frame, notify the hooks and dump if the interval has passed."""
+        self.count('frames')
+        self.emit('frame', data)
+        if self.path and time.perf_counter() - self._last_dump >= self.interval:
+            self.dump()
+
+    def snapshot(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            'elapsed_s': elapsed,
+            'frames_per_second': self.counters.get('frames', 0) / elapsed if elapsed > 0 else 0.0,
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'histograms': {name: {label: histogram.as_dict() for label, histogram in histograms.items()}
+                           for name, histograms in self.histograms.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name in sorted(self.counters):
+            metric = f"{self.prefix}_{name}_total"
+            header(metric, 'counter', METRICS.get(name, (None, None, name))[2])
+            lines.append(f"{metric} {self.counters[name]}")
+
+        for name in sorted(self.gauges):
+            metric = f"{self.prefix}_{name}"
+            header(metric, 'gauge', METRICS.get(name, (None, None, name))[2])
+            lines.append(f"{metric} {self.gauges[name]}")
+
+        for name in sorted(self.histograms):
+            metric = f"{self.prefix}_{name}"
+            _, label_name, help_text = METRICS.get(name, (None, 'label', name))
+            header(metric, 'histogram', help_text)
+            for label, histogram in sorted(self.histograms[name].items()):
+                labels = f'{label_name}="{label}",' if label_name else ''
+                bounds = [str(bound) for bound in histogram.buckets] + ['+Inf']
+                for bound, count in zip(bounds, histogram.cumulative()):
+                    lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {count}')
+                selector = f"{{{labels.rstrip(',')}}}" if labels else ''
+                lines.append(f"{metric}_sum{selector} {histogram.sum}")
+                lines.append(f"{metric}_count{selector} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Optional[str] = None):
+        """Write the metrics to path (default: self.path), replacing the file atomically."""
+        path = path or self.path
+        if not path:
+            return
+        if path.endswith(('.prom', '.txt')):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.snapshot(), indent=2)
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+        self._last_dump = time.perf_counter()
+
+    def close(self):
+        self.dump()
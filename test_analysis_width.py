@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import synthetic_frames
+
+
+@pytest.mark.parametrize('analysis_width, expected', [
+    (None, (640, 360)), (640, (640, 360)), (1280, (640, 360)), (320, (320, 180)), (100, (100, 56)),
+])
+def test_analysis_size(analysis_width, expected):
+    analyzer = VideoMotionAnalyzer(Config(ANALYSIS_WIDTH=analysis_width))
+    assert analyzer.analysis_size(640, 360) == expected
+
+
+def analyze_at_frame_scale(analyzer: VideoMotionAnalyzer, frames):
+    prev_frame, curr_frame = (analyzer.analysis_frame(frame) for frame in frames)
+    field = analyzer.analyze_frame_pair(prev_frame, curr_frame).copy()
+    return prev_frame.shape, field, analyzer.to_frame_scale(field, frames[1].shape)
+
+
+@pytest.mark.parametrize('width, height, analysis_width', [(640, 360, 320), (640, 360, 250), (500, 333, 160)])
+def test_section_geometry_is_rescaled_to_the_frame(width, height, analysis_width):
+    frames = list(synthetic_frames(width, height, 2, dx=3.0, dy=1.0))
+    analyzer = VideoMotionAnalyzer(Config(ANALYSIS_WIDTH=analysis_width, MOTION_THRESHOLD=0.0))
+    (analysis_height, _), field, frame_field = analyze_at_frame_scale(analyzer, frames)
+    scale_x, scale_y = width / analysis_width, height / analysis_height
+
+    assert frame_field.size == field.size
+    np.testing.assert_array_equal(frame_field.x, np.rint(field.x * scale_x))
+    np.testing.assert_array_equal(frame_field.y, np.rint(field.y * scale_y))
+    np.testing.assert_array_equal(frame_field.x + frame_field.width, np.rint((field.x + field.width) * scale_x))
+    np.testing.assert_array_equal(frame_field.y + frame_field.height, np.rint((field.y + field.height) * scale_y))
+    assert (frame_field.x + frame_field.width <= width).all() and (frame_field.y + frame_field.height <= height).all()
+    # Results are unchanged, displacements are in frame pixels
+    np.testing.assert_array_equal(frame_field.direction, field.direction)
+    np.testing.assert_array_equal(frame_field.strength, field.strength)
+    np.testing.assert_allclose(frame_field.dx, field.dx * scale_x, rtol=1e-6)
+
+    # Subsections still tile their parent, as they did at analysis resolution
+    for parent in np.unique(frame_field.parent[frame_field.depth > 0]):
+        children = frame_field.parent == parent
+        area = (frame_field.width[children].astype(np.int64) * frame_field.height[children]).sum()
+        assert area == int(frame_field.width[parent]) * int(frame_field.height[parent])
+
+
+def test_full_resolution_field_is_not_copied():
+    frames = list(synthetic_frames(320, 240, 2, dx=2.0))
+    analyzer = VideoMotionAnalyzer(Config(ANALYSIS_WIDTH=320))
+    field = analyzer.analyze_frame_pair(*(analyzer.analysis_frame(frame) for frame in frames))
+    assert analyzer.to_frame_scale(field, frames[1].shape) is field
+
+
+def test_pyramid_vectors_in_frame_pixels():
+    frames = list(synthetic_frames(640, 480, 2, dx=6.0, dy=-4.0))
+    analyzer = VideoMotionAnalyzer(Config(ANALYSIS_WIDTH=320, MATCH_MODE='pyramid', GRID_ROWS=5, GRID_COLS=5,
+                                          MAX_RECURSIVE_DEPTH=0))
+    _, field, frame_field = analyze_at_frame_scale(analyzer, frames)
+    assert np.median(field.dx) == pytest.approx(3.0, abs=0.15)
+    assert np.median(frame_field.dx) == pytest.approx(6.0, abs=0.3)
+    assert np.median(frame_field.dy) == pytest.approx(-4.0, abs=0.3)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from batch_runner import plan_chunks, run_chunk
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from motion_export import MotionFieldReader
+from synthetic_video import write_clip
+
+FRAMES = 23
+
+
+@pytest.fixture(scope='module')
+def clip(tmp_path_factory):
+    return write_clip(str(tmp_path_factory.mktemp('videos') / 'clip.mp4'), 160, 120, FRAMES, dx=1.0)
+
+
+def selected_pairs(first, end, step):
+    """(prev, curr) frame_counts a run of frames (first, end] analyzes."""
+    frames = [count for count in range(first + 1, end + 1) if count % step == 0]
+    return list(zip(frames, frames[1:]))
+
+
+@pytest.mark.parametrize('step', [1, 2, 3, 4])
+@pytest.mark.parametrize('range_settings', [{}, {'SKIP_FRAMES': 1}, {'SKIP_FRAMES': 2, 'MAX_FRAMES': 17}])
+def test_chunks_cover_range_once(clip, step, range_settings):
+    config = Config(FRAME_SKIP=step, BATCH_CHUNK_FRAMES=5, **range_settings)
+    chunks = plan_chunks(clip, config)
+    first = config.SKIP_FRAMES
+    end = FRAMES if config.MAX_FRAMES is None else first + config.MAX_FRAMES
+
+    assert chunks[0][0] == first
+    assert (chunks[-1][1] is None) == (config.MAX_FRAMES is None)
+    # Every chunk after the first starts on a selected frame, the last one of the chunk before
+    for (_, previous_end), (start, _) in zip(chunks, chunks[1:]):
+        assert start == previous_end - 1
+        assert previous_end % step == 0
+    # Chunks hold whole multiples of FRAME_SKIP, at least BATCH_CHUNK_FRAMES of them
+    for start, stop in chunks[1:-1]:
+        assert (stop - start - 1) % step == 0 and stop - start - 1 >= 5
+
+    pairs = []
+    for start, stop in chunks:
+        pairs.extend(selected_pairs(start, end if stop is None else stop, step))
+    assert pairs == selected_pairs(first, end, step)
+
+
+def test_chunk_results_match_single_run(clip, tmp_path):
+    config = Config(FRAME_SKIP=2, SKIP_FRAMES=1, BATCH_CHUNK_FRAMES=6, MATCH_MODE='vectorized')
+    expected = list(VideoMotionAnalyzer(config).analyze_video(clip))
+
+    results = []
+    for index, (first, end) in enumerate(plan_chunks(clip, config)):
+        output = str(tmp_path / str(index))
+        summary = run_chunk(clip, first, end, output, config)
+        reader = MotionFieldReader(output)
+        assert summary['frames'] == len(reader)
+        results.extend((int(frame_count), field.copy()) for frame_count, field in reader)
+
+    assert [frame_count for frame_count, _ in results] == [frame_count for frame_count, _ in expected]
+    for (_, field), (_, other) in zip(results, expected):
+        np.testing.assert_array_equal(field.direction, other.direction)
+        np.testing.assert_array_equal(field.strength, other.strength)
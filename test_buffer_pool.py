@@ -0,0 +1,75 @@
+import queue
+
+import numpy as np
+
+from video_io import BufferPool
+
+SHAPE = (4, 6, 3)
+
+
+def test_referenced_buffers_are_not_reused():
+    pool = BufferPool()
+    held = pool.get(SHAPE)
+    view = pool.get(SHAPE)[1:3]
+    queued = queue.Queue()
+    queued.put(pool.get(SHAPE))
+    in_list = [pool.get(SHAPE)]
+
+    handed_out = [held, view.base, queued.queue[0], in_list[0]]
+    assert len({id(buffer) for buffer in handed_out}) == 4
+    for _ in range(10):
+        buffer = pool.get(SHAPE)
+        assert all(buffer is not other for other in handed_out)
+        handed_out.append(buffer)
+    assert pool.reused == 0
+
+
+def test_released_buffers_are_reused():
+    pool = BufferPool()
+    first = pool.get(SHAPE)
+    first_id = id(first)
+    del first
+    assert id(pool.get(SHAPE)) == first_id
+    assert pool.reused == 1
+
+    # Only the buffer nobody holds any more is handed out again
+    kept = pool.get(SHAPE)
+    view = kept[0]
+    del kept
+    released = pool.get(SHAPE)
+    assert released is not view.base
+    assert pool.get(SHAPE) is not view.base
+
+
+def test_init_runs_on_new_buffers_only():
+    pool = BufferPool()
+    calls = []
+
+    def init(buffer):
+        calls.append(id(buffer))
+        buffer[:] = 7
+
+    buffer = pool.get(SHAPE, init=init)
+    buffer[:] = 1
+    del buffer
+    assert (pool.get(SHAPE, init=init) == 1).all()
+    assert len(calls) == 1
+
+
+def test_new_shape_drops_old_buffers():
+    pool = BufferPool()
+    old = pool.get(SHAPE)
+    del old
+    new = pool.get((2, 2), dtype=np.float32)
+    assert new.shape == (2, 2) and new.dtype == np.float32
+    assert pool.reused == 0
+
+
+def test_limit_bounds_kept_buffers():
+    pool = BufferPool(limit=2)
+    held = [pool.get(SHAPE) for _ in range(5)]
+    assert len(pool.buffers) == 2
+    assert pool.allocated == 5
+    del held
+    pool.get(SHAPE)
+    assert pool.reused == 1
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import pytest
+
+from change_gate import STATIC_DIRECTION
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import synthetic_frames
+
+
+def frame_pairs():
+    prev_frame, curr_frame = (cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                              for frame in synthetic_frames(320, 240, 2, dx=2.0, dy=-1.0))
+    # Left half unchanged, right half moving
+    partly_static = curr_frame.copy()
+    partly_static[:, :160] = prev_frame[:, :160]
+    return {'moving': (prev_frame, curr_frame), 'partly_static': (prev_frame, partly_static),
+            'static': (prev_frame, prev_frame.copy())}
+
+
+@pytest.mark.parametrize('pair', ['moving', 'partly_static', 'static'])
+@pytest.mark.parametrize('match_mode', ['template', 'vectorized'])
+def test_zero_threshold_matches_ungated(pair, match_mode):
+    prev_frame, curr_frame = frame_pairs()[pair]
+    expected = VideoMotionAnalyzer(Config(MATCH_MODE=match_mode)).analyze_frame_pair(prev_frame, curr_frame)
+    gated = VideoMotionAnalyzer(Config(MATCH_MODE=match_mode, CHANGE_GATE=True, CHANGE_THRESHOLD=0))
+    field = gated.analyze_frame_pair(prev_frame, curr_frame)
+
+    assert field.size == expected.size
+    for name in ('x', 'y', 'width', 'height', 'depth', 'direction'):
+        np.testing.assert_array_equal(getattr(field, name), getattr(expected, name))
+    np.testing.assert_array_equal(field.strength, expected.strength)
+    assert gated.search_totals['static'] == 0
+
+
+def test_unchanged_sections_are_static():
+    prev_frame, curr_frame = frame_pairs()['partly_static']
+    analyzer = VideoMotionAnalyzer(Config(CHANGE_GATE=True))
+    field = analyzer.analyze_frame_pair(prev_frame, curr_frame)
+
+    static = field.direction == STATIC_DIRECTION
+    assert not static.all()
+    assert static[field.x + field.width <= 160].all()
+    assert (field.strength[static] == 0).all()
+    assert analyzer.search_totals['static'] == static.sum()
+
+
+@pytest.mark.parametrize('match_mode', ['template', 'vectorized'])
+@pytest.mark.parametrize('recursion_mode', ['threshold', 'adaptive'])
+def test_gate_checks_each_level_once(match_mode, recursion_mode):
+    prev_frame, curr_frame = frame_pairs()['partly_static']
+    analyzer = VideoMotionAnalyzer(Config(MATCH_MODE=match_mode, RECURSION_MODE=recursion_mode,
+                                          CHANGE_GATE=True))
+    calls = []
+    static = analyzer.change_gate.static
+    analyzer.change_gate.static = lambda *args: calls.append(len(args[0])) or static(*args)
+    field = analyzer.analyze_frame_pair(prev_frame, curr_frame)
+
+    # The grid check is reused for scoring the grid; each deeper level is checked in one call
+    assert calls[0] == (field.depth == 0).sum()
+    if recursion_mode == 'threshold':
+        assert calls[1:] == [(field.depth == depth).sum() for depth in range(1, field.depth.max() + 1)]
+    assert sum(calls) == field.size
@@ -0,0 +1,88 @@
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+import main
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import synthetic_frames
+
+
+def test_config_is_immutable():
+    config = Config(GRID_ROWS=8)
+    with pytest.raises(AttributeError):
+        config.GRID_ROWS = 4
+    with pytest.raises(AttributeError):
+        del config.GRID_ROWS
+    with pytest.raises(ValueError):
+        config.offset_table[0, 0] = 3
+    # Lists are frozen into tuples, so they can't be changed in place either
+    assert isinstance(config.DIRECTIONS, tuple)
+    assert config.GRID_ROWS == 8 and Config().GRID_ROWS == Config.GRID_ROWS
+
+
+def test_replace_keeps_other_settings():
+    config = Config(GRID_ROWS=8, GRID_COLS=6, SEARCH_STEP_SIZE=3)
+    changed = config.replace(GRID_COLS=10)
+
+    assert changed is not config
+    assert (changed.GRID_ROWS, changed.GRID_COLS, changed.SEARCH_STEP_SIZE) == (8, 10, 3)
+    assert config.GRID_COLS == 6
+    assert changed.offset_table[2].tolist() == [3, 0]
+    with pytest.raises(ValueError):
+        config.replace(GRID_ROWS=0)
+
+
+@pytest.mark.parametrize('overrides', [
+    {'GRID_ROWS': 0}, {'GRID_ROWS': 2.5}, {'SEARCH_STEP_SIZE': 0}, {'MATCH_MODE': 'exhaustive'},
+    {'PRUNE_ACCEPT_SCORE': 'high'}, {'PRUNE_ACCEPT_SCORE': 1.5},
+    {'WARM_START_ACCEPT_SCORE': None}, {'WARM_START_ACCEPT_SCORE': -2},
+    {'RECURSION_BUDGET_MS': 0}, {'END_TIME': 1.0, 'START_TIME': 2.0}, {'SUBTRACT_GLOBAL_MOTION': True},
+    {'ROI_POLYGONS': [[(0, 0), (1, 1)]]}, {'NO_SUCH_SETTING': 1},
+])
+def test_invalid_settings_raise_value_error(overrides):
+    with pytest.raises(ValueError):
+        Config(**overrides)
+
+
+def test_analyzers_with_different_configs():
+    frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+              for frame in synthetic_frames(320, 240, 3, dx=2.0, dy=-1.0)]
+    configs = [Config(SEARCH_STEP_SIZE=2, GRID_ROWS=6, GRID_COLS=6), Config(MAX_RECURSIVE_DEPTH=0)]
+    expected = []
+    for config in configs:
+        analyzer = VideoMotionAnalyzer(config)
+        expected.append([analyzer.analyze_frame_pair(*pair).copy() for pair in zip(frames, frames[1:])])
+
+    # Interleaved in one process, each analyzer only sees its own settings
+    analyzers = [VideoMotionAnalyzer(config) for config in configs]
+    for index, pair in enumerate(zip(frames, frames[1:])):
+        for analyzer, results in zip(analyzers, expected):
+            field = analyzer.analyze_frame_pair(*pair)
+            assert field.size == results[index].size
+            np.testing.assert_array_equal(field.direction, results[index].direction)
+            np.testing.assert_array_equal(field.strength, results[index].strength)
+    assert analyzers[0].config.SEARCH_STEP_SIZE == 2 and analyzers[1].config.SEARCH_STEP_SIZE == 1
+    assert (expected[1][0].depth == 0).all()
+
+
+def test_command_line_zero_values_override_defaults(monkeypatch):
+    configs = []
+
+    class Analyzer:
+        def __init__(self, config):
+            configs.append(config)
+
+        def process_video(self, *args, **kwargs):
+            pass
+
+    monkeypatch.setattr(main, 'VideoMotionAnalyzer', Analyzer)
+    monkeypatch.setattr(sys, 'argv', ['main.py', 'clip.mp4', '--max-depth', '0', '--motion-threshold', '0',
+                                      '--change-threshold', '0', '--prune-exact'])
+    main.main()
+
+    config = configs[0]
+    assert (config.MAX_RECURSIVE_DEPTH, config.MOTION_THRESHOLD, config.CHANGE_THRESHOLD) == (0, 0, 0)
+    assert config.PRUNE_ACCEPT_SCORE is None
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+
+from config import Config
+from frame_stats import FrameStatistics, FrameStatsCache
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import synthetic_frames
+
+
+def gray_frames(count: int):
+    return [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            for frame in synthetic_frames(160, 120, count, dx=1.0)]
+
+
+def test_mean_variance_match_numpy():
+    frame = gray_frames(1)[0]
+    stats = FrameStatistics(frame)
+    xs, ys, ws, hs = np.array([0, 13, 100]), np.array([0, 7, 60]), np.array([160, 21, 60]), np.array([120, 9, 60])
+    mean, variance = stats.mean_variance(xs, ys, ws, hs)
+    for index, (x, y, w, h) in enumerate(zip(xs, ys, ws, hs)):
+        section = frame[y:y + h, x:x + w].astype(np.float64)
+        assert np.isclose(mean[index], section.mean())
+        assert np.isclose(variance[index], section.var())
+
+
+def test_frames_are_matched_by_identity():
+    frame = gray_frames(1)[0]
+    cache = FrameStatsCache()
+    stats = cache.get(frame)
+
+    assert cache.get(frame) is stats
+    # Equal content or a view of the same data is a different frame to the cache
+    assert cache.get(frame.copy()) is not stats
+    assert cache.get(frame[:]) is not stats
+    assert (cache.builds, cache.hits) == (3, 1)
+
+
+def test_oldest_entries_are_dropped():
+    first, second, third = gray_frames(3)
+    cache = FrameStatsCache(capacity=2)
+    cache.get(first)
+    cache.get(second)
+    cache.get(third)
+    assert cache.builds == 3
+
+    # second and third are kept, first was evicted and is built again
+    cache.get(second)
+    cache.get(third)
+    assert (cache.builds, cache.hits) == (3, 2)
+    cache.get(first)
+    assert cache.builds == 4
+
+    cache.clear()
+    cache.get(third)
+    assert cache.builds == 5
+
+
+def test_each_frame_is_built_once_per_run():
+    frames = gray_frames(6)
+    analyzer = VideoMotionAnalyzer(Config(MATCH_MODE='vectorized'))
+    for prev_frame, curr_frame in zip(frames, frames[1:]):
+        analyzer.analyze_frame_pair(prev_frame, curr_frame)
+    assert analyzer.frame_stats.builds == len(frames)
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from global_motion import GlobalMotionEstimator
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import synthetic_frames
+
+
+def gray_frames(width: int, height: int, dx: float, dy: float, count: int = 2):
+    return [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            for frame in synthetic_frames(width, height, count, dx=dx, dy=dy)]
+
+
+@pytest.mark.parametrize('width, height', [(320, 240), (640, 360)])
+@pytest.mark.parametrize('dx, dy', [(0.0, 0.0), (3.0, -2.0), (0.4, 0.7), (-12.5, 6.25)])
+def test_estimate_on_known_translation(width, height, dx, dy):
+    estimator = GlobalMotionEstimator(Config())
+    estimate_x, estimate_y, response = estimator.estimate(*gray_frames(width, height, dx, dy))
+    # Sub-pixel peaks are within about 0.3 pixels at GLOBAL_MOTION_WIDTH, scaled up with the frame
+    tolerance = 0.35 * width / 320
+    assert estimate_x == pytest.approx(dx, abs=tolerance)
+    assert estimate_y == pytest.approx(dy, abs=tolerance)
+    assert response > 0.9
+
+
+def test_downscaled_current_frame_is_reused():
+    frames = gray_frames(640, 360, 2.0, 1.0, count=3)
+    estimator = GlobalMotionEstimator(Config())
+    estimator.estimate(frames[0], frames[1])
+    small = estimator._last[1]
+    assert estimator._last[0] is frames[1]
+    assert small.shape == (180, 320)
+    assert estimator._prepare(frames[1]) is small
+
+
+def test_only_mode_skips_the_grid():
+    analyzer = VideoMotionAnalyzer(Config(GLOBAL_MOTION='only'))
+    field = analyzer.analyze_frame_pair(*gray_frames(320, 240, 4.0, -3.0))
+    assert field.size == 0
+    dx, dy, response = field.global_motion
+    assert (dx, dy) == (pytest.approx(4.0, abs=0.35), pytest.approx(-3.0, abs=0.35))
+
+    # The overall movement comes from the estimate: right and up is between N and E
+    angle, strength = analyzer.calculate_field_movement(field)
+    assert angle == pytest.approx(np.degrees(np.arctan2(4.0, 3.0)), abs=2)
+    assert strength == pytest.approx(response)
+
+
+def test_subtracting_global_motion_lines_sections_up():
+    frames = gray_frames(320, 240, 5.0, 0.0)
+    estimated = VideoMotionAnalyzer(Config(GLOBAL_MOTION='estimate')).analyze_frame_pair(*frames).copy()
+    subtracted = VideoMotionAnalyzer(Config(GLOBAL_MOTION='estimate', SUBTRACT_GLOBAL_MOTION=True))
+    field = subtracted.analyze_frame_pair(*frames)
+
+    assert field.global_motion[0] == pytest.approx(5.0, abs=0.35)
+    # Without the camera motion the content is at most a step away, so sections match far more closely
+    assert np.median(field.strength[field.depth == 0]) > np.median(estimated.strength[estimated.depth == 0]) + 0.15
+
+
+def test_compensate_shifts_content_back():
+    prev_frame, curr_frame = gray_frames(320, 240, 6.0, -4.0)
+    compensated = GlobalMotionEstimator.compensate(curr_frame, 6.0, -4.0)
+    inner = (slice(20, -20), slice(20, -20))
+    before = cv2.absdiff(prev_frame, curr_frame)[inner].mean()
+    after = cv2.absdiff(prev_frame, compensated)[inner].mean()
+    assert after < 0.2 * before
+    assert GlobalMotionEstimator.compensate(curr_frame, 0.2, -0.4) is curr_frame
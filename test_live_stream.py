@@ -0,0 +1,107 @@
+import threading
+import time
+
+import numpy as np
+
+from live_stream import LatestFrameSource, SyntheticCamera
+
+
+class GatedCapture:
+    """Capture that delivers numbered frames only as the test releases them."""
+
+    def __init__(self):
+        self.gate = threading.Semaphore(0)
+        self.index = 0
+        self.ended = False
+        self.released = threading.Event()
+
+    def deliver(self, count: int = 1):
+        for _ in range(count):
+            self.gate.release()
+
+    def end(self):
+        self.ended = True
+        self.gate.release()
+
+    def read(self):
+        self.gate.acquire()
+        if self.ended:
+            return False, None
+        self.index += 1
+        return True, np.full((2, 2), self.index, dtype=np.uint8)
+
+    def release(self):
+        self.released.set()
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_stale_frames_are_dropped():
+    cap = GatedCapture()
+    source = LatestFrameSource(cap)
+    cap.deliver(5)
+    wait_for(lambda: source.captured == 5)
+
+    sequence, _, frame = source.latest()
+    assert sequence == 5 and frame[0, 0] == 5
+    assert source.dropped == 4
+    # Nothing newer yet: the frame already handed out isn't returned again
+    assert source.latest(timeout=0.02) is None
+
+    cap.deliver()
+    sequence, _, frame = source.latest(timeout=1.0)
+    assert sequence == 6 and frame[0, 0] == 6
+    assert source.dropped == 4
+
+    cap.end()
+    assert source.latest(timeout=1.0) is None
+    assert cap.released.wait(1.0)
+
+
+def test_newest_frame_is_returned_after_the_stream_ends():
+    cap = GatedCapture()
+    source = LatestFrameSource(cap)
+    cap.deliver(3)
+    wait_for(lambda: source.captured == 3)
+    cap.end()
+    assert cap.released.wait(1.0)
+
+    sequence, _, frame = source.latest(timeout=1.0)
+    assert sequence == 3 and frame[0, 0] == 3
+    assert source.latest(timeout=1.0) is None
+    assert (source.captured, source.dropped) == (3, 2)
+
+
+def test_close_does_not_wait_for_a_blocked_read():
+    cap = GatedCapture()
+    source = LatestFrameSource(cap)
+    started = time.monotonic()
+    source.close(timeout=0.05)
+    assert time.monotonic() - started < 1.0
+    assert not cap.released.is_set()
+
+    # The capture is released by the reading thread once its read() returns
+    cap.deliver()
+    assert cap.released.wait(1.0)
+    source._thread.join(1.0)
+    assert not source._thread.is_alive()
+
+
+def test_slow_consumer_gets_fresh_frames():
+    source = LatestFrameSource(SyntheticCamera(64, 48, fps=200, frames=60))
+    taken = []
+    while True:
+        latest = source.latest(timeout=1.0)
+        if latest is None:
+            break
+        taken.append(latest[0])
+        time.sleep(0.02)
+
+    assert taken == sorted(taken) and len(set(taken)) == len(taken)
+    assert source.dropped == source.captured - len(taken)
+    assert source.dropped > 0
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import SCENARIOS, synthetic_frames
+
+
+def gray_pair(scenario: str, width: int = 320, height: int = 240):
+    motion = dict(SCENARIOS[scenario])
+    frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in synthetic_frames(width, height, 2, **motion)]
+    return frames[0], frames[1]
+
+
+def analyze(prev_frame, curr_frame, **settings):
+    return VideoMotionAnalyzer(Config(**settings)).analyze_frame_pair(prev_frame, curr_frame).copy()
+
+
+@pytest.mark.parametrize('scenario', ['translate', 'rotate', 'noise'])
+def test_vectorized_matches_template(scenario):
+    prev_frame, curr_frame = gray_pair(scenario)
+    template = analyze(prev_frame, curr_frame, MATCH_MODE='template')
+    vectorized = analyze(prev_frame, curr_frame, MATCH_MODE='vectorized')
+
+    assert vectorized.size == template.size
+    for name in ('x', 'y', 'width', 'height', 'depth', 'parent', 'direction'):
+        np.testing.assert_array_equal(getattr(vectorized, name), getattr(template, name))
+    np.testing.assert_allclose(vectorized.strength, template.strength, atol=1e-5)
+
+
+@pytest.mark.parametrize('match_mode', ['template', 'vectorized'])
+def test_strict_warm_start_matches_cold_search(match_mode):
+    frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in synthetic_frames(320, 240, 3, dx=2.0)]
+    cold = [analyze(prev_frame, curr_frame, MATCH_MODE=match_mode)
+            for prev_frame, curr_frame in zip(frames, frames[1:])]
+
+    # Only a perfect score is accepted without a full search, so the directions cannot change
+    analyzer = VideoMotionAnalyzer(Config(MATCH_MODE=match_mode, TEMPORAL_WARM_START=True,
+                                          WARM_START_ACCEPT_SCORE=1.0))
+    for (prev_frame, curr_frame), other in zip(zip(frames, frames[1:]), cold):
+        field = analyzer.analyze_frame_pair(prev_frame, curr_frame)
+        for name in ('x', 'y', 'width', 'height', 'depth', 'direction'):
+            np.testing.assert_array_equal(getattr(field, name), getattr(other, name))
+    assert analyzer.search_totals['evaluations'] <= sum(field.size for field in cold) * len(Config.DIRECTIONS)
+
+
+def test_vectorized_matches_template_with_region_mask():
+    prev_frame, curr_frame = gray_pair('translate')
+    polygons = [[(0.1, 0.1), (0.9, 0.2), (0.7, 0.9), (0.2, 0.8)]]
+    template = analyze(prev_frame, curr_frame, MATCH_MODE='template', ROI_POLYGONS=polygons)
+    vectorized = analyze(prev_frame, curr_frame, MATCH_MODE='vectorized', ROI_POLYGONS=polygons)
+
+    assert vectorized.size == template.size
+    np.testing.assert_array_equal(vectorized.direction, template.direction)
+    np.testing.assert_allclose(vectorized.strength, template.strength, atol=1e-5)
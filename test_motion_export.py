@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from motion_export import MotionFieldReader, MotionFieldWriter
+from synthetic_video import synthetic_frames
+
+
+def analyzed_fields(frames: int = 5):
+    analyzer = VideoMotionAnalyzer(Config(GLOBAL_MOTION='estimate'))
+    gray = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            for frame in synthetic_frames(320, 240, frames, dx=2.0, dy=-1.0)]
+    results = []
+    for index in range(1, frames):
+        field = analyzer.analyze_frame_pair(gray[index - 1], gray[index]).copy()
+        results.append((index, field, analyzer.calculate_field_movement(field)))
+    return results
+
+
+def assert_same_field(field, expected):
+    assert field.size == expected.size
+    for name, _ in expected.COLUMNS:
+        np.testing.assert_array_equal(field.column(name), expected.column(name))
+    # Global motion is stored as float32
+    np.testing.assert_allclose(field.global_motion, expected.global_motion, rtol=1e-6)
+
+
+def test_round_trip(tmp_path):
+    results = analyzed_fields()
+    # Small chunks, so the rows are flushed across several chunk boundaries
+    with MotionFieldWriter(str(tmp_path), chunk_rows=64, metadata={'video': 'clip.mp4'}) as writer:
+        for frame_count, field, overall in results:
+            writer.write(frame_count, field, overall)
+
+    reader = MotionFieldReader(str(tmp_path))
+    assert len(reader) == len(results)
+    assert reader.metadata == {'video': 'clip.mp4'}
+    for index, (frame_count, field, overall) in enumerate(results):
+        assert reader.frames['frame_count'][index] == frame_count
+        assert reader.frames['overall_angle'][index] == np.float32(overall[0])
+        assert_same_field(reader.field(index), field)
+    assert [frame_count for frame_count, _ in reader] == [frame_count for frame_count, _, _ in results]
+
+
+def test_append_continues_export(tmp_path):
+    results = analyzed_fields()
+    with MotionFieldWriter(str(tmp_path), chunk_rows=64, metadata={'video': 'clip.mp4'}) as writer:
+        for frame_count, field, overall in results[:2]:
+            writer.write(frame_count, field, overall)
+    with MotionFieldWriter(str(tmp_path), chunk_rows=64, metadata={'run': 2}, append=True) as writer:
+        for frame_count, field, overall in results[2:]:
+            writer.write(frame_count, field, overall)
+
+    reader = MotionFieldReader(str(tmp_path))
+    assert len(reader) == len(results)
+    assert reader.metadata == {'video': 'clip.mp4', 'run': 2}
+    for index, (_, field, _) in enumerate(results):
+        assert_same_field(reader.field(index), field)
+
+
+def test_reader_ignores_unfinished_frame(tmp_path):
+    results = analyzed_fields()
+    with MotionFieldWriter(str(tmp_path)) as writer:
+        for frame_count, field, overall in results:
+            writer.write(frame_count, field, overall)
+
+    # Cut the last frame's sections short, as an interrupted run would leave them
+    reader = MotionFieldReader(str(tmp_path))
+    rows = reader.frame_rows(len(reader) - 1).stop - 1
+    itemsizes = {name: column.dtype.itemsize for name, column in reader.sections.items()}
+    del reader
+    for name, itemsize in itemsizes.items():
+        with open(tmp_path / f"sections.{name}.bin", 'r+b') as f:
+            f.truncate(rows * itemsize)
+
+    reader = MotionFieldReader(str(tmp_path))
+    assert len(reader) == len(results) - 1
+    assert_same_field(reader.field(len(reader) - 1), results[-2][1])
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import SCENARIOS, synthetic_frames
+
+
+def draw_per_section(analyzer: VideoMotionAnalyzer, frame: np.ndarray, field) -> np.ndarray:
+    """The drawing the renderer replaced: one full-frame addWeighted per section."""
+    config = analyzer.config
+    vis_frame = frame.copy()
+    for i in field.depth_first_order():
+        x0, y0 = int(field.x[i]), int(field.y[i])
+        x1, y1 = x0 + int(field.width[i]), y0 + int(field.height[i])
+        angle, strength = float(field.angle[i]), float(field.strength[i])
+        if config.COLOR_CODE_MOTION:
+            overlay = vis_frame.copy()
+            cv2.rectangle(overlay, (x0, y0), (x1, y1), analyzer.angle_to_color(angle, strength), -1)
+            cv2.addWeighted(vis_frame, 0.7, overlay, 0.3, 0, vis_frame)
+        if config.SHOW_GRID_LINES:
+            cv2.rectangle(vis_frame, (x0, y0), (x1, y1), (255, 255, 255), 1)
+        if config.SHOW_MOTION_VECTORS and strength > 0.1:
+            center_x, center_y = x0 + (x1 - x0) // 2, y0 + (y1 - y0) // 2
+            length = strength * config.VECTOR_SCALE * 20
+            end_x = int(center_x + length * np.sin(np.radians(angle)))
+            end_y = int(center_y - length * np.cos(np.radians(angle)))
+            cv2.arrowedLine(vis_frame, (center_x, center_y), (end_x, end_y), (0, 255, 255), 2, tipLength=0.3)
+    return vis_frame
+
+
+@pytest.mark.parametrize('scenario', ['translate', 'rotate', 'zoom'])
+@pytest.mark.parametrize('settings', [{}, {'SHOW_GRID_LINES': False, 'SHOW_MOTION_VECTORS': False}])
+def test_single_blend_matches_per_section_drawing(scenario, settings):
+    frames = list(synthetic_frames(320, 240, 2, **SCENARIOS[scenario]))
+    gray = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    analyzer = VideoMotionAnalyzer(Config(MOTION_THRESHOLD=0.0, **settings))
+    field = analyzer.analyze_frame_pair(*gray)
+    assert field.depth.max() == analyzer.config.MAX_RECURSIVE_DEPTH
+
+    rendered = analyzer.draw_motion_field(frames[1], field)
+    expected = draw_per_section(analyzer, frames[1], field)
+    assert rendered.shape == expected.shape and rendered.dtype == expected.dtype
+    assert np.abs(rendered.astype(np.int16) - expected).max() <= 1
+
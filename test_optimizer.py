@@ -1,89 +1,147 @@
-import cv2
+import os
 import numpy as np
-from motion_analyzer import VideoMotionAnalyzer
+from concurrent.futures import ProcessPoolExecutor
 from config import Config
+from parameter_sweep import (SharedFrames, configuration_name, evaluate_frames, grid_configurations,
+                             random_configurations, _evaluate, _init_sweep_worker)
 import json
-import time
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional
+
+# Parameter values explored by the grid, random and successive-halving searches
+SEARCH_SPACE = {
+    'GRID_ROWS': [3, 5, 8, 10],
+    'GRID_COLS': [3, 5, 8, 10],
+    'SEARCH_STEP_SIZE': [1, 3, 5],
+    'MOTION_THRESHOLD': [0.2, 0.3, 0.5],
+    'MAX_RECURSIVE_DEPTH': [0, 1, 2],
+}
+
+# Test window length when the base settings don't end it (MAX_FRAMES/END_TIME)
+DEFAULT_TEST_FRAMES = 300
 
 class MotionTestOptimizer:
-    def __init__(self, video_path: str):
+    def __init__(self, video_path: str, workers: Optional[int] = None, config: Optional[Config] = None):
         self.video_path = video_path
+        self.workers = workers or os.cpu_count() or 1
+        # Base settings; each tested configuration is applied on top of these
+        self.config = config if config is not None else Config()
+        if self.config.MAX_FRAMES is None and self.config.END_TIME is None:
+            self.config = self.config.replace(MAX_FRAMES=DEFAULT_TEST_FRAMES)
         self.test_results = []
+        self.frames: Optional[SharedFrames] = None
 
-    def test_configuration(self, config_params: Dict, test_name: str) -> Dict:
-        """Test a specific configuration and return results."""
-        print(f"\n=== Testing: {test_name} ===")
-
-        # Apply configuration
-        for param, value in config_params.items():
-            setattr(Config, param, value)
-
-        # Display current config
-        print(f"Grid: {Config.GRID_ROWS}x{Config.GRID_COLS}")
-        print(f"Search Step: {Config.SEARCH_STEP_SIZE}")
-        print(f"Motion Threshold: {Config.MOTION_THRESHOLD}")
-        print(f"Max Depth: {Config.MAX_RECURSIVE_DEPTH}")
-
-        analyzer = VideoMotionAnalyzer()
-
-        # Capture results
-        motion_data = []
-        overall_directions = []
-        processing_times = []
-
-        cap = analyzer.load_video(self.video_path)
-
-        # Skip to our test section
-        for _ in range(Config.SKIP_FRAMES):
-            cap.read()
-
-        prev_frame = None
-        frame_count = 0
-
-        while frame_count < Config.MAX_FRAMES:
-            start_time = time.time()
-
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_count += 1
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            if prev_frame is not None:
-                height, width = gray_frame.shape
-                sections = analyzer.create_grid_sections(height, width)
+    def load_frames(self) -> SharedFrames:
+        """Decode and grayscale the test window once; every configuration reuses it."""
+        if self.frames is None:
+            self.frames = SharedFrames.decode(self.video_path, self.config)
+            print(f"Decoded {len(self.frames)} test frames")
+        return self.frames
 
-                # Analyze motion
-                analyzed_sections = analyzer.analyze_motion_recursive(prev_frame, gray_frame, sections)
+    def close(self):
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
 
-                # Calculate overall movement
-                overall_angle, overall_strength = analyzer.calculate_overall_movement(analyzed_sections)
-                overall_directions.append((overall_angle, overall_strength))
-
-                # Collect detailed motion data
-                section_data = []
-                for section in analyzed_sections:
-                    section_data.append({
-                        'angle': section.motion_angle,
-                        'strength': section.motion_strength,
-                        'area': section.width * section.height
-                    })
-                motion_data.append(section_data)
+    def test_configuration(self, config_params: Dict, test_name: str) -> Dict:
+        """Test a specific configuration in this process and return results."""
+        frames = self.load_frames()
+        raw = evaluate_frames(frames.frames, config_params, self.config)
+        return self.record_result(config_params, test_name, raw)
 
-            prev_frame = gray_frame
-            processing_times.append(time.time() - start_time)
+    def record_result(self, config_params: Dict, test_name: str, raw: Dict) -> Dict:
+        print(f"\n=== Testing: {test_name} ===")
 
-        cap.release()
+        # Display tested config
+        config = self.config.replace(**config_params)
+        print(f"Grid: {config.GRID_ROWS}x{config.GRID_COLS}")
+        print(f"Search Step: {config.SEARCH_STEP_SIZE}")
+        print(f"Motion Threshold: {config.MOTION_THRESHOLD}")
+        print(f"Max Depth: {config.MAX_RECURSIVE_DEPTH}")
 
         # Analyze results
-        results = self.analyze_test_results(motion_data, overall_directions, processing_times, test_name)
+        results = self.analyze_test_results(raw['motion_data'], raw['overall_directions'],
+                                            raw['processing_times'], test_name)
         results['config'] = config_params.copy()
 
         self.test_results.append(results)
         return results
 
+    def test_configurations(self, test_configs: List[Dict], frame_count: Optional[int] = None) -> List[Dict]:
+        """Test many configurations ({'name', 'params'}) in parallel worker processes.
+
+        Each worker maps the shared test frames and analyzes them with its own
+        config, the base config with the tested parameters replaced.
+        frame_count limits the test to the first frames of the window.
+
+        Returns one result per configuration, in the same order; a configuration
+        whose test raised gets {'test_name', 'config', 'error', 'failed': True}.
+        """
+        frames = self.load_frames()
+        if self.workers <= 1 or len(test_configs) <= 1:
+            raws = []
+            for config in test_configs:
+                try:
+                    raws.append(evaluate_frames(frames.frames, config['params'], self.config, frame_count))
+                except Exception as e:
+                    raws.append(e)
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(test_configs)),
+                                     initializer=_init_sweep_worker,
+                                     initargs=(frames.path, self.config)) as executor:
+                futures = [executor.submit(_evaluate, config['params'], frame_count)
+                           for config in test_configs]
+                raws = []
+                for future in futures:
+                    try:
+                        raws.append(future.result())
+                    except Exception as e:
+                        raws.append(e)
+
+        results = []
+        for config, raw in zip(test_configs, raws):
+            if isinstance(raw, Exception):
+                print(f"Error in test '{config['name']}': {raw}")
+                results.append({'test_name': config['name'], 'config': config['params'].copy(),
+                                'error': str(raw), 'failed': True})
+            else:
+                results.append(self.record_result(config['params'], config['name'], raw))
+        return results
+
+    def grid_search(self, space: Dict[str, List] = SEARCH_SPACE) -> List[Dict]:
+        """Test every combination of the search space."""
+        return self.test_configurations([{'name': configuration_name(params), 'params': params}
+                                         for params in grid_configurations(space)])
+
+    def random_search(self, samples: int, space: Dict[str, List] = SEARCH_SPACE, seed: int = 0) -> List[Dict]:
+        """Test `samples` random combinations of the search space."""
+        return self.test_configurations([{'name': configuration_name(params), 'params': params}
+                                         for params in random_configurations(space, samples, seed)])
+
+    def successive_halving(self, test_configs: List[Dict], min_frames: int = 5, eta: int = 2) -> List[Dict]:
+        """Test all configurations on a few frames, then only the best 1/eta on eta times more.
+
+        Repeats until one configuration is left or the whole test window is used;
+        only the results of the last round are kept and returned, best first.
+        """
+        total_frames = len(self.load_frames())
+        frame_count = min(max(min_frames, 2), total_frames)
+        candidates = list(test_configs)
+
+        while True:
+            print(f"\n--- Successive halving: {len(candidates)} configurations on {frame_count} frames ---")
+            results = self.test_configurations(candidates, frame_count)
+            # Results are in candidate order; configurations that failed are not tested further
+            ranked = sorted(((result, config) for result, config in zip(results, candidates)
+                             if not result.get('failed')),
+                            key=lambda pair: pair[0].get('overall_score', 0), reverse=True)
+            if len(ranked) <= 1 or frame_count >= total_frames:
+                self.test_results = [result for result, _ in ranked]
+                return self.test_results
+
+            keep = max(1, -(-len(ranked) // eta))
+            candidates = [config for _, config in ranked[:keep]]
+            frame_count = min(frame_count * eta, total_frames)
+
     def analyze_test_results(self, motion_data: List, overall_directions: List,
                            processing_times: List, test_name: str) -> Dict:
         """Analyze the test results for accuracy and stability."""
@@ -224,6 +282,16 @@ class MotionTestOptimizer:
                     'MOTION_THRESHOLD': 5,
                     'MAX_RECURSIVE_DEPTH': 0
                 }
+            },
+            {
+                'name': 'Global Motion Only (Phase Correlation)',
+                'params': {
+                    'GRID_ROWS': 5, 'GRID_COLS': 5,
+                    'SEARCH_STEP_SIZE': 1,
+                    'MOTION_THRESHOLD': 5,
+                    'MAX_RECURSIVE_DEPTH': 0,
+                    'GLOBAL_MOTION': 'only'
+                }
             }
         ]
 
@@ -231,14 +299,11 @@ class MotionTestOptimizer:
         print("Expected motion: Upward camera movement (North direction ~0°)")
         print("=" * 60)
 
-        for config in test_configs:
-            try:
-                self.test_configuration(config['params'], config['name'])
-                time.sleep(0.5)  # Brief pause between tests
-            except Exception as e:
-                print(f"Error in test '{config['name']}': {e}")
-                continue
+        self.test_configurations(test_configs)
+        return self.summarize_results()
 
+    def summarize_results(self) -> Optional[Dict]:
+        """Print the best results, save all of them and return the best one."""
         # Sort results by overall score
         self.test_results.sort(key=lambda x: x.get('overall_score', 0), reverse=True)
 
@@ -264,15 +329,40 @@ class MotionTestOptimizer:
         return self.test_results[0] if self.test_results else None
 
 if __name__ == "__main__":
-    import sys
-
-    if len(sys.argv) != 2:
-        print("Usage: python test_optimizer.py <video_path>")
-        sys.exit(1)
-
-    optimizer = MotionTestOptimizer(sys.argv[1])
-    best_config = optimizer.run_parameter_tests()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Motion detection parameter optimization')
+    parser.add_argument('video_path', help='Path to the test video')
+    parser.add_argument('--search', choices=['presets', 'grid', 'random', 'halving'], default='presets',
+                       help='presets: the built-in test configurations; grid/random/halving: search '
+                            'SEARCH_SPACE exhaustively, by random sampling, or by successive halving')
+    parser.add_argument('--samples', type=int, default=20, metavar='N',
+                       help='Configurations to sample for --search random/halving, default: 20')
+    parser.add_argument('--workers', type=int, metavar='N',
+                       help='Worker processes, default: one per CPU')
+    parser.add_argument('--skip-frames', type=int, default=0, metavar='N',
+                       help='Start the test window after this many frames, default: 0')
+    parser.add_argument('--max-frames', type=int, default=DEFAULT_TEST_FRAMES, metavar='N',
+                       help=f'Frames in the test window, default: {DEFAULT_TEST_FRAMES}')
+    args = parser.parse_args()
+
+    optimizer = MotionTestOptimizer(args.video_path, args.workers,
+                                    Config(SKIP_FRAMES=args.skip_frames, MAX_FRAMES=args.max_frames))
+    try:
+        if args.search == 'presets':
+            best_config = optimizer.run_parameter_tests()
+        else:
+            if args.search == 'grid':
+                optimizer.grid_search()
+            elif args.search == 'random':
+                optimizer.random_search(args.samples)
+            else:
+                optimizer.successive_halving([{'name': configuration_name(params), 'params': params}
+                                              for params in random_configurations(SEARCH_SPACE, args.samples)])
+            best_config = optimizer.summarize_results()
+    finally:
+        optimizer.close()
 
     if best_config:
         print(f"\nBest configuration: {best_config['test_name']}")
-        print(f"Apply these settings to config.py: {best_config['config']}")
\ No newline at end of file
+        print(f"Apply these settings to config.py: {best_config['config']}")
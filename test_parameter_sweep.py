@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from parameter_sweep import SharedFrames
+from synthetic_video import write_clip
+from test_optimizer import DEFAULT_TEST_FRAMES, MotionTestOptimizer
+
+FRAMES = 12
+
+
+@pytest.fixture(scope='module')
+def clip(tmp_path_factory):
+    return write_clip(str(tmp_path_factory.mktemp('videos') / 'clip.mp4'), 160, 120, FRAMES, dx=1.0)
+
+
+def decoded_gray(video_path):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    cap.release()
+    return frames
+
+
+@pytest.mark.parametrize('first, max_frames', [(0, None), (3, 4), (8, 10)])
+def test_decode_window(clip, first, max_frames):
+    expected = decoded_gray(clip)[first:None if max_frames is None else first + max_frames]
+    frames = SharedFrames.decode(clip, Config(SKIP_FRAMES=first, MAX_FRAMES=max_frames))
+    try:
+        assert frames.frames.shape == (len(expected), 120, 160)
+        for frame, other in zip(frames.frames, expected):
+            np.testing.assert_array_equal(frame, other)
+    finally:
+        frames.close()
+
+
+def test_default_window(clip):
+    assert MotionTestOptimizer(clip).config.MAX_FRAMES == DEFAULT_TEST_FRAMES
+    assert MotionTestOptimizer(clip, config=Config(MAX_FRAMES=5)).config.MAX_FRAMES == 5
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_results_keep_configuration_order(clip, workers):
+    configurations = [{'name': 'coarse', 'params': {'GRID_ROWS': 3, 'GRID_COLS': 3}},
+                      {'name': 'invalid', 'params': {'GRID_ROWS': 0}},
+                      {'name': 'fine', 'params': {'GRID_ROWS': 8, 'GRID_COLS': 8}}]
+    optimizer = MotionTestOptimizer(clip, workers, Config(MAX_FRAMES=4))
+    try:
+        results = optimizer.test_configurations(configurations)
+    finally:
+        optimizer.close()
+
+    assert [result['test_name'] for result in results] == ['coarse', 'invalid', 'fine']
+    assert [result.get('failed', False) for result in results] == [False, True, False]
+    assert [result['config'] for result in results] == [config['params'] for config in configurations]
@@ -0,0 +1,75 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import pipeline
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import synthetic_frames
+
+FRAMES = 9
+
+
+def read_frames(log=None):
+    """(frame_count, frame, gray_frame) like iter_frames; the frame count is also stored in pixel (0, 0)."""
+    for frame_count, frame in enumerate(synthetic_frames(160, 120, FRAMES, dx=1.0, dy=1.0)):
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray_frame[0, 0] = frame_count
+        if log is not None:
+            log.append(frame_count)
+        yield frame_count, frame, gray_frame
+
+
+def analyze_slowly(prev_frame, curr_frame):
+    # Every other pair takes longer, so a second worker finishes the next one first
+    if curr_frame[0, 0] % 2:
+        time.sleep(0.2)
+    return pipeline._worker_analyzer.analyze_frame_pair(prev_frame, curr_frame), time.monotonic()
+
+
+def test_results_keep_frame_order(monkeypatch):
+    config = Config(NUM_WORKERS=2, PIPELINE_QUEUE_SIZE=4)
+    analyzer = VideoMotionAnalyzer(config)
+    grays = [gray_frame for _, _, gray_frame in read_frames()]
+    expected = [analyzer.analyze_frame_pair(prev_frame, curr_frame).copy()
+                for prev_frame, curr_frame in zip(grays, grays[1:])]
+
+    monkeypatch.setattr(pipeline, '_analyze_pair', analyze_slowly)
+    results = list(pipeline.iter_parallel_results(read_frames(), config))
+
+    assert [frame_count for frame_count, _, _ in results] == list(range(1, FRAMES))
+    finished = [finished for _, _, (_, finished) in results]
+    assert finished != sorted(finished)
+    for (_, _, (field, _)), other in zip(results, expected):
+        np.testing.assert_array_equal(field.direction, other.direction)
+        np.testing.assert_array_equal(field.strength, other.strength)
+
+
+@pytest.mark.parametrize('queue_size, in_flight', [(1, 1), (3, 3), (None, 4)])
+def test_queue_size_bounds_pairs_in_flight(queue_size, in_flight):
+    config = Config(NUM_WORKERS=2, PIPELINE_QUEUE_SIZE=queue_size)
+    read = []
+    most = 0
+    for frame_count, _, _ in pipeline.iter_parallel_results(read_frames(read), config):
+        # Pairs read but not yet handed out, this one included
+        most = max(most, read[-1] - frame_count + 1)
+    assert most == in_flight
+
+
+def test_cached_pairs_are_not_submitted(monkeypatch):
+    config = Config(NUM_WORKERS=2)
+    cached = VideoMotionAnalyzer(config).analyze_frame_pair(*[gray for _, _, gray in read_frames()][:2])
+    submitted = []
+    monkeypatch.setattr(pipeline, '_analyze_pair', analyze_slowly)
+    submit = pipeline.ProcessPoolExecutor.submit
+    monkeypatch.setattr(pipeline.ProcessPoolExecutor, 'submit',
+                        lambda self, fn, prev_frame, curr_frame: submitted.append(int(curr_frame[0, 0])) or
+                        submit(self, fn, prev_frame, curr_frame))
+
+    results = list(pipeline.iter_parallel_results(read_frames(), config,
+                                                  lambda frame_count: cached if frame_count % 3 == 0 else None))
+    assert [frame_count for frame_count, _, _ in results] == list(range(1, FRAMES))
+    assert all(field is cached for frame_count, _, field in results if frame_count % 3 == 0)
+    assert submitted == [frame_count for frame_count in range(1, FRAMES) if frame_count % 3]
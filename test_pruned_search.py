@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import SCENARIOS, synthetic_frames
+
+
+def gray_frames(scenario: str, count: int = 2):
+    return [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            for frame in synthetic_frames(320, 240, count, **SCENARIOS[scenario])]
+
+
+@pytest.mark.parametrize('scenario', ['translate', 'rotate', 'zoom', 'noise'])
+def test_exact_pruning_matches_full_search(scenario):
+    frames = gray_frames(scenario, 5)
+    full = VideoMotionAnalyzer(Config())
+    pruned = VideoMotionAnalyzer(Config(PRUNED_SEARCH=True, PRUNE_ACCEPT_SCORE=None))
+    for prev_frame, curr_frame in zip(frames, frames[1:]):
+        expected = full.analyze_frame_pair(prev_frame, curr_frame).copy()
+        field = pruned.analyze_frame_pair(prev_frame, curr_frame)
+
+        assert field.size == expected.size
+        for name in ('x', 'y', 'width', 'height', 'depth', 'direction'):
+            np.testing.assert_array_equal(getattr(field, name), getattr(expected, name))
+        np.testing.assert_array_equal(field.strength, expected.strength)
+    assert pruned.search_totals['accepted'] == 0
+    assert pruned.search_totals['evaluations'] <= full.search_totals['evaluations']
+
+
+@pytest.mark.parametrize('scenario', ['translate', 'rotate', 'zoom'])
+def test_exact_pruning_skips_most_candidates(scenario):
+    frames = gray_frames(scenario, 4)
+    full = VideoMotionAnalyzer(Config())
+    pruned = VideoMotionAnalyzer(Config(PRUNED_SEARCH=True, PRUNE_ACCEPT_SCORE=None))
+    for prev_frame, curr_frame in zip(frames, frames[1:]):
+        full.analyze_frame_pair(prev_frame, curr_frame)
+        pruned.analyze_frame_pair(prev_frame, curr_frame)
+    assert pruned.search_totals['evaluations'] < 0.4 * full.search_totals['evaluations']
+
+
+def test_bounds_hold():
+    prev_frame, curr_frame = gray_frames('rotate')
+    analyzer = VideoMotionAnalyzer(Config(PRUNED_SEARCH=True))
+    rng = np.random.default_rng(0)
+    ws = rng.integers(11, 80, 200)
+    hs = rng.integers(11, 80, 200)
+    xs = rng.integers(0, 320 - ws + 1)
+    ys = rng.integers(0, 240 - hs + 1)
+
+    bounds = analyzer.pruned_search.upper_bounds(analyzer.frame_stats.get(prev_frame),
+                                                 analyzer.frame_stats.get(curr_frame), xs, ys, ws, hs)
+    scores = analyzer.template_score_matrix(prev_frame, curr_frame, xs, ys, ws, hs)
+    np.testing.assert_array_equal(np.isfinite(bounds), np.isfinite(scores))
+    assert (bounds[np.isfinite(scores)] >= scores[np.isfinite(scores)]).all()
+
+
+def test_bounds_left_out_while_they_dont_prune():
+    frames = gray_frames('noise', 6)
+    analyzer = VideoMotionAnalyzer(Config(PRUNED_SEARCH=True, PRUNE_ACCEPT_SCORE=None))
+    sections = 0
+    for prev_frame, curr_frame in zip(frames, frames[1:]):
+        sections += analyzer.analyze_frame_pair(prev_frame, curr_frame).size
+    assert analyzer.pruned_search.pruned_share < 0.15
+    assert analyzer.search_totals['pruned'] < sections
+    assert analyzer.pruned_search.last_stats['rounds'] <= 2
@@ -0,0 +1,35 @@
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from pyramid_search import subpixel_offset
+from synthetic_video import synthetic_frames
+
+
+@pytest.mark.parametrize('peak', [-0.4, -0.1, 0.0, 0.25, 0.5])
+def test_subpixel_offset_finds_parabola_peak(peak):
+    left, center, right = (-(t - peak) ** 2 for t in (-1, 0, 1))
+    assert subpixel_offset(left, center, right) == pytest.approx(peak)
+
+
+def test_subpixel_offset_without_peak():
+    assert subpixel_offset(0.2, 0.5, 0.8) == 0.0
+    assert subpixel_offset(0.5, 0.5, 0.5) == 0.0
+
+
+@pytest.mark.parametrize('dx, dy', [(0.3, 0.7), (-4.25, 3.6), (12.4, -7.7)])
+def test_subpixel_vectors_on_known_shift(dx, dy):
+    frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+              for frame in synthetic_frames(320, 240, 2, dx=dx, dy=dy)]
+    # Large sections, so the search starts on the coarsest level and reaches the bigger shifts
+    analyzer = VideoMotionAnalyzer(Config(MATCH_MODE='pyramid', GRID_ROWS=5, GRID_COLS=5, MAX_RECURSIVE_DEPTH=0))
+    field = analyzer.analyze_frame_pair(*frames)
+
+    assert field.size == 9
+    assert np.median(field.dx) == pytest.approx(dx, abs=0.1)
+    assert np.median(field.dy) == pytest.approx(dy, abs=0.1)
+    assert np.abs(field.dx - dx).max() <= 0.5 and np.abs(field.dy - dy).max() <= 0.5
+    # Correlations per section are fixed by the radii and levels, not by the size of the shift
+    assert analyzer.search_totals['evaluations'] <= field.size * analyzer.pyramid_search.full_search_evaluations()
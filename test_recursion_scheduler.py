@@ -0,0 +1,82 @@
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from motion_field import MotionField
+from recursion_scheduler import RecursionScheduler
+from synthetic_video import synthetic_frames
+
+
+def grid_field(rows: int = 4, cols: int = 4, size: int = 64) -> MotionField:
+    field = MotionField()
+    grid_rows, grid_cols = np.divmod(np.arange(rows * cols), cols)
+    field.append(grid_cols * size, grid_rows * size, np.full(rows * cols, size), np.full(rows * cols, size), 0)
+    return field
+
+
+def test_expands_in_priority_order():
+    config = Config(GRID_ROWS=4, GRID_COLS=4, EXCLUDE_BORDER_SECTIONS=False, MAX_RECURSIVE_DEPTH=1)
+    field = grid_field()
+    # Same direction everywhere, so the priority only depends on the margins
+    margins = np.random.default_rng(0).permutation(np.linspace(0.05, 0.95, field.size))
+
+    def score_rows(start, end):
+        field.set_results(start, end, 2, 90.0, 0.9)
+        return margins[start:end], 8 * (end - start)
+
+    expanded = []
+
+    def subdivide(rows):
+        expanded.extend(rows.tolist())
+        return field.size, field.size
+
+    RecursionScheduler(config).run(field, score_rows, subdivide, 8)
+    assert expanded == np.argsort(margins).tolist()
+
+
+def test_evaluation_budget_counts_performed_evaluations():
+    config = Config(GRID_ROWS=4, GRID_COLS=4, EXCLUDE_BORDER_SECTIONS=False, MAX_RECURSIVE_DEPTH=2,
+                    RECURSION_BUDGET_EVALUATIONS=60)
+    field = grid_field()
+    scheduler = RecursionScheduler(config)
+    # Each section costs 2 evaluations, far below the 8 a full search could take
+    calls = []
+
+    def score_rows(start, end):
+        field.set_results(start, end, 2, 90.0, 0.9)
+        calls.append(end - start)
+        return np.linspace(0.1, 0.9, end - start), 2 * (end - start)
+
+    def subdivide(rows):
+        rows = rows[field.depth[rows] < config.MAX_RECURSIVE_DEPTH]
+        count = 4 * len(rows)
+        return field.append(np.zeros(count), np.zeros(count), np.full(count, 32), np.full(count, 32),
+                            np.repeat(field.depth[rows] + 1, 4), np.repeat(rows, 4))
+
+    scheduler.run(field, score_rows, subdivide, 8)
+    assert scheduler.last_stats['evaluations'] == 2 * sum(calls)
+    assert scheduler.last_stats['budget_exhausted']
+    # Stops once the budget is used up, overshooting it by at most one expansion at full cost
+    assert 60 <= scheduler.last_stats['evaluations'] < 60 + 4 * 8
+    # Estimating 8 evaluations per section would have stopped after the grid (16 * 8 > 60)
+    assert scheduler.last_stats['expanded'] > 0
+
+
+@pytest.mark.parametrize('settings, exhausted', [({}, True), ({'MATCH_MODE': 'vectorized'}, True),
+                                                 ({'PRUNED_SEARCH': True}, False)])
+def test_analyzer_budget_matches_search_stats(settings, exhausted):
+    frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+              for frame in synthetic_frames(320, 240, 2, rotation=0.5)]
+    unbounded = VideoMotionAnalyzer(Config(RECURSION_MODE='adaptive', **settings))
+    total = unbounded.analyze_frame_pair(*frames).size
+    analyzer = VideoMotionAnalyzer(Config(RECURSION_MODE='adaptive', RECURSION_BUDGET_EVALUATIONS=400, **settings))
+    field = analyzer.analyze_frame_pair(*frames)
+
+    stats = analyzer.recursion_scheduler.last_stats
+    assert stats['evaluations'] == analyzer.last_search_stats['evaluations']
+    assert stats['evaluations'] < 400 + 4 * analyzer.evaluations_per_section()
+    # The pruned search needs fewer than 400 evaluations for the whole tree
+    assert stats['budget_exhausted'] == exhausted
+    assert (field.size < total) == exhausted
@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from result_cache import ResultCache
+from synthetic_video import write_clip
+
+FRAMES = 10
+
+
+@pytest.fixture
+def clip(tmp_path):
+    return write_clip(str(tmp_path / 'clip.mp4'), 320, 240, FRAMES, dx=2.0, dy=-1.0)
+
+
+def run(video_path, **settings):
+    analyzer = VideoMotionAnalyzer(Config(**settings))
+    results = list(analyzer.analyze_video(video_path))
+    return results, analyzer.cache_stats
+
+
+def assert_same_results(results, expected):
+    assert [frame_count for frame_count, _ in results] == [frame_count for frame_count, _ in expected]
+    for (_, field), (_, other) in zip(results, expected):
+        assert field.size == other.size
+        np.testing.assert_array_equal(field.direction, other.direction)
+        np.testing.assert_array_equal(field.strength, other.strength)
+
+
+def test_partial_run_is_resumed(clip, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    expected, _ = run(clip)
+
+    _, stats = run(clip, CACHE_DIR=cache_dir, MAX_FRAMES=5)
+    assert stats == {'loaded': 0, 'analyzed': 4}
+
+    results, stats = run(clip, CACHE_DIR=cache_dir)
+    assert stats == {'loaded': 4, 'analyzed': FRAMES - 5}
+    assert_same_results(results, expected)
+
+    results, stats = run(clip, CACHE_DIR=cache_dir, SHOW_COMPASS=True, NUM_WORKERS=2)
+    assert stats == {'loaded': FRAMES - 1, 'analyzed': 0}
+    assert_same_results(results, expected)
+
+
+def test_analysis_settings_invalidate(clip, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    run(clip, CACHE_DIR=cache_dir)
+
+    results, stats = run(clip, CACHE_DIR=cache_dir, GRID_ROWS=4)
+    assert stats == {'loaded': 0, 'analyzed': FRAMES - 1}
+    assert_same_results(results, run(clip, GRID_ROWS=4)[0])
+
+
+def test_key_follows_content(clip, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), 1 << 20)
+    mask_path = str(tmp_path / 'mask.png')
+    mask = np.full((240, 320), 255, dtype=np.uint8)
+    cv2.imwrite(mask_path, mask)
+    config = Config(MASK_IMAGE=mask_path)
+    key = cache.key(clip, config)
+
+    assert cache.key(clip, config.replace(SHOW_GRID_LINES=False, SKIP_FRAMES=3)) == key
+    assert cache.key(clip, config.replace(SEARCH_STEP_SIZE=2)) != key
+
+    # Same mask path, different mask
+    mask[:, :80] = 0
+    cv2.imwrite(mask_path, mask)
+    assert cache.key(clip, config) != key
+
+    # Same video path, different video
+    key = cache.key(clip, config)
+    write_clip(clip, 320, 240, FRAMES, dx=-2.0)
+    assert cache.key(clip, config) != key
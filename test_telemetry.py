@@ -0,0 +1,93 @@
+import json
+import os
+
+import cv2
+import pytest
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import synthetic_frames
+from telemetry import BUCKETS, Histogram, Telemetry
+
+
+def test_values_land_in_the_first_bucket_they_fit():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.0, 0.01, 0.010001, 0.1, 0.5, 1.0, 1.5, 100.0):
+        histogram.observe(value)
+
+    # A value equal to a bound counts towards that bucket (Prometheus "le")
+    assert histogram.counts == [2, 2, 2, 2]
+    assert histogram.cumulative() == [2, 4, 6, 8]
+    summary = histogram.as_dict()
+    assert summary['buckets'] == {'0.01': 2, '0.1': 4, '1.0': 6, '+Inf': 8}
+    assert summary['count'] == 8
+    assert summary['sum'] == pytest.approx(103.120001)
+    assert summary['mean'] == pytest.approx(103.120001 / 8)
+
+
+def test_default_buckets():
+    assert list(BUCKETS) == sorted(BUCKETS)
+    histogram = Histogram()
+    histogram.observe(BUCKETS[-1] * 2)
+    assert histogram.counts[-1] == 1 and len(histogram.counts) == len(BUCKETS) + 1
+    assert Histogram().as_dict()['mean'] == 0.0
+
+
+def test_prometheus_histogram_lines():
+    telemetry = Telemetry()
+    telemetry.observe('stage_seconds', 0.003, 'matching')
+    telemetry.observe('stage_seconds', 0.2, 'matching')
+    telemetry.observe('frame_seconds', 0.04)
+    telemetry.count('frames', 2)
+    lines = telemetry.to_prometheus().splitlines()
+
+    assert '# TYPE motion_stage_seconds histogram' in lines
+    assert 'motion_stage_seconds_bucket{stage="matching",le="0.0025"} 0' in lines
+    assert 'motion_stage_seconds_bucket{stage="matching",le="0.005"} 1' in lines
+    assert 'motion_stage_seconds_bucket{stage="matching",le="0.25"} 2' in lines
+    assert 'motion_stage_seconds_bucket{stage="matching",le="+Inf"} 2' in lines
+    assert 'motion_stage_seconds_count{stage="matching"} 2' in lines
+    # No label for unlabeled histograms
+    assert 'motion_frame_seconds_bucket{le="0.05"} 1' in lines
+    assert 'motion_frame_seconds_count 1' in lines
+    assert 'motion_frames_total 2' in lines
+
+
+def test_analyzer_reports_stage_and_depth_histograms():
+    frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+              for frame in synthetic_frames(320, 240, 4, rotation=0.5)]
+    analyzer = VideoMotionAnalyzer(Config(MATCH_MODE='vectorized', MOTION_THRESHOLD=0.0))
+    analyzer.telemetry = telemetry = Telemetry()
+    events = []
+    telemetry.add_hook(lambda event, data: events.append((event, data)))
+    for prev_frame, curr_frame in zip(frames, frames[1:]):
+        analyzer.analyze_frame_pair(prev_frame, curr_frame)
+
+    stages = telemetry.histograms['stage_seconds']
+    assert stages['analysis'].count == 3
+    assert {'matching', 'recursion'} <= set(stages)
+    depths = telemetry.histograms['depth_seconds']
+    assert sorted(depths) == [str(depth) for depth in range(analyzer.config.MAX_RECURSIVE_DEPTH + 1)]
+    assert all(histogram.count == 3 for histogram in depths.values())
+    # Time per depth is part of the analysis time
+    assert sum(histogram.sum for histogram in depths.values()) <= stages['analysis'].sum
+
+    assert telemetry.counters['frames_analyzed'] == 3
+    assert telemetry.counters['candidate_evaluations'] == analyzer.search_totals['evaluations']
+    assert [event for event, _ in events] == ['analysis'] * 3
+
+
+@pytest.mark.parametrize('name', ['metrics.json', 'metrics.prom'])
+def test_dump_replaces_the_file(tmp_path, name):
+    path = str(tmp_path / name)
+    telemetry = Telemetry(path)
+    telemetry.observe('frame_seconds', 0.01)
+    telemetry.close()
+
+    with open(path) as f:
+        text = f.read()
+    if name.endswith('.json'):
+        assert json.loads(text)['histograms']['frame_seconds']['']['count'] == 1
+    else:
+        assert 'motion_frame_seconds_count 1' in text
+    assert os.listdir(tmp_path) == [name]
@@ -0,0 +1,230 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from config import Config
+from motion_analyzer import VideoMotionAnalyzer
+from synthetic_video import write_clip
+from video_io import SEEK_BACKOFF, AsyncVideoWriter, FramePrefetcher, frame_range, seek_to_frame
+
+FRAMES = 12
+
+
+class FakeCapture:
+    """Numbered frames behind a capture whose seeks behave like different backends.
+
+    seek: 'exact', 'keyframe' (lands on the keyframe at or before the target),
+    'late' (lands a few frames past the target unless seeking far back) or 'none'.
+    """
+
+    def __init__(self, count: int, seek: str = 'exact', keyframe_interval: int = 10):
+        self.count = count
+        self.seek = seek
+        self.keyframe_interval = keyframe_interval
+        self.position = 0
+        self.grabs = 0
+        self.seeks = []
+
+    def get(self, prop):
+        assert prop == cv2.CAP_PROP_POS_FRAMES
+        return float(self.position)
+
+    def set(self, prop, value):
+        assert prop == cv2.CAP_PROP_POS_FRAMES
+        self.seeks.append(int(value))
+        if self.seek == 'none':
+            return False
+        if self.seek == 'keyframe':
+            value -= value % self.keyframe_interval
+        elif self.seek == 'late' and value > 0:
+            value += 3
+        self.position = min(int(value), self.count)
+        return True
+
+    def grab(self):
+        if self.position >= self.count:
+            return False
+        self.position += 1
+        self.grabs += 1
+        return True
+
+
+@pytest.mark.parametrize('seek', ['exact', 'keyframe', 'late', 'none'])
+@pytest.mark.parametrize('target', [0, 1, 25, 99])
+def test_seek_reaches_target(seek, target):
+    cap = FakeCapture(100, seek)
+    assert seek_to_frame(cap, target) == target
+    assert cap.position == target
+    if seek == 'exact':
+        assert cap.grabs == 0
+    if seek == 'keyframe':
+        assert cap.grabs == target % cap.keyframe_interval
+
+
+def test_late_seek_steps_back():
+    cap = FakeCapture(500, 'late')
+    assert seek_to_frame(cap, 300) == 300
+    assert cap.seeks == [300, 300 - SEEK_BACKOFF]
+    assert cap.grabs == SEEK_BACKOFF - 3
+
+
+@pytest.mark.parametrize('seek', ['exact', 'keyframe', 'none'])
+def test_seek_past_end(seek):
+    cap = FakeCapture(20, seek)
+    assert seek_to_frame(cap, 35) == 20
+
+
+@pytest.mark.parametrize('settings, fps, expected', [
+    ({}, 30.0, (0, None)),
+    ({'SKIP_FRAMES': 5}, 30.0, (5, None)),
+    ({'SKIP_FRAMES': 5, 'MAX_FRAMES': 10}, 30.0, (5, 15)),
+    ({'START_TIME': 2.0}, 30.0, (60, None)),
+    ({'START_TIME': 0.0, 'END_TIME': 1.0}, 30.0, (0, 30)),
+    # START_TIME and SKIP_FRAMES: whichever is later
+    ({'START_TIME': 1.0, 'SKIP_FRAMES': 45}, 30.0, (45, None)),
+    ({'START_TIME': 1.0, 'SKIP_FRAMES': 15}, 30.0, (30, None)),
+    # MAX_FRAMES and END_TIME: whichever ends first
+    ({'START_TIME': 1.0, 'END_TIME': 2.0, 'MAX_FRAMES': 10}, 30.0, (30, 40)),
+    ({'START_TIME': 1.0, 'END_TIME': 2.0, 'MAX_FRAMES': 100}, 30.0, (30, 60)),
+    # Times round to the nearest frame
+    ({'START_TIME': 0.49, 'END_TIME': 0.51}, 10.0, (5, 5)),
+    # Without a frame rate, times are ignored
+    ({'START_TIME': 1.0, 'END_TIME': 2.0, 'SKIP_FRAMES': 3}, 0.0, (3, None)),
+])
+def test_frame_range(settings, fps, expected):
+    assert frame_range(Config(**settings), fps) == expected
+
+
+@pytest.fixture(scope='module')
+def clip(tmp_path_factory):
+    return write_clip(str(tmp_path_factory.mktemp('videos') / 'clip.mp4'), 160, 120, FRAMES, dx=1.0)
+
+
+def decoded(video_path):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    ret, frame = cap.read()
+    while ret:
+        frames.append(frame)
+        ret, frame = cap.read()
+    cap.release()
+    return frames
+
+
+@pytest.mark.parametrize('settings, counts', [
+    ({'SKIP_FRAMES': 3, 'MAX_FRAMES': 4}, range(4, 8)),
+    ({'SKIP_FRAMES': 9}, range(10, FRAMES + 1)),
+    ({'SKIP_FRAMES': FRAMES}, range(0)),
+    ({'START_TIME': 0.1, 'END_TIME': 0.2}, range(4, 7)),
+])
+def test_iter_frames_window(clip, settings, counts):
+    expected = decoded(clip)
+    analyzer = VideoMotionAnalyzer(Config(**settings))
+    cap = cv2.VideoCapture(clip)
+    try:
+        frames = list(analyzer.iter_frames(cap))
+    finally:
+        cap.release()
+
+    assert [frame_count for frame_count, _, _ in frames] == list(counts)
+    for frame_count, frame, _ in frames:
+        np.testing.assert_array_equal(frame, expected[frame_count - 1])
+
+
+def counting(count: int, read: list, closed: list, fail_at: int = None):
+    try:
+        for index in range(count):
+            if index == fail_at:
+                raise RuntimeError('decode failed')
+            read.append(index)
+            yield index
+    finally:
+        closed.append(True)
+
+
+def test_prefetcher_keeps_order_and_bounds_read_ahead():
+    read, closed = [], []
+    prefetcher = FramePrefetcher(counting(50, read, closed), size=3)
+    items = []
+    for item in prefetcher:
+        time.sleep(0.002)
+        # The item being consumed, the queued ones and the one the reader thread is waiting to put
+        assert len(read) - len(items) <= 3 + 2
+        items.append(item)
+    assert items == list(range(50))
+    assert closed and not prefetcher._thread.is_alive()
+    assert prefetcher.stats.max_depth <= 3
+
+
+def test_prefetcher_reraises_iterator_errors():
+    read, closed = [], []
+    items = []
+    with pytest.raises(RuntimeError, match='decode failed'):
+        for item in FramePrefetcher(counting(10, read, closed, fail_at=4), size=2):
+            items.append(item)
+    assert items == [0, 1, 2, 3]
+    assert closed
+
+
+def test_prefetcher_stops_when_consumer_stops():
+    read, closed = [], []
+    prefetcher = FramePrefetcher(counting(10 ** 6, read, closed), size=2)
+    for item in prefetcher:
+        if item == 5:
+            break
+    prefetcher.close()
+    assert not prefetcher._thread.is_alive()
+    assert closed and len(read) < 100
+
+
+class FakeWriter:
+    def __init__(self, fail_at: int = None, delay: float = 0.0):
+        self.frames = []
+        self.fail_at = fail_at
+        self.delay = delay
+        self.released = False
+        self.threads = set()
+
+    def isOpened(self):
+        return True
+
+    def write(self, frame):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        if len(self.frames) == self.fail_at:
+            raise RuntimeError('encode failed')
+        self.frames.append(int(frame[0, 0]))
+
+    def release(self):
+        self.released = True
+
+
+def test_async_writer_writes_in_order_on_background_thread():
+    writer = FakeWriter(delay=0.001)
+    async_writer = AsyncVideoWriter(writer, size=2)
+    for index in range(30):
+        async_writer.write(np.full((2, 2), index, dtype=np.uint8))
+    assert async_writer.stats.max_depth <= 2
+    async_writer.release()
+
+    # release() waits for every queued frame before releasing the writer
+    assert writer.frames == list(range(30)) and writer.released
+    assert writer.threads == {async_writer._thread.ident}
+    assert not async_writer._thread.is_alive()
+
+
+def test_async_writer_raises_encode_errors():
+    writer = FakeWriter(fail_at=3)
+    async_writer = AsyncVideoWriter(writer, size=2)
+    for index in range(10):
+        try:
+            async_writer.write(np.full((2, 2), index, dtype=np.uint8))
+        except RuntimeError:
+            break
+    with pytest.raises(RuntimeError, match='encode failed'):
+        async_writer.release()
+    assert writer.frames == [0, 1, 2] and writer.released
+    assert not async_writer._thread.is_alive()
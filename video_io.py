@@ -0,0 +1,261 @@
+import queue
+import sys
+import threading
+import time
+import cv2
+import numpy as np
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Frames to step back by (doubling per retry) when a seek lands past its target
+SEEK_BACKOFF = 32
+
+
+def _grab_until(cap: cv2.VideoCapture, position: int, target: int) -> int:
+    # grab() decodes without the color conversion and copy that retrieve() adds
+    while position < target:
+        if not cap.grab():
+            break
+        position += 1
+    return position
+
+
+def seek_to_frame(cap: cv2.VideoCapture, target: int) -> int:
+    """Position `cap` so the next read returns frame `target` (0-based); returns the frame reached.
+
+    A direct seek is tried first. Backends that can only seek to keyframes may
+    land before the target, which is fixed by grabbing forward, or after it, in
+    which case the seek is retried further back. If the capture can't seek at
+    all, frames are grabbed from the current position. The result is less than
+    `target` only if the video ends first.
+    """
+    current = max(0, int(round(cap.get(cv2.CAP_PROP_POS_FRAMES))))
+    if target == current:
+        return current
+
+    position = target
+    while cap.set(cv2.CAP_PROP_POS_FRAMES, position):
+        reached = int(round(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+        if 0 <= reached <= target:
+            return _grab_until(cap, reached, target)
+        current = reached
+        if position == 0:
+            break
+        position = max(0, target - max(SEEK_BACKOFF, 2 * (target - position)))
+
+    # No usable seek: decode forward from wherever the capture is
+    return _grab_until(cap, current, target) if current <= target else current
+
+
+def frame_range(config, fps: float) -> Tuple[int, Optional[int]]:
+    """(first, end) frame indices to analyze: SKIP_FRAMES/START_TIME up to MAX_FRAMES/END_TIME.
+
+    `first` is 0-based, `end` is exclusive (None = until the end of the video).
+    """
+    first = config.SKIP_FRAMES
+    if config.START_TIME and fps > 0:
+        first = max(first, int(round(config.START_TIME * fps)))
+
+    end = None
+    if config.MAX_FRAMES:
+        end = first + config.MAX_FRAMES
+    if config.END_TIME is not None and fps > 0:
+        end_frame = int(round(config.END_TIME * fps))
+        end = end_frame if end is None else min(end, end_frame)
+    return first, end
+
+
+class BufferPool:
+    """Reusable arrays of one shape, each handed out again once nothing else references it.
+
+    A buffer is free when the pool holds the only reference to it, so frames
+    still queued for prefetch or encode, submitted to a worker, kept by an
+    identity-matched cache or viewed by another array are never overwritten,
+    and callers need not release anything. get() returns a free buffer, or a
+    new one when all are in use; up to `limit` buffers are kept for reuse,
+    beyond that new buffers are just allocated. The pool settles at as many
+    buffers as are in use at once, after which frames allocate nothing.
+    """
+
+    def __init__(self, limit: int = 8):
+        self.limit = limit
+        self.shape: Optional[Tuple[int, ...]] = None
+        self.dtype = None
+        self.buffers = []
+        self.allocated = 0
+        self.reused = 0
+
+        # References to a buffer only the pool holds, as counted in get()
+        probe = [np.empty(0)]
+        for buffer in probe:
+            self._free_refs = sys.getrefcount(buffer)
+
+    def get(self, shape: Tuple[int, ...], dtype=np.uint8, init: Optional[Callable[[np.ndarray], None]] = None):
+        """A buffer of this shape and dtype; `init` is called on newly allocated buffers only."""
+        if shape != self.shape or dtype != self.dtype:
+            self.shape, self.dtype = shape, dtype
+            self.buffers = []
+
+        for buffer in self.buffers:
+            if sys.getrefcount(buffer) <= self._free_refs:
+                self.reused += 1
+                return buffer
+
+        buffer = np.empty(shape, dtype=dtype)
+        if init is not None:
+            init(buffer)
+        if len(self.buffers) < self.limit:
+            self.buffers.append(buffer)
+        self.allocated += 1
+        return buffer
+
+    def as_dict(self) -> Dict:
+        return {'buffers': len(self.buffers), 'allocated': self.allocated, 'reused': self.reused}
+
+
+# Marks the end of the items passed through a queue
+_END = object()
+
+
+class QueueStats:
+    """Depth and blocking time of one bounded queue between two threads."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.items = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.producer_wait = 0.0  # seconds the producer was blocked on a full queue
+        self.consumer_wait = 0.0  # seconds the consumer was blocked on an empty queue
+
+    def record_depth(self, depth: int):
+        self.items += 1
+        self.depth_total += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def as_dict(self) -> Dict:
+        return {
+            'queue_size': self.size,
+            'items': self.items,
+            'mean_depth': self.depth_total / self.items if self.items else 0.0,
+            'max_depth': self.max_depth,
+            'producer_wait_s': self.producer_wait,
+            'consumer_wait_s': self.consumer_wait,
+        }
+
+
+class FramePrefetcher:
+    """Runs a frame iterator on a background thread, up to `size` items ahead of the consumer.
+
+    OpenCV releases the GIL while decoding, so the next frames are decoded while
+    the current one is analyzed. Iterating yields the items in order and
+    re-raises any error from the iterator; stopping early (or close()) stops the
+    thread, so the capture can be released afterwards.
+    """
+
+    def __init__(self, frames: Iterable, size: int):
+        self.queue = queue.Queue(maxsize=max(1, size))
+        self.stats = QueueStats(max(1, size))
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(frames,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.05)
+                self.stats.producer_wait += time.perf_counter() - started
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, frames: Iterable):
+        iterator = iter(frames)
+        try:
+            for item in iterator:
+                if not self._put(item):
+                    break
+        except BaseException as e:
+            self._error = e
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+            self._put(_END)
+
+    def __iter__(self):
+        try:
+            while True:
+                depth = self.queue.qsize()
+                started = time.perf_counter()
+                item = self.queue.get()
+                self.stats.consumer_wait += time.perf_counter() - started
+                if item is _END:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                self.stats.record_depth(depth)
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        # Unblock the producer if it's waiting for space
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join()
+
+
+class AsyncVideoWriter:
+    """cv2.VideoWriter that encodes on a background thread, with up to `size` frames queued.
+
+    Frames are written as they are when the encoder gets to them, so a frame
+    must not be modified after it was passed to write().
+    """
+
+    def __init__(self, writer: cv2.VideoWriter, size: int):
+        self.writer = writer
+        self.queue = queue.Queue(maxsize=max(1, size))
+        self.stats = QueueStats(max(1, size))
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def isOpened(self) -> bool:
+        return self.writer.isOpened()
+
+    def _run(self):
+        while True:
+            started = time.perf_counter()
+            frame = self.queue.get()
+            self.stats.consumer_wait += time.perf_counter() - started
+            if frame is _END:
+                return
+            if self._error is None:
+                try:
+                    self.writer.write(frame)
+                except BaseException as e:
+                    # Keep draining so write() never blocks; the error is raised on release()
+                    self._error = e
+
+    def write(self, frame: np.ndarray):
+        if self._error is not None:
+            raise self._error
+        self.stats.record_depth(self.queue.qsize())
+        started = time.perf_counter()
+        self.queue.put(frame)
+        self.stats.producer_wait += time.perf_counter() - started
+
+    def release(self):
+        """Wait for the queued frames to be encoded, then release the writer."""
+        if self._thread.is_alive():
+            self.queue.put(_END)
+            self._thread.join()
+        self.writer.release()
+        if self._error is not None:
+            raise self._error